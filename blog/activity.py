@@ -0,0 +1,166 @@
+"""
+活动日志写入器
+信号处理器只把日志放入进程内的有界队列，由后台线程用 bulk_create 批量写入数据库，
+日志写入不再占用请求的响应时间。
+- 只有在当前事务提交后日志才会入队，事务回滚时不会留下日志
+- 队列已满时退回到同步写入，不丢日志
+- 批量写入失败时逐条重新写入，一条有问题的日志不会连累同一批的其他日志
+- 进程退出（包括 gunicorn worker 退出）时调用 drain() 写完队列中剩余的日志
+settings.BLOG_ACTIVITY_LOG_MODE = 'sync' 时在信号处理器中直接写入（测试中使用）
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    """后台批量写入活动日志"""
+
+    def __init__(self, max_queue_size=1000, batch_size=100, flush_interval=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, entry):
+        """把一条未保存的 ActivityLog 放入队列"""
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            logger.warning("活动日志队列已满，改为同步写入")
+            self._write([entry])
+
+    def drain(self, timeout=5):
+        """停止后台线程并写完队列中剩余的日志"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error("活动日志队列已满，无法正常停止写入线程")
+            return
+        thread.join(timeout)
+
+    def pending(self):
+        """队列中等待写入的日志数量"""
+        return self._queue.qsize()
+
+    def _ensure_thread(self):
+        # gunicorn 在 fork 出 worker 之后才会处理请求，因此线程在首次使用时启动
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name='activity-log-writer', daemon=True
+                    )
+                    self._thread.start()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            # 等待一小段时间凑成一批，减少写入次数
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            # 写入线程长期存在，按 CONN_MAX_AGE 复用连接，过期或出错的连接才关闭
+            close_old_connections()
+
+    def _write(self, entries):
+        from .models import ActivityLog
+
+        try:
+            ActivityLog.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception:
+            logger.exception("批量写入 %d 条活动日志失败，改为逐条写入", len(entries))
+        else:
+            metrics.activity_logs_written.inc(len(entries))
+            return
+
+        written = 0
+        for entry in entries:
+            # bulk_create 回滚前可能已经给前几批设置了主键
+            entry.pk = None
+            entry._state.adding = True
+            try:
+                entry.save(force_insert=True)
+            except Exception:
+                logger.exception("写入活动日志失败：%s", entry.description)
+            else:
+                written += 1
+        metrics.activity_logs_written.inc(written)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """当前进程的活动日志写入器"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ActivityLogWriter(
+                    max_queue_size=getattr(settings, 'BLOG_ACTIVITY_LOG_QUEUE_SIZE', 1000),
+                    batch_size=getattr(settings, 'BLOG_ACTIVITY_LOG_BATCH_SIZE', 100),
+                    flush_interval=getattr(settings, 'BLOG_ACTIVITY_LOG_FLUSH_INTERVAL', 0.5),
+                )
+    return _writer
+
+
+def log_activity(action, description, user=None, target_title=''):
+    """记录一条活动日志"""
+    from .models import ActivityLog
+
+    entry = ActivityLog(
+        action=action,
+        description=description,
+        user=user,
+        target_title=target_title,
+        created_at=timezone.now(),  # 记录事件发生的时间，而不是写入数据库的时间
+    ).truncate_fields()
+    if getattr(settings, 'BLOG_ACTIVITY_LOG_MODE', 'async') == 'sync':
+        entry.save()
+        metrics.activity_logs_written.inc()
+    else:
+        transaction.on_commit(lambda: get_writer().enqueue(entry))
+
+
+def drain():
+    """写完当前进程中排队的活动日志（进程退出、gunicorn worker退出时调用）"""
+    if _writer is not None:
+        _writer.drain()
+
+
+atexit.register(drain)
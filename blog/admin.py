@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Post, Category, Tag, ActivityLog, Comment
+from django.db import transaction
+from .models import Post, Category, Tag, ActivityLog, Comment, comments_moderated
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
@@ -20,13 +21,13 @@ class PostAdmin(admin.ModelAdmin):
     get_status_actions.allow_tags = True
     
     def publish_post(self, request, queryset):
-        """批量发布文章"""
-        updated = queryset.filter(status='draft').update(status='published')
+        """批量发布文章（只发布草稿，并记录活动日志）"""
+        updated = queryset.transition('published', request.user)
         self.message_user(request, f'成功发布 {updated} 篇文章')
     
     def archive_post(self, request, queryset):
-        """批量归档文章"""
-        updated = queryset.filter(status='published').update(status='archived')
+        """批量归档文章（只归档已发布的文章，并记录活动日志）"""
+        updated = queryset.transition('archived', request.user)
         self.message_user(request, f'成功归档 {updated} 篇文章')
     
     publish_post.short_description = "发布选中的文章"
@@ -34,6 +35,12 @@ class PostAdmin(admin.ModelAdmin):
     
     actions = [publish_post, archive_post]
 
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        # 标签中间表 PostTag 的附加字段由信号处理器按文章填写，可以像自动创建的中间表一样直接编辑
+        if db_field.name == 'tags':
+            return db_field.formfield(**kwargs)
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'slug', 'created_at')
@@ -71,14 +78,24 @@ class CommentAdmin(admin.ModelAdmin):
     list_editable = ('is_active',)
     date_hierarchy = 'created_at'
     
+    def _moderate(self, queryset, is_active):
+        with transaction.atomic():
+            # 先取出受影响的文章：查询集可能按 is_active 过滤，update 之后就查不到这些评论了
+            post_ids = list(queryset.order_by().values_list('post_id', flat=True).distinct())
+            updated = queryset.update(is_active=is_active)
+            # queryset.update 不经过 save()，在同一事务中重新计算评论数，并发送信号清理缓存
+            Post.objects.filter(pk__in=post_ids).refresh_comment_counts()
+            comments_moderated.send(sender=Comment, post_ids=post_ids)
+        return updated
+    
     def approve_comments(self, request, queryset):
         """批量批准评论"""
-        updated = queryset.update(is_active=True)
+        updated = self._moderate(queryset, True)
         self.message_user(request, f'成功批准 {updated} 条评论')
     
     def disapprove_comments(self, request, queryset):
         """批量禁用评论"""
-        updated = queryset.update(is_active=False)
+        updated = self._moderate(queryset, False)
         self.message_user(request, f'成功禁用 {updated} 条评论')
     
     approve_comments.short_description = "批准选中的评论"
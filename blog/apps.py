@@ -1,5 +1,9 @@
+import logging
+
 from django.apps import AppConfig
-from django.core.checks import register, Error
+from django.core.checks import register, Error, Warning
+
+logger = logging.getLogger(__name__)
 
 
 class BlogConfig(AppConfig):
@@ -14,9 +18,10 @@ class BlogConfig(AppConfig):
             import blog.signals
         except ImportError:
             pass  # 如果没有signals.py文件，就跳过
+        import blog.database  # 注册数据库连接调优（SQLite PRAGMA）
         
-        # 打印应用启动信息（开发时有用）
-        print(f"✅ {self.verbose_name} 应用已成功加载")
+        # 记录应用启动信息（开发时有用）
+        logger.debug("%s 应用已成功加载", self.verbose_name)
 
 
 @register()
@@ -38,3 +43,35 @@ def check_blog_settings(app_configs, **kwargs):
         )
     
     return errors
+
+
+@register()
+def check_shared_caches(app_configs, **kwargs):
+    """需要在多个进程之间共享的缓存不能使用进程内缓存（LocMem）"""
+    from django.conf import settings
+    from .caching import is_shared_cache
+    
+    warnings = []
+    if getattr(settings, 'BLOG_VIEW_COUNT_BUFFER', 'memory') == 'cache':
+        alias = getattr(settings, 'BLOG_VIEW_COUNT_CACHE_ALIAS', 'default')
+        if not is_shared_cache(alias):
+            warnings.append(
+                Warning(
+                    f'浏览次数缓冲区使用的缓存 "{alias}" 是进程内缓存，'
+                    'flush_view_counts 命令无法读取各 worker 缓冲的浏览次数',
+                    hint='配置 REDIS_URL 等共享缓存，或把 BLOG_VIEW_COUNT_BUFFER 设为 "memory"',
+                    id='blog.W001',
+                )
+            )
+    if getattr(settings, 'BLOG_PAGE_CACHE_ENABLED', False):
+        alias = getattr(settings, 'BLOG_PAGE_CACHE_ALIAS', 'default')
+        if not is_shared_cache(alias):
+            warnings.append(
+                Warning(
+                    f'整页缓存使用的缓存 "{alias}" 是进程内缓存，'
+                    '内容变化时只有处理该请求的进程会清除缓存，其他 worker 会继续返回旧页面',
+                    hint='配置 REDIS_URL 等共享缓存，或关闭 BLOG_PAGE_CACHE',
+                    id='blog.W002',
+                )
+            )
+    return warnings
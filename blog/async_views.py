@@ -0,0 +1,144 @@
+"""
+公开页面的异步视图（ASGI 部署模式，settings.BLOG_ASYNC_VIEWS 为 True 时由 blog/urls.py 使用）
+页面内容与 blog/views.py 中的同步视图相同：
+- 查询使用 Django 的异步 ORM（aget、aiterator、afirst、ain_bulk），互不依赖的数据
+  （文章、评论、侧边栏、搜索结果）用 asyncio.gather 同时获取；侧边栏、导航等缓存命中时不占用线程
+- Django 的异步 ORM 仍在每个请求的同步线程中执行 SQL，同一请求的多个查询不会真正并行，
+  并发带来的收益主要在缓存访问和等待慢客户端时不占用 worker
+- 模板在线程中渲染：上下文处理器和模板中可能有同步的数据库访问（如 request.user）
+- 评论提交（POST）交给同步视图处理
+"""
+import asyncio
+from operator import attrgetter
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, render
+
+from . import views
+from .caching import public_page
+from .forms import CommentForm
+from .models import Post, PostTag, Category, Tag, Comment
+from .navigation import aget_adjacent_posts
+from .page_cache import cache_anonymous_page
+from .pagination import CursorPaginator, SequenceCursorPaginator
+from .search import max_results, search_post_ids
+from .sidebar import aget_sidebar_context
+from .views import LISTING_MAX_AGE, COMMENTS_PER_PAGE, _post_is_public, _record_cached_view
+
+arender = sync_to_async(render)
+
+
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
+async def post_list(request):
+    """显示已发布的文章列表"""
+    posts, sidebar = await asyncio.gather(
+        CursorPaginator(Post.published.for_listing(), 10).apage(request.GET.get('cursor')),
+        aget_sidebar_context(),
+    )
+    return await arender(request, 'blog/post_list.html', {'posts': posts, **sidebar})
+
+
+@public_page(on_not_modified=_record_cached_view, exists=_post_is_public)
+@cache_anonymous_page(on_hit=_record_cached_view)
+async def post_detail(request, post_id):
+    """显示文章详情"""
+    if request.method == 'POST':
+        return await sync_to_async(views.post_detail)(request, post_id)
+
+    # 文章和侧边栏互不依赖，同时获取
+    post, sidebar = await asyncio.gather(
+        aget_object_or_404(Post.objects.with_related(), id=post_id),
+        aget_sidebar_context(),
+    )
+
+    # 权限控制：只有已发布的文章才能被普通用户查看；与同步视图一样，先检查再查询评论
+    user = await request.auser()
+    if post.status != 'published' and not user.is_staff:
+        raise Http404("文章不存在或未发布")
+
+    comments, adjacent = await asyncio.gather(_comment_page(post.id), aget_adjacent_posts(post))
+    # 浏览次数缓冲区达到阈值时会同步写回数据库
+    await sync_to_async(post.increment_view_count)()
+
+    return await arender(request, 'blog/post_detail.html', {
+        'post': post,
+        'previous_post': adjacent['previous'],
+        'next_post': adjacent['next'],
+        'comments': comments,
+        'comment_form': CommentForm(),
+        **sidebar,
+    })
+
+
+async def _comment_page(post_id, cursor=None):
+    comments = Comment.objects.filter(post_id=post_id, is_active=True).select_related('author')
+    return await CursorPaginator(comments, COMMENTS_PER_PAGE).apage(cursor)
+
+
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
+async def search_posts(request):
+    """搜索文章"""
+    query = request.GET.get('q', '').strip()
+
+    post_ids, sidebar = await asyncio.gather(_search(query), aget_sidebar_context())
+
+    posts = SequenceCursorPaginator(post_ids, 10).page(request.GET.get('cursor'))
+    posts_by_id = await Post.published.for_listing().ain_bulk(posts.object_list)
+    posts.object_list = [posts_by_id[pk] for pk in posts.object_list if pk in posts_by_id]
+
+    return await arender(request, 'blog/search_results.html', {
+        'posts': posts,
+        'query': query,
+        'query_string': urlencode({'q': query}),
+        'results_count': len(post_ids),
+        'results_capped': len(post_ids) >= max_results(),
+        **sidebar,
+    })
+
+
+async def _search(query):
+    """全文检索后端直接执行SQL，在线程中调用"""
+    if not query:
+        return []
+    return await sync_to_async(search_post_ids)(query)
+
+
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
+async def category_posts(request, slug):
+    """显示特定分类下的文章"""
+    category, sidebar = await asyncio.gather(
+        aget_object_or_404(Category, slug=slug), aget_sidebar_context(),
+    )
+    posts = await CursorPaginator(
+        Post.published.filter(category=category).for_listing(), 10
+    ).apage(request.GET.get('cursor'))
+
+    return await arender(request, 'blog/category_posts.html', {
+        'category': category,
+        'posts': posts,
+        **sidebar,
+    })
+
+
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
+async def tag_posts(request, slug):
+    """显示特定标签下的文章"""
+    tag, sidebar = await asyncio.gather(
+        aget_object_or_404(Tag, slug=slug), aget_sidebar_context(),
+    )
+    # 按文章-标签关联表的索引分页，再取出每条关联的文章
+    posts = (await CursorPaginator(
+        PostTag.objects.listing(tag), 10
+    ).apage(request.GET.get('cursor'))).map(attrgetter('post'))
+
+    return await arender(request, 'blog/tag_posts.html', {
+        'tag': tag,
+        'posts': posts,
+        **sidebar,
+    })
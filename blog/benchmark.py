@@ -0,0 +1,88 @@
+"""
+视图性能基准测试工具（由 benchmark_views 命令使用）
+用 Django 测试客户端请求各个页面，统计响应时间分位数、SQL 查询数和耗时、内存峰值，
+结果可以保存为 JSON，与之前的结果对比判断是否有性能退化
+"""
+import statistics
+import time
+import tracemalloc
+
+from .profiling import QueryRecorder
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """样本的分位数，如 {50: ..., 95: ..., 99: ...}"""
+    if len(samples) == 1:
+        return {point: samples[0] for point in points}
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {point: cuts[point - 1] for point in points}
+
+
+def measure(client, url, requests=50, warmup=5):
+    """
+    请求 url 若干次，返回统计结果（时间单位为毫秒）
+    url 可以是字符串，也可以是返回 url 的函数（每次请求不同的文章等）
+    """
+    get_url = url if callable(url) else (lambda: url)
+
+    for _ in range(warmup):
+        client.get(get_url())
+
+    latencies, query_counts, query_times = [], [], []
+    for _ in range(requests):
+        request_url = get_url()
+        recorder = QueryRecorder()
+        with recorder.record():
+            start = time.perf_counter()
+            response = client.get(request_url)
+            latencies.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise AssertionError(f'{request_url} 返回了 {response.status_code}')
+        query_counts.append(recorder.count)
+        query_times.append(recorder.duration * 1000)
+
+    # 内存峰值单独测量，tracemalloc 会明显拖慢请求，不能和计时放在一起
+    tracemalloc.start()
+    try:
+        client.get(get_url())
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    points = percentiles(latencies)
+    return {
+        'requests': requests,
+        'p50_ms': round(points[50], 3),
+        'p95_ms': round(points[95], 3),
+        'p99_ms': round(points[99], 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+        'queries': round(statistics.fmean(query_counts), 2),
+        'query_ms': round(statistics.fmean(query_times), 3),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def find_regressions(results, baseline=None, max_regression=0.2, budgets=None, metric='p95_ms'):
+    """
+    检查性能退化，返回问题描述列表
+    - baseline：之前保存的结果，同一数据规模、同一页面的 metric 超过基准的 (1 + max_regression) 倍
+    - budgets：{页面名称: 毫秒}，metric 超过预算
+    """
+    problems = []
+    previous = {
+        (item['size'], item['endpoint']): item for item in (baseline or {}).get('results', [])
+    }
+    for item in results:
+        value = item[metric]
+        budget = (budgets or {}).get(item['endpoint'])
+        if budget is not None and value > budget:
+            problems.append(
+                f"{item['endpoint']}（{item['size']} 篇文章）{metric} {value:.1f}ms 超过预算 {budget:.1f}ms"
+            )
+        before = previous.get((item['size'], item['endpoint']))
+        if before is not None and before[metric] > 0 and value > before[metric] * (1 + max_regression):
+            problems.append(
+                f"{item['endpoint']}（{item['size']} 篇文章）{metric} 从 {before[metric]:.1f}ms "
+                f"增加到 {value:.1f}ms（+{(value / before[metric] - 1) * 100:.0f}%）"
+            )
+    return problems
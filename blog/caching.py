@@ -0,0 +1,179 @@
+"""
+HTTP 缓存验证（条件GET）
+全站维护一个"内容版本"：文章、分类、标签、评论变化时由 blog/signals.py 更新为当前时间戳。
+公开页面用它生成 ETag 和 Last-Modified，内容没有变化时直接返回 304，不再渲染模板。
+RSS/Atom 订阅另有一个"订阅版本"，只随文章、分类、标签变化（评论不会出现在订阅中），见 blog/feeds.py
+版本保存在数据库（ContentVersion）中，多个 worker 进程、管理命令之间保持一致；
+默认缓存是多进程共享的后端（如 Redis）时，版本同时缓存在其中，304 不需要查询数据库。
+进程内缓存（LocMem）无法在进程之间失效，这时每次从数据库读取版本（一条主键查询）
+"""
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .metrics import record_cache
+
+CONTENT_VERSION = 'content'
+FEED_VERSION = 'feed'
+# 共享缓存中的版本是数据库的副本，设置过期时间，万一漏掉更新也会在一段时间后恢复
+VERSION_CACHE_TIMEOUT = 300
+
+# 只在当前进程中有效的缓存后端
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_shared_cache(alias='default'):
+    """缓存后端是否由多个进程共享（Redis、Memcached、数据库、文件缓存等）"""
+    return settings.CACHES[alias]['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def _version_key(name):
+    return f'blog:version:{name}'
+
+
+def _load_version(name, shared):
+    """从数据库读取版本，共享缓存时写入缓存"""
+    from .models import ContentVersion
+
+    version = ContentVersion.objects.filter(name=name).values_list('version', flat=True).first()
+    if version is None:
+        # 第一次使用时以当前时间作为版本
+        version = ContentVersion.objects.get_or_create(name=name, defaults={'version': time.time()})[0].version
+    if shared:
+        # add 不会覆盖并发的 bump_content_version 写入的新版本
+        cache.add(_version_key(name), version, VERSION_CACHE_TIMEOUT)
+    return version
+
+
+def _get_version(name):
+    shared = is_shared_cache()
+    if shared:
+        version = cache.get(_version_key(name))
+        record_cache(f'{name}_version', version is not None)
+        if version is not None:
+            return version
+    return _load_version(name, shared)
+
+
+async def _aget_version(name):
+    """_get_version() 的异步版本；共享缓存命中时不占用线程"""
+    shared = is_shared_cache()
+    if shared:
+        version = await cache.aget(_version_key(name))
+        record_cache(f'{name}_version', version is not None)
+        if version is not None:
+            return version
+    return await sync_to_async(_load_version)(name, shared)
+
+
+def get_content_version():
+    """当前内容版本（最后一次内容变化的时间戳）"""
+    return _get_version(CONTENT_VERSION)
+
+
+def get_feed_version():
+    """当前订阅版本（最后一次文章、分类或标签变化的时间戳），侧边栏缓存也使用它"""
+    return _get_version(FEED_VERSION)
+
+
+async def aget_feed_version():
+    return await _aget_version(FEED_VERSION)
+
+
+def bump_content_version(feeds=True):
+    """
+    内容发生变化，更新内容版本；feeds 为 False 时订阅版本不变（如评论变化）
+    在事务中调用时版本随事务提交，共享缓存在提交后才更新，
+    其他进程不会在提交前拿到新版本、把旧内容缓存在新版本下
+    """
+    from .models import ContentVersion
+
+    names = [CONTENT_VERSION, FEED_VERSION] if feeds else [CONTENT_VERSION]
+    now = time.time()
+    if ContentVersion.objects.filter(name__in=names).update(version=now) < len(names):
+        for name in names:
+            ContentVersion.objects.update_or_create(name=name, defaults={'version': now})
+    if is_shared_cache():
+        transaction.on_commit(
+            lambda: cache.set_many({_version_key(name): now for name in names}, VERSION_CACHE_TIMEOUT)
+        )
+
+
+def _is_cacheable_request(request):
+    """只为匿名用户的 GET/HEAD 请求做条件响应"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # 有待显示的提示消息时必须重新渲染
+    return 'messages' not in request.COOKIES
+
+
+def public_page(max_age=0, on_not_modified=None, get_version=get_content_version, exists=None):
+    """
+    公开页面装饰器
+    - 匿名用户：基于内容版本的 ETag / Last-Modified，未变化时返回304；
+      Cache-Control 为 public，max_age 秒内允许浏览器和CDN直接复用
+    - 登录用户：页面包含个人信息，Cache-Control 为 private, no-cache
+    on_not_modified(request, *args, **kwargs) 在返回304时调用（例如记录浏览次数）
+    get_version 返回生成 ETag 用的版本，订阅使用 get_feed_version；
+    读到的版本保存在 request.content_version 中，视图内的缓存键可以直接使用，不必再读一次
+    exists(request, *args, **kwargs) 在即将返回304时调用，返回 False 时不返回304、交给视图处理
+    （ETag 是全站的，文章不存在或已撤回时不能回答"未修改"）
+    同步、异步视图都可以使用；异步视图的用户和缓存检查在线程中执行
+    """
+    def decorator(view_func):
+        def check(request, *args, **kwargs):
+            """视图执行前：返回 (etag, last_modified, 304响应)；不做条件响应时 etag 为 None"""
+            if not _is_cacheable_request(request):
+                return None, None, None
+
+            version = request.content_version = get_version()
+            release = getattr(settings, 'BLOG_RELEASE', '')
+            etag = quote_etag(f'{release}-{version:.6f}')
+            last_modified = int(version)
+
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None and exists is not None and not exists(request, *args, **kwargs):
+                response = None
+            if response is not None and on_not_modified is not None and response.status_code == 304:
+                on_not_modified(request, *args, **kwargs)
+            return etag, last_modified, response
+
+        def finish(request, response, etag, last_modified):
+            if etag is None:
+                if request.method in ('GET', 'HEAD'):
+                    patch_cache_control(response, private=True, no_cache=True)
+            elif response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+                patch_cache_control(response, public=True, max_age=max_age)
+                if max_age == 0:
+                    # 每次都需要向服务器验证（304 的开销很小）
+                    patch_cache_control(response, no_cache=True)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+
+        if iscoroutinefunction(view_func):
+            async def inner(request, *args, **kwargs):
+                etag, last_modified, response = await sync_to_async(check)(request, *args, **kwargs)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return finish(request, response, etag, last_modified)
+        else:
+            def inner(request, *args, **kwargs):
+                etag, last_modified, response = check(request, *args, **kwargs)
+                if response is None:
+                    response = view_func(request, *args, **kwargs)
+                return finish(request, response, etag, last_modified)
+        return wraps(view_func)(inner)
+    return decorator
@@ -0,0 +1,45 @@
+"""
+数据库连接调优
+SQLite 连接建立时（connection_created 信号）执行 settings.BLOG_SQLITE_PRAGMAS 中的 PRAGMA：
+- journal_mode=WAL：读写互不阻塞，多个 gunicorn worker 写浏览次数、评论、活动日志时，读请求不再等待写锁
+- synchronous=NORMAL：WAL 模式下只在检查点时 fsync，掉电最多丢失最近的事务，不会损坏数据库
+- busy_timeout：等待写锁的毫秒数，超时才报 "database is locked"
+- mmap_size / cache_size：内存映射读取和页缓存大小
+PostgreSQL 等其他数据库不受影响；连接复用和健康检查见 settings 中的 CONN_MAX_AGE、CONN_HEALTH_CHECKS
+"""
+import logging
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def sqlite_pragmas():
+    return getattr(settings, 'BLOG_SQLITE_PRAGMAS', {})
+
+
+def apply_pragmas(connection, pragmas):
+    """执行 PRAGMA，返回 {名称: 执行后的值}"""
+    applied = {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            applied[name] = row[0] if row else None
+    return applied
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = sqlite_pragmas()
+    if not pragmas:
+        return
+    applied = apply_pragmas(connection, pragmas)
+    # 内存数据库（如测试）不支持 WAL，journal_mode 会保持为 memory
+    if 'journal_mode' in pragmas and str(applied['journal_mode']).lower() != str(pragmas['journal_mode']).lower():
+        logger.debug("SQLite journal_mode 未能设置为 %s（当前为 %s）", pragmas['journal_mode'], applied['journal_mode'])
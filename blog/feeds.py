@@ -1,28 +1,158 @@
+"""
+RSS / Atom 订阅
+提供全站最新文章、单个分类、单个标签的订阅，每种都有 RSS 2.0 和 Atom 1.0 两种格式。
+订阅阅读器会频繁轮询，所以生成好的 XML 按"订阅版本 + 路径"缓存（cached_feed），
+文章、分类、标签变化时 blog/signals.py 更新订阅版本，所有订阅的缓存和 ETag 同时失效；
+未变化时 public_page 直接返回 304。订阅版本保存在数据库中（见 blog/caching.py），
+输出缓存即使是进程内缓存，其他进程或管理命令更新版本后也不会再命中旧的 XML
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
 from django.contrib.syndication.views import Feed
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
-from .models import Post
+from django.utils.feedgenerator import Atom1Feed
+
+from .caching import get_feed_version, public_page
+from .metrics import record_cache
+from .models import Post, PostTag, Category, Tag
+
+FEED_ITEMS = 20
+
+
+def _cache():
+    return caches[getattr(settings, 'BLOG_FEED_CACHE_ALIAS', 'default')]
+
+
+def cached_feed(feed_view):
+    """
+    缓存订阅的输出，缓存键包含订阅版本，版本更新后旧缓存不再命中、到期后自动清除
+    """
+    @wraps(feed_view)
+    def inner(request, *args, **kwargs):
+        digest = hashlib.md5(request.path.encode(), usedforsecurity=False).hexdigest()
+        # public_page 已经读过订阅版本（登录用户不做条件GET，这里再读）
+        version = getattr(request, 'content_version', None)
+        if version is None:
+            version = get_feed_version()
+        key = f'blog:feed:{version:.6f}:{digest}'
+        cache = _cache()
+        cached = cache.get(key)
+        record_cache('feed', cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = feed_view(request, *args, **kwargs)
+        # Last-Modified 统一由 public_page 按订阅版本设置，和 304 判断保持一致
+        del response['Last-Modified']
+        if response.status_code == 200:
+            timeout = getattr(settings, 'BLOG_FEED_CACHE_TIMEOUT', 86400)
+            cache.set(key, (response.content, response['Content-Type']), timeout)
+        return response
+    return inner
+
+
+def feed_view(feed):
+    """订阅视图：条件GET + 输出缓存"""
+    return public_page(max_age=300, get_version=get_feed_version)(cached_feed(feed))
+
 
 class LatestPostsFeed(Feed):
     """最新文章RSS Feed"""
     title = "我的博客 - 最新文章"
-    link = "/rss/"
     description = "我的博客的最新文章更新"
-    
+
+    def link(self):
+        """订阅对应的网页（文章列表），与分类、标签订阅一致；订阅本身的地址由 Feed 按请求路径生成"""
+        return reverse('blog:post_list')
+
     def items(self):
-        """返回最新的20篇已发布文章"""
-        return Post.objects.filter(status='published').order_by('-created_at')[:20]
-    
+        """返回最新的20篇已发布文章（作者、分类、标签一次取出，不再逐条查询）"""
+        return Post.published.order_by('-created_at', '-id')[:FEED_ITEMS]
+
     def item_title(self, item):
         return item.title
-    
+
     def item_description(self, item):
-        return item.content
-    
+        # 保存时已渲染并过滤过的HTML；旧数据尚未渲染时退回原文
+        return item.content_html or item.content
+
     def item_author_name(self, item):
         return item.author.username
-    
+
+    def item_categories(self, item):
+        return [tag.name for tag in item.tags.all()]
+
     def item_pubdate(self, item):
         return item.created_at
-    
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
     def item_link(self, item):
-        return reverse('blog:post_detail', args=[item.id])
\ No newline at end of file
+        return reverse('blog:post_detail', args=[item.id])
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    """最新文章Atom Feed"""
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class CategoryPostsFeed(LatestPostsFeed):
+    """单个分类的最新文章RSS Feed"""
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Category, slug=slug)
+
+    def title(self, obj):
+        return f"我的博客 - 分类：{obj.name}"
+
+    def link(self, obj):
+        return reverse('blog:category_posts', args=[obj.slug])
+
+    def description(self, obj):
+        return obj.description or f"分类“{obj.name}”的最新文章"
+
+    def items(self, obj):
+        return Post.published.filter(category=obj).order_by('-created_at', '-id')[:FEED_ITEMS]
+
+
+class CategoryPostsAtomFeed(CategoryPostsFeed):
+    """单个分类的最新文章Atom Feed"""
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class TagPostsFeed(LatestPostsFeed):
+    """单个标签的最新文章RSS Feed"""
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Tag, slug=slug)
+
+    def title(self, obj):
+        return f"我的博客 - 标签：{obj.name}"
+
+    def link(self, obj):
+        return reverse('blog:tag_posts', args=[obj.slug])
+
+    def description(self, obj):
+        return f"标签“{obj.name}”的最新文章"
+
+    def items(self, obj):
+        return [link.post for link in PostTag.objects.listing(obj)[:FEED_ITEMS]]
+
+
+class TagPostsAtomFeed(TagPostsFeed):
+    """单个标签的最新文章Atom Feed"""
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from blog import page_cache
+from blog.caching import bump_content_version
+from blog.models import Post
+from blog.rendering import make_excerpt
+
+
+class Command(BaseCommand):
+    help = '为文章生成列表页摘要（默认只处理还没有摘要的文章）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新生成全部文章的摘要')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批处理的文章数')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.only('id', 'content').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(excerpt='')
+
+        count = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for post in batch:
+                post.excerpt = make_excerpt(post.content)
+            Post.objects.bulk_update(batch, ['excerpt'])
+            count += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'已处理 {count} 篇文章')
+
+        if count:
+            bump_content_version()
+            page_cache.purge_all()
+        self.stdout.write(self.style.SUCCESS(f'摘要生成完成，共 {count} 篇文章'))
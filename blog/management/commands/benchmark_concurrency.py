@@ -0,0 +1,233 @@
+"""
+数据库并发基准测试：多个进程同时读写时的读吞吐量
+模拟多个 gunicorn worker：读进程用测试客户端请求文章列表、详情、分类页，
+写进程同时写回浏览次数、发表评论（评论会触发评论数更新、活动日志等写入），
+分别在 SQLite 默认配置和当前 settings 的生产配置（WAL、PRAGMA、连接复用）下测试：
+    python manage.py benchmark_concurrency --readers 4 --writers 2 --duration 10
+数据写在临时目录中的 SQLite 文件里，不影响现有数据库；只支持 SQLite
+"""
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, OperationalError, close_old_connections, connections
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from blog.benchmark import percentiles
+from blog.models import Post, Category, Comment
+from blog.view_counter import apply_view_counts
+
+# SQLite 的默认行为：回滚日志、每次提交 fsync、每个请求新建连接、延迟获取写锁
+SQLITE_DEFAULT_PROFILE = {
+    'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'conn_max_age': 0,
+    'transaction_mode': 'DEFERRED',
+}
+
+
+def production_profile():
+    database = settings.DATABASES[DEFAULT_DB_ALIAS]
+    return {
+        'pragmas': getattr(settings, 'BLOG_SQLITE_PRAGMAS', {}),
+        'conn_max_age': database.get('CONN_MAX_AGE', 0),
+        'transaction_mode': database.get('OPTIONS', {}).get('transaction_mode', 'DEFERRED'),
+    }
+
+
+def use_database(path, profile):
+    """让 default 连接指向 path，并按 profile 设置连接参数（之后新建的连接生效）"""
+    connections.close_all()
+    settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+    settings_dict['NAME'] = path
+    settings_dict['CONN_MAX_AGE'] = profile['conn_max_age']
+    settings_dict['OPTIONS'] = {**settings_dict.get('OPTIONS', {}), 'transaction_mode': profile['transaction_mode']}
+
+
+def reader(urls, deadline, start_at):
+    client = Client()
+    rng = random.Random(os.getpid())
+    latencies, errors = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    while time.time() < deadline:
+        # 与 WSGIHandler 相同，请求前后按 CONN_MAX_AGE 关闭过期连接（测试客户端不会这样做）
+        close_old_connections()
+        start = time.perf_counter()
+        try:
+            response = client.get(rng.choice(urls))
+            if response.status_code != 200:
+                errors += 1
+                continue
+        except OperationalError:
+            errors += 1
+            continue
+        finally:
+            close_old_connections()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, errors
+
+
+def writer(post_ids, user_ids, deadline, start_at):
+    rng = random.Random(os.getpid())
+    latencies, errors = [], 0
+    time.sleep(max(0, start_at - time.time()))
+    while time.time() < deadline:
+        close_old_connections()
+        start = time.perf_counter()
+        try:
+            if rng.random() < 0.5:
+                apply_view_counts({post_id: rng.randint(1, 5) for post_id in rng.sample(post_ids, 20)})
+            else:
+                Comment.objects.create(
+                    post_id=rng.choice(post_ids), author_id=rng.choice(user_ids),
+                    content=f'并发测试评论 {rng.random()}',
+                )
+        except OperationalError:
+            errors += 1
+            continue
+        finally:
+            close_old_connections()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, errors
+
+
+def _run_worker(results, role, target, args):
+    try:
+        results.put((role, *target(*args)))
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = '数据库并发基准测试：有写入时多个进程的读吞吐量（SQLite 默认配置与生产配置对比）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000, help='文章数量')
+        parser.add_argument('--readers', type=int, default=4, help='读进程数')
+        parser.add_argument('--writers', type=int, default=2, help='写进程数')
+        parser.add_argument('--duration', type=float, default=10, help='每种配置的测试时长（秒）')
+        parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+        parser.add_argument('--output', help='把结果以 JSON 格式写入文件')
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('只支持 SQLite 数据库')
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('需要支持 fork 的操作系统')
+
+        profiles = {'sqlite_default': SQLITE_DEFAULT_PROFILE, 'production': production_profile()}
+        original = dict(connections[DEFAULT_DB_ALIAS].settings_dict)
+        directory = tempfile.mkdtemp(prefix='blog-concurrency-')
+        # 关闭整页缓存和只读副本，活动日志同步写入，测量的是数据库本身的并发表现
+        overrides = override_settings(
+            BLOG_PAGE_CACHE_ENABLED=False, BLOG_ACTIVITY_LOG_MODE='sync', BLOG_DATABASE_REPLICAS=[],
+            BLOG_SITEMAP_AUTO_UPDATE=False,
+        )
+        setup_test_environment()
+        overrides.enable()
+        try:
+            template = os.path.join(directory, 'template.sqlite3')
+            self.prepare(template, options)
+            results = []
+            for name, profile in profiles.items():
+                path = os.path.join(directory, f'{name}.sqlite3')
+                shutil.copyfile(template, path)
+                with override_settings(BLOG_SQLITE_PRAGMAS=profile['pragmas']):
+                    use_database(path, profile)
+                    self.stderr.write(f'测试配置：{name}')
+                    results.append({'profile': name, **self.run_profile(options)})
+        finally:
+            overrides.disable()
+            teardown_test_environment()
+            connections.close_all()
+            connections[DEFAULT_DB_ALIAS].settings_dict.update(original)
+            shutil.rmtree(directory, ignore_errors=True)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'options': options, 'results': results}, f, ensure_ascii=False, indent=2, default=str)
+        self.print_table(results)
+
+    def prepare(self, path, options):
+        """生成测试数据；复制前切回回滚日志模式，保证数据都在主文件中"""
+        self.stderr.write(f'生成数据：{options["posts"]} 篇文章...')
+        with override_settings(BLOG_SQLITE_PRAGMAS={}):
+            use_database(path, SQLITE_DEFAULT_PROFILE)
+            call_command('migrate', verbosity=0)
+            call_command(
+                'seed_data', posts=options['posts'], users=max(options['posts'] // 100, 10),
+                seed=options['seed'], render=True, stdout=StringIO(),
+            )
+            connections.close_all()
+        with closing(sqlite3.connect(path)) as db:
+            db.execute('PRAGMA journal_mode = delete')
+
+    def run_profile(self, options):
+        published = list(Post.published.values_list('id', flat=True))
+        user_ids = list(User.objects.values_list('id', flat=True))
+        categories = list(Category.objects.values_list('slug', flat=True))
+        urls = (
+            [reverse('blog:post_list')]
+            + [reverse('blog:post_detail', args=[post_id]) for post_id in published[:200]]
+            + [reverse('blog:category_posts', args=[slug]) for slug in categories]
+        )
+        for alias in ('default', 'pages'):
+            caches[alias].clear()
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        start_at = time.time() + 1   # 等所有进程启动后同时开始
+        deadline = start_at + options['duration']
+        workers = [
+            context.Process(target=_run_worker, args=(results, 'read', reader, (urls, deadline, start_at)))
+            for _ in range(options['readers'])
+        ] + [
+            context.Process(target=_run_worker, args=(results, 'write', writer, (published, user_ids, deadline, start_at)))
+            for _ in range(options['writers'])
+        ]
+        for process in workers:
+            process.start()
+        collected = {'read': ([], 0), 'write': ([], 0)}
+        for _ in workers:
+            role, latencies, errors = results.get()
+            collected[role] = (collected[role][0] + latencies, collected[role][1] + errors)
+        for process in workers:
+            process.join()
+
+        summary = {}
+        for role, (latencies, errors) in collected.items():
+            points = percentiles(latencies) if latencies else {50: 0.0, 95: 0.0, 99: 0.0}
+            summary[role] = {
+                'ops': len(latencies),
+                'per_second': round(len(latencies) / options['duration'], 1),
+                'p50_ms': round(points[50], 2),
+                'p95_ms': round(points[95], 2),
+                'mean_ms': round(statistics.fmean(latencies), 2) if latencies else 0.0,
+                'errors': errors,
+            }
+        return summary
+
+    def print_table(self, results):
+        header = f"{'配置':<16}{'读/秒':>9}{'读p50':>9}{'读p95':>9}{'读错误':>8}{'写/秒':>9}{'写p95':>9}{'写错误':>8}"
+        self.stdout.write(header)
+        for item in results:
+            read, write = item['read'], item['write']
+            self.stdout.write(
+                f"{item['profile']:<16}{read['per_second']:>10.1f}{read['p50_ms']:>10.2f}{read['p95_ms']:>10.2f}"
+                f"{read['errors']:>10}{write['per_second']:>10.1f}{write['p95_ms']:>10.2f}{write['errors']:>10}"
+            )
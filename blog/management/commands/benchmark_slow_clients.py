@@ -0,0 +1,158 @@
+"""
+慢客户端压力测试：对比同步 WSGI 和异步 ASGI 部署
+慢客户端逐行缓慢发送请求头、缓慢读取响应（如移动网络），同步 worker 在此期间被占用；
+同时运行的普通客户端测量页面的吞吐量和响应时间。先分别启动两种服务器：
+    gunicorn blog_site.wsgi:application -w 4 -b 127.0.0.1:8000
+    BLOG_ASGI=true gunicorn blog_site.asgi:application -w 4 -k uvicorn.workers.UvicornWorker -b 127.0.0.1:8001
+再运行：
+    python manage.py benchmark_slow_clients --target wsgi=http://127.0.0.1:8000/blog/ \\
+        --target asgi=http://127.0.0.1:8001/blog/ --slow-clients 50 --clients 10 --duration 20
+客户端直接使用 asyncio 的 TCP 连接（HTTP/1.1，每个请求一个连接），不依赖第三方库
+"""
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.benchmark import percentiles
+
+
+class Target:
+    def __init__(self, name, url):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError(f'只支持 http:// 地址：{url}')
+        self.name = name
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.netloc = parts.netloc
+        self.path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+    def request_head(self, path):
+        return f'GET {path} HTTP/1.1\r\nHost: {self.netloc}\r\nConnection: close\r\nUser-Agent: blog-benchmark\r\n'
+
+
+async def fetch(target, path, timeout):
+    """普通客户端：发送完整请求并读完响应，返回状态码"""
+    async def run():
+        reader, writer = await asyncio.open_connection(target.host, target.port)
+        try:
+            writer.write((target.request_head(path) + '\r\n').encode())
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+    return await asyncio.wait_for(run(), timeout)
+
+
+async def slow_fetch(target, path, headers, interval, timeout):
+    """慢客户端：每隔 interval 秒发送一行请求头，再每隔 interval 秒读取 1KB 响应"""
+    async def run():
+        reader, writer = await asyncio.open_connection(target.host, target.port)
+        try:
+            writer.write(target.request_head(path).encode())
+            for number in range(headers):
+                await asyncio.sleep(interval)
+                writer.write(f'X-Slow-{number}: {"x" * 32}\r\n'.encode())
+                await writer.drain()
+            writer.write(b'\r\n')
+            await writer.drain()
+            status_line = await reader.readline()
+            while await reader.read(1024):
+                await asyncio.sleep(interval)
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+    return await asyncio.wait_for(run(), timeout)
+
+
+async def run_target(target, options):
+    deadline = time.monotonic() + options['duration']
+    latencies, errors, slow_done = [], 0, 0
+
+    async def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(target, target.path, options['timeout'])
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    async def slow_client():
+        nonlocal slow_done
+        while time.monotonic() < deadline:
+            try:
+                await slow_fetch(
+                    target, target.path, options['slow_headers'], options['slow_interval'],
+                    options['timeout'] + options['slow_headers'] * options['slow_interval'] * 2,
+                )
+                slow_done += 1
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                pass
+
+    slow = [asyncio.create_task(slow_client()) for _ in range(options['slow_clients'])]
+    # 等慢客户端先占住连接，再开始计时的普通请求
+    await asyncio.sleep(min(1.0, options['duration'] / 4))
+    await asyncio.gather(*(client() for _ in range(options['clients'])))
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+    points = percentiles(latencies) if latencies else {50: 0.0, 95: 0.0, 99: 0.0}
+    return {
+        'target': target.name,
+        'requests': len(latencies),
+        'per_second': round(len(latencies) / options['duration'], 1),
+        'p50_ms': round(points[50], 2),
+        'p95_ms': round(points[95], 2),
+        'p99_ms': round(points[99], 2),
+        'errors': errors,
+        'slow_completed': slow_done,
+    }
+
+
+class Command(BaseCommand):
+    help = '慢客户端压力测试：对比同步 WSGI 与异步 ASGI 部署的吞吐量和响应时间（需要先启动服务器）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True, metavar='NAME=URL',
+            help='测试的页面地址，如 wsgi=http://127.0.0.1:8000/blog/，可多次指定',
+        )
+        parser.add_argument('--clients', type=int, default=10, help='并发的普通客户端数')
+        parser.add_argument('--slow-clients', type=int, default=50, help='并发的慢客户端数')
+        parser.add_argument('--slow-headers', type=int, default=10, help='慢客户端逐行发送的请求头数')
+        parser.add_argument('--slow-interval', type=float, default=0.5, help='慢客户端每次发送、读取的间隔（秒）')
+        parser.add_argument('--duration', type=float, default=20, help='每个目标的测试时长（秒）')
+        parser.add_argument('--timeout', type=float, default=10, help='普通请求的超时时间（秒）')
+        parser.add_argument('--output', help='把结果以 JSON 格式写入文件')
+
+    def handle(self, *args, **options):
+        try:
+            targets = [Target(*item.split('=', 1)) for item in options['target']]
+        except TypeError:
+            raise CommandError('--target 格式应为 NAME=URL')
+
+        results = []
+        for target in targets:
+            self.stderr.write(f'测试 {target.name}：{options["slow_clients"]} 个慢客户端，{options["clients"]} 个普通客户端')
+            results.append(asyncio.run(run_target(target, options)))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump({'options': options, 'results': results}, f, ensure_ascii=False, indent=2, default=str)
+        self.stdout.write(f"{'目标':<10}{'请求/秒':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'错误':>7}{'慢请求完成':>8}")
+        for item in results:
+            self.stdout.write(
+                f"{item['target']:<12}{item['per_second']:>10.1f}{item['p50_ms']:>10.2f}{item['p95_ms']:>10.2f}"
+                f"{item['p99_ms']:>10.2f}{item['errors']:>9}{item['slow_completed']:>10}"
+            )
@@ -0,0 +1,158 @@
+"""
+博客页面性能基准测试
+在独立的测试数据库中按不同规模生成数据，用测试客户端请求各页面，输出响应时间分位数、
+SQL 查询数和耗时、内存峰值：
+    python manage.py benchmark_views --sizes 1000,10000 --output bench.json
+与之前的结果对比，p95 变慢超过 20% 或超过预算时命令失败（可用于CI）：
+    python manage.py benchmark_views --baseline bench.json --max-regression 0.2 --budget post_list=50
+"""
+import json
+import platform
+import random
+import subprocess
+from io import StringIO
+
+import django
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import reverse
+
+from blog import view_counter
+from blog.benchmark import find_regressions, measure
+from blog.models import Post, Category, Tag
+
+SEARCH_QUERIES = ['Django', '性能优化', 'Redis 缓存', '数据库迁移', 'PostgreSQL']
+
+
+class Command(BaseCommand):
+    help = '对博客主要页面做性能基准测试（在测试数据库中进行，不影响现有数据）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000', help='数据规模（文章数），逗号分隔')
+        parser.add_argument('--requests', type=int, default=50, help='每个页面的请求次数')
+        parser.add_argument('--warmup', type=int, default=5, help='正式计时前的预热请求次数')
+        parser.add_argument('--endpoints', default='', help='只测试这些页面，逗号分隔（默认全部）')
+        parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+        parser.add_argument('--output', help='把结果以 JSON 格式写入文件')
+        parser.add_argument('--json', action='store_true', help='在标准输出打印 JSON 而不是表格')
+        parser.add_argument('--baseline', help='作为对比基准的 JSON 结果文件')
+        parser.add_argument('--max-regression', type=float, default=0.2, help='允许的 p95 退化比例')
+        parser.add_argument(
+            '--budget', action='append', default=[], metavar='ENDPOINT=MS',
+            help='页面 p95 的预算（毫秒），可多次指定',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            sizes = sorted(int(size) for size in options['sizes'].split(','))
+            budgets = {
+                name: float(ms) for name, ms in (item.split('=', 1) for item in options['budget'])
+            }
+        except ValueError:
+            raise CommandError('--sizes 或 --budget 格式错误')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        results = self.run(sizes, options)
+        report = {'meta': self.metadata(options), 'results': results}
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+        else:
+            self.print_table(results)
+
+        problems = find_regressions(results, baseline, options['max_regression'], budgets)
+        if problems:
+            for problem in problems:
+                self.stderr.write(f'⚠️ {problem}')
+            raise CommandError(f'发现 {len(problems)} 项性能退化')
+        if baseline or budgets:
+            self.stderr.write(self.style.SUCCESS('✅ 没有发现性能退化'))
+
+    def run(self, sizes, options):
+        """创建测试数据库，逐级补充数据并测试"""
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # 基准测试只用 GET 请求；关闭整页缓存，测量的是视图本身的开销
+            with override_settings(BLOG_PAGE_CACHE_ENABLED=False, BLOG_ACTIVITY_LOG_MODE='sync'):
+                results = []
+                for size in sizes:
+                    missing = size - Post.objects.count()
+                    if missing > 0:
+                        self.stderr.write(f'生成数据：{size} 篇文章...')
+                        call_command(
+                            'seed_data', posts=missing, users=max(size // 100, 10),
+                            tags=min(max(size // 50, 10), 500), categories=min(max(size // 1000, 5), 30),
+                            seed=options['seed'] + size, render=True, stdout=StringIO(),
+                        )
+                    results.extend(self.run_size(size, options))
+                return results
+        finally:
+            view_counter.flush()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def endpoints(self, rng):
+        """页面名称 → URL（或每次返回不同 URL 的函数）"""
+        published = list(Post.published.order_by('?').values_list('id', flat=True)[:200])
+        category = Category.objects.order_by('id').first()
+        tag = Tag.objects.order_by('id').first()
+        return {
+            'post_list': reverse('blog:post_list'),
+            'post_detail': lambda: reverse('blog:post_detail', args=[rng.choice(published)]),
+            'search_posts': lambda: reverse('blog:search_posts') + '?q=' + rng.choice(SEARCH_QUERIES),
+            'category_posts': reverse('blog:category_posts', args=[category.slug]),
+            'tag_posts': reverse('blog:tag_posts', args=[tag.slug]),
+            'activity_log': reverse('blog:activity_log'),
+            'rss_feed': reverse('blog:rss_feed'),
+        }
+
+    def run_size(self, size, options):
+        rng = random.Random(options['seed'])
+        selected = [name for name in options['endpoints'].split(',') if name]
+        client = Client()
+        results = []
+        for name, url in self.endpoints(rng).items():
+            if selected and name not in selected:
+                continue
+            for alias in ('default', 'pages'):
+                caches[alias].clear()
+            self.stderr.write(f'  {size} 篇文章：{name}')
+            stats = measure(client, url, options['requests'], options['warmup'])
+            results.append({'size': size, 'endpoint': name, **stats})
+        return results
+
+    def metadata(self, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = ''
+        return {
+            'commit': commit,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'requests': options['requests'],
+            'seed': options['seed'],
+        }
+
+    def print_table(self, results):
+        header = f"{'规模':>8}  {'页面':<16}{'p50':>9}{'p95':>9}{'p99':>9}{'查询数':>8}{'查询ms':>9}{'内存KB':>10}"
+        self.stdout.write(header)
+        for item in results:
+            self.stdout.write(
+                f"{item['size']:>10}  {item['endpoint']:<16}{item['p50_ms']:>9.2f}{item['p95_ms']:>9.2f}"
+                f"{item['p99_ms']:>9.2f}{item['queries']:>10.1f}{item['query_ms']:>10.2f}{item['peak_memory_kb']:>11.1f}"
+            )
@@ -0,0 +1,81 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from blog.models import Post, PostTag, Category, Tag, ActivityLog
+from blog.navigation import adjacent_queryset
+
+
+class Command(BaseCommand):
+    help = '对博客的主要查询执行 EXPLAIN，检查是否使用了索引'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='文章数少于该值时，先批量生成测试数据（文章、评论、活动日志）',
+        )
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            self.seed(options['seed'])
+
+        # 更新统计信息，让查询规划器基于真实的数据分布选择索引
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        for title, queryset in self.queries():
+            plan = queryset.explain()
+            problems = self.check_plan(plan)
+            if problems:
+                self.stdout.write(self.style.WARNING(f"⚠️ {title}（{'，'.join(problems)}）"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✅ {title}'))
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+            self.stdout.write('')
+
+    def queries(self):
+        """各页面的典型查询，与视图中的写法保持一致"""
+        post = Post.published.order_by('created_at').first()
+        category = Category.objects.first()
+        tag = Tag.objects.first()
+        user = User.objects.first()
+        now = timezone.now()
+
+        yield '文章列表第一页', Post.published.order_by('-created_at', '-id')[:11]
+        yield '文章列表深层页（游标）', Post.published.filter(created_at__lte=now).filter(
+            Q(created_at__lt=now) | Q(id__lt=0)
+        ).order_by('-created_at', '-id')[:11]
+        if category:
+            yield '分类文章列表', Post.published.filter(category=category).order_by('-created_at', '-id')[:11]
+        if tag:
+            yield '标签文章列表', PostTag.objects.listing(tag)[:11]
+        yield '草稿列表', Post.objects.filter(status='draft').order_by('-created_at')
+        if post:
+            yield '文章评论', post.comments.filter(is_active=True).order_by('-created_at')
+            published = Post.objects.filter(status='published')
+            yield '上一篇', adjacent_queryset(published, post.created_at, post.pk, newer=False)[:1]
+            yield '下一篇', adjacent_queryset(published, post.created_at, post.pk, newer=True)[:1]
+        yield '活动日志', ActivityLog.objects.order_by('-created_at')[:50]
+        yield '活动日志（按操作类型筛选）', ActivityLog.objects.filter(action='create_post').order_by('-created_at')[:100]
+        if user:
+            yield '活动日志（按用户筛选）', ActivityLog.objects.filter(user=user).order_by('-created_at')[:100]
+
+    def check_plan(self, plan):
+        """根据执行计划（SQLite 或 PostgreSQL 格式）找出全表扫描和额外排序"""
+        problems = []
+        for line in plan.upper().splitlines():
+            if ('SCAN BLOG_' in line and 'USING' not in line) or 'SEQ SCAN ON BLOG_' in line:
+                problems.append('全表扫描')
+            if 'TEMP B-TREE FOR ORDER BY' in line or line.strip().startswith('SORT'):
+                problems.append('需要额外排序')
+        return sorted(set(problems))
+
+    def seed(self, target):
+        """文章数少于 target 时用 seed_data 补足测试数据"""
+        missing = target - Post.objects.count()
+        if missing > 0:
+            call_command('seed_data', posts=missing, skip_search_index=True, stdout=self.stdout)
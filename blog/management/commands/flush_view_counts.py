@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from blog.caching import is_shared_cache
+from blog.view_counter import get_view_counter, CacheViewCountBuffer
+
+
+class Command(BaseCommand):
+    help = '把缓冲区中的文章浏览次数立即写回数据库'
+
+    def handle(self, *args, **options):
+        counter = get_view_counter()
+
+        if isinstance(counter, CacheViewCountBuffer):
+            alias = getattr(settings, 'BLOG_VIEW_COUNT_CACHE_ALIAS', 'default')
+            if not is_shared_cache(alias):
+                # 进程内缓存中的计数只属于各个worker进程，命令行进程读到的总是空的
+                raise CommandError(
+                    f'浏览次数缓冲区使用的缓存 "{alias}" 是进程内缓存，无法在命令中写回；'
+                    '请为 BLOG_VIEW_COUNT_CACHE_ALIAS 配置共享缓存（如设置 REDIS_URL）'
+                )
+            flushed = counter.flush_all()
+        else:
+            # 进程内缓冲区只属于各个worker进程，命令行进程无法访问
+            self.stdout.write(self.style.WARNING(
+                '当前使用进程内缓冲区（BLOG_VIEW_COUNT_BUFFER = "memory"），'
+                '各worker会在定时器触发或退出时自行写回；'
+                '如需通过命令强制写回，请改用共享缓存（"cache"）模式'
+            ))
+            flushed = counter.flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'已写回 {flushed} 次浏览')
+        )
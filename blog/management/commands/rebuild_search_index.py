@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from blog.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = '重建文章全文搜索索引'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(
+            self.style.SUCCESS(f'搜索索引重建完成（后端：{backend.name}，共 {count} 篇文章）')
+        )
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from blog import page_cache
+from blog.caching import bump_content_version
+from blog.models import Post
+from blog.rendering import current_version, render_markdown
+
+
+class Command(BaseCommand):
+    help = '重新渲染文章正文（默认只处理渲染器版本过期或尚未渲染的文章）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='重新渲染全部文章')
+        parser.add_argument('--batch-size', type=int, default=500, help='每批处理的文章数')
+
+    def handle(self, *args, **options):
+        queryset = Post.objects.only('id', 'content').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(~Q(content_html_version=current_version()) | Q(content_html=''))
+
+        count = 0
+        last_id = 0
+        while True:
+            # 按主键分批，每批一个 bulk_update，不需要一次把所有文章读入内存
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for post in batch:
+                post.content_html, post.content_html_version = render_markdown(post.content)
+            Post.objects.bulk_update(batch, ['content_html', 'content_html_version'])
+            count += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'已渲染 {count} 篇文章')
+
+        if count:
+            # bulk_update 不触发信号，手动让页面缓存失效
+            bump_content_version()
+            page_cache.purge_all()
+        self.stdout.write(self.style.SUCCESS(f'渲染完成，共 {count} 篇文章（渲染器版本 {current_version()}）'))
@@ -0,0 +1,32 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = '本地模拟副本：把 SQLite 主库的当前内容复制到 SQLite 副本文件（BLOG_SQLITE_REPLICA=true）'
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replicas = [
+            alias for alias in settings.BLOG_DATABASE_REPLICAS
+            if settings.DATABASES[alias]['ENGINE'].endswith('sqlite3')
+        ]
+        if not primary['ENGINE'].endswith('sqlite3') or not replicas:
+            raise CommandError('主库和副本都是 SQLite 时才能使用，请设置 BLOG_SQLITE_REPLICA=true')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in replicas:
+                # SQLite 在线备份接口，复制过程中主库可以继续读写
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'{alias}：已从主库复制')
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS('副本已同步'))
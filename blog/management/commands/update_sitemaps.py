@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from blog.models import SitemapShard
+from blog.sitemaps import SECTIONS, update_sitemaps
+
+
+class Command(BaseCommand):
+    help = '更新站点地图分片（只重新生成内容发生变化的分片）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--section', action='append', choices=sorted(SECTIONS), help='只更新这一类，可多次指定'
+        )
+        parser.add_argument('--rebuild', action='store_true', help='删除已有分片后全部重新生成')
+
+    def handle(self, *args, **options):
+        sections = options['section'] or list(SECTIONS)
+        if options['rebuild']:
+            SitemapShard.objects.filter(section__in=sections).delete()
+
+        for name, (regenerated, removed) in update_sitemaps(sections).items():
+            total = SitemapShard.objects.filter(section=name).count()
+            self.stdout.write(f'{name}：共 {total} 个分片，重新生成 {regenerated} 个，删除 {removed} 个')
+        self.stdout.write(self.style.SUCCESS('站点地图已更新'))
@@ -0,0 +1,403 @@
+"""
+运行指标（Prometheus 文本格式）
+进程内维护计数器（Counter）、仪表（Gauge）和直方图（Histogram），由 /metrics 输出：
+- blog_http_requests_total / blog_http_request_duration_seconds：按 URL 名称统计请求数和耗时
+- blog_db_queries_per_request：每个请求的SQL查询数
+- blog_view_count_buffer_pending：浏览次数缓冲区中尚未写回的次数
+- blog_activity_logs_written_total、blog_comments_total：活动日志写入数、评论提交数
+- blog_comments_rejected_total：因频率限制或垃圾评论检查被拒绝的评论数（按原因）
+- blog_cache_requests_total：侧边栏、整页缓存等各处缓存的命中/未命中次数
+
+多进程（gunicorn 多个 worker）：设置 settings.BLOG_METRICS_MULTIPROCESS_DIR 后，
+每个进程定期（BLOG_METRICS_FLUSH_INTERVAL 秒）把自己的指标快照写入该目录下的 <pid>.json，
+/metrics 合并所有快照：计数器和直方图求和（已退出进程的数据保留，计数器不会倒退），
+仪表只合并仍在运行的进程。gunicorn 主进程启动时清空该目录（见 gunicorn.conf.py）
+"""
+import atexit
+import json
+import math
+import os
+import secrets
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import Http404, HttpResponse
+
+from .profiling import QueryRecorder
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self):
+        """[(标签元组, 值), ...]"""
+        with self._lock:
+            return [(key, self._copy(value)) for key, value in self._values.items()]
+
+    def _copy(self, value):
+        return value
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        _ensure_exporter()
+
+
+class Gauge(Metric):
+    """
+    仪表；function 不为空时在输出时调用它获取当前值（只适用于没有标签的仪表）
+    多进程模式下各进程的值相加
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        _ensure_exporter()
+
+    def samples(self):
+        if self.function is not None:
+            try:
+                return [((), float(self.function()))]
+            except Exception:
+                return []
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [各区间的计数..., 总和]，输出时再转成累计计数
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[index] += 1
+                    break
+            data[-1] += value
+        _ensure_exporter()
+
+    def _copy(self, value):
+        return list(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'指标 {metric.name} 已注册')
+            self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self):
+        """当前进程的全部指标，可以序列化为JSON"""
+        data = {}
+        for metric in list(self._metrics.values()):
+            entry = {'type': metric.type, 'help': metric.documentation, 'samples': metric.samples()}
+            if isinstance(metric, Histogram):
+                entry['buckets'] = [bound if bound != math.inf else 'inf' for bound in metric.buckets]
+            data[metric.name] = entry
+        return data
+
+
+registry = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return registry.register(Counter(name, documentation, labelnames))
+
+
+def gauge(name, documentation, labelnames=(), function=None):
+    return registry.register(Gauge(name, documentation, labelnames, function))
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return registry.register(Histogram(name, documentation, labelnames, buckets))
+
+
+# ---------- 多进程：快照文件 ----------
+
+def _multiprocess_dir():
+    return getattr(settings, 'BLOG_METRICS_MULTIPROCESS_DIR', '')
+
+
+def write_snapshot():
+    """把当前进程的指标写入快照文件（先写临时文件再改名，读取方不会读到半个文件）"""
+    directory = _multiprocess_dir()
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    temp = f'{path}.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump({'pid': os.getpid(), 'metrics': registry.snapshot()}, f)
+    os.replace(temp, path)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_snapshots():
+    directory = _multiprocess_dir()
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # 进程正在写入或文件已损坏，跳过这一次
+    return snapshots
+
+
+def _merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        alive = _process_alive(snapshot['pid'])
+        for name, entry in snapshot['metrics'].items():
+            if entry['type'] == 'gauge' and not alive:
+                continue
+            target = merged.setdefault(name, {**entry, 'samples': {}})
+            for labels, value in entry['samples']:
+                key = tuple(tuple(pair) for pair in labels)
+                if isinstance(value, list):
+                    previous = target['samples'].get(key, [0] * len(value))
+                    target['samples'][key] = [a + b for a, b in zip(previous, value)]
+                else:
+                    target['samples'][key] = target['samples'].get(key, 0) + value
+    for entry in merged.values():
+        entry['samples'] = list(entry['samples'].items())
+    return merged
+
+
+def collect():
+    """需要输出的指标：单进程时为本进程的指标，多进程时为所有进程合并后的指标"""
+    if not _multiprocess_dir():
+        return registry.snapshot()
+    write_snapshot()
+    return _merge(_read_snapshots())
+
+
+def render():
+    """Prometheus 文本格式（text/plain; version=0.0.4）"""
+    lines = []
+    for name, entry in sorted(collect().items()):
+        lines.append(f'# HELP {name} {entry["help"]}')
+        lines.append(f'# TYPE {name} {entry["type"]}')
+        for labels, value in entry['samples']:
+            labels = tuple(tuple(pair) for pair in labels)
+            if entry['type'] != 'histogram':
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(entry['buckets'], value[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == 'inf' else _format_value(bound)
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class _Exporter:
+    """多进程模式下定期写入快照的后台线程（在 fork 之后首次更新指标时启动）"""
+
+    def __init__(self):
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def ensure(self):
+        if self.pid == os.getpid() or not _multiprocess_dir():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            threading.Thread(target=self.run, name='metrics-exporter', daemon=True).start()
+
+    def run(self):
+        interval = getattr(settings, 'BLOG_METRICS_FLUSH_INTERVAL', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                write_snapshot()
+            except OSError:
+                pass
+
+
+_exporter = _Exporter()
+
+
+def _ensure_exporter():
+    _exporter.ensure()
+
+
+def _write_snapshot_at_exit():
+    if _exporter.pid == os.getpid():
+        write_snapshot()
+
+
+atexit.register(_write_snapshot_at_exit)
+
+
+# ---------- 博客的指标 ----------
+
+def _view_count_pending():
+    from .view_counter import get_view_counter
+    return get_view_counter().pending()
+
+
+def _activity_log_pending():
+    from . import activity
+    return activity._writer.pending() if activity._writer is not None else 0
+
+
+http_requests = counter(
+    'blog_http_requests_total', '按URL名称统计的请求数', ('view', 'method', 'status')
+)
+http_request_duration = histogram(
+    'blog_http_request_duration_seconds', '按URL名称统计的请求耗时（秒）', ('view',)
+)
+db_queries_per_request = histogram(
+    'blog_db_queries_per_request', '每个请求的SQL查询数', ('view',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+view_count_buffer_pending = gauge(
+    'blog_view_count_buffer_pending', '浏览次数缓冲区中尚未写回数据库的次数', function=_view_count_pending
+)
+activity_log_queue_pending = gauge(
+    'blog_activity_log_queue_pending', '活动日志队列中等待写入的条数', function=_activity_log_pending
+)
+activity_logs_written = counter('blog_activity_logs_written_total', '写入数据库的活动日志条数')
+comments_created = counter('blog_comments_total', '通过检查并保存的评论数')
+comments_rejected = counter(
+    'blog_comments_rejected_total', '被拒绝的评论提交数（rate_limited、links、keyword、duplicate 等）', ('reason',)
+)
+cache_requests = counter(
+    'blog_cache_requests_total', '各处缓存的命中/未命中次数', ('cache', 'result')
+)
+
+
+def record_cache(name, hit):
+    cache_requests.inc(cache=name, result='hit' if hit else 'miss')
+
+
+# ---------- 中间件和 /metrics 视图 ----------
+
+class MetricsMiddleware:
+    """统计每个请求的次数、耗时和SQL查询数（按URL名称，而不是路径，避免标签数量失控）；同步、异步请求都可以使用"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BLOG_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryRecorder()
+        start = time.perf_counter()
+        with queries.record():
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryRecorder()
+        start = time.perf_counter()
+        async with queries.arecord():
+            response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start, queries)
+        return response
+
+    def observe(self, request, response, elapsed, queries):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        http_requests.inc(view=view, method=request.method, status=response.status_code)
+        http_request_duration.observe(elapsed, view=view)
+        db_queries_per_request.observe(queries.count, view=view)
+
+
+def metrics_view(request):
+    """
+    Prometheus 抓取端点
+    设置了 BLOG_METRICS_TOKEN 时需要 Authorization: Bearer <token>；
+    没有设置令牌时只在 DEBUG 模式下开放
+    """
+    if not getattr(settings, 'BLOG_METRICS_ENABLED', False):
+        raise Http404
+    token = getattr(settings, 'BLOG_METRICS_TOKEN', '')
+    if token:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+        if not secrets.compare_digest(supplied.encode(), token.encode()):
+            return HttpResponse('Unauthorized', status=401, content_type='text/plain')
+    elif not settings.DEBUG:
+        raise Http404
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:02
+
+from collections import defaultdict
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'blog_post_fts'
+# 与 SearchPosting.term 的长度一致，超长的词项不进入索引
+MAX_TERM_LENGTH = 100
+BATCH_SIZE = 500
+
+# 迁移编写时二元分词器的固定副本：以后修改 blog.search.tokenizers 或 BLOG_SEARCH_TOKENIZER 不会改变这个迁移的结果
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+TOKEN_RE = re.compile(rf'(?P<cjk>[{CJK_CHARS}]+)|(?P<word>[^\W_{CJK_CHARS}]+)')
+
+
+def tokenize(text):
+    terms = []
+    for match in TOKEN_RE.finditer(unicodedata.normalize('NFKC', text).lower()):
+        run = match.group('cjk')
+        if run is None:
+            terms.append(match.group('word'))
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def rebuild_search_index(apps, schema_editor):
+    """
+    用二元分词器重建搜索索引：填充新建的倒排索引表，FTS5 表中原有的内容未经分词，也重新写入
+    只使用历史模型和上面的分词器副本，不调用当前的搜索后端；以后更换分词器或后端时运行 rebuild_search_index 命令
+    """
+    connection = schema_editor.connection
+    db = connection.alias
+    Post = apps.get_model('blog', 'Post')
+    SearchDocument = apps.get_model('blog', 'SearchDocument')
+    SearchPosting = apps.get_model('blog', 'SearchPosting')
+    use_fts = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    if use_fts:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+    def write(documents, postings, fts_rows):
+        SearchDocument.objects.using(db).bulk_create(documents)
+        SearchPosting.objects.using(db).bulk_create(postings, batch_size=5000)
+        if use_fts:
+            with connection.cursor() as cursor:
+                cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)", fts_rows)
+
+    # 按批写入，内存占用与文章总数无关
+    rows = Post.objects.using(db).order_by('id').values_list('id', 'title', 'content').iterator(chunk_size=BATCH_SIZE)
+    documents, postings, fts_rows = [], [], []
+    for post_id, title, content in rows:
+        terms = {'title': tokenize(title), 'content': tokenize(content)}
+        documents.append(SearchDocument(post_id=post_id, title_length=len(terms['title']), content_length=len(terms['content'])))
+        for field, field_terms in terms.items():
+            positions = defaultdict(list)
+            for position, term in enumerate(field_terms):
+                if len(term) <= MAX_TERM_LENGTH:
+                    positions[term].append(position)
+            postings.extend(
+                SearchPosting(term=term, post_id=post_id, field=field, positions=term_positions)
+                for term, term_positions in positions.items()
+            )
+        fts_rows.append([post_id, ' '.join(terms['title']), ' '.join(terms['content'])])
+        if len(documents) >= BATCH_SIZE:
+            write(documents, postings, fts_rows)
+            documents, postings, fts_rows = [], [], []
+    write(documents, postings, fts_rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_post_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='blog.post', verbose_name='文章')),
+                ('title_length', models.PositiveIntegerField(default=0, verbose_name='标题词项数')),
+                ('content_length', models.PositiveIntegerField(default=0, verbose_name='正文词项数')),
+            ],
+            options={
+                'verbose_name': '搜索文档',
+                'verbose_name_plural': '搜索文档',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=100, verbose_name='词项')),
+                ('field', models.CharField(choices=[('title', '标题'), ('content', '正文')], max_length=10, verbose_name='字段')),
+                ('positions', models.JSONField(default=list, verbose_name='出现位置')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_postings', to='blog.post', verbose_name='文章')),
+            ],
+            options={
+                'verbose_name': '倒排索引',
+                'verbose_name_plural': '倒排索引',
+            },
+        ),
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:07
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0008_search_inverted_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='操作时间'),
+        ),
+    ]
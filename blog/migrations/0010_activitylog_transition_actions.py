@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0009_activitylog_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='activitylog',
+            name='action',
+            field=models.CharField(choices=[('create_post', '创建文章'), ('update_post', '更新文章'), ('delete_post', '删除文章'), ('publish_post', '发布文章'), ('archive_post', '归档文章'), ('draft_post', '撤回文章'), ('create_user', '用户注册')], max_length=20, verbose_name='操作类型'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+def render_existing_posts(apps, schema_editor):
+    """渲染已有文章的正文"""
+    from blog.rendering import render_markdown
+
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=500):
+        post.content_html, post.content_html_version = render_markdown(post.content)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['content_html', 'content_html_version'])
+            batch = []
+    Post.objects.bulk_update(batch, ['content_html', 'content_html_version'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0012_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='渲染后的内容'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html_version',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='渲染器版本'),
+        ),
+        migrations.RunPython(render_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:24
+
+from django.db import migrations, models
+
+
+def backfill_excerpts(apps, schema_editor):
+    """为已有文章生成摘要"""
+    from blog.rendering import make_excerpt
+
+    Post = apps.get_model('blog', 'Post')
+    batch = []
+    for post in Post.objects.only('id', 'content').iterator(chunk_size=500):
+        post.excerpt = make_excerpt(post.content)
+        batch.append(post)
+        if len(batch) >= 500:
+            Post.objects.bulk_update(batch, ['excerpt'])
+            batch = []
+    Post.objects.bulk_update(batch, ['excerpt'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0013_post_content_html'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=300, verbose_name='摘要'),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_post_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(max_length=20, verbose_name='类型')),
+                ('number', models.PositiveIntegerField(verbose_name='分片序号')),
+                ('fingerprint', models.CharField(max_length=32, verbose_name='内容指纹')),
+                ('content', models.TextField(verbose_name='XML内容')),
+                ('url_count', models.PositiveIntegerField(default=0, verbose_name='URL数')),
+                ('lastmod', models.DateTimeField(blank=True, null=True, verbose_name='最后修改时间')),
+                ('generated_at', models.DateTimeField(auto_now=True, verbose_name='生成时间')),
+            ],
+            options={
+                'verbose_name': '站点地图分片',
+                'verbose_name_plural': '站点地图分片',
+                'ordering': ['section', 'number'],
+                'constraints': [models.UniqueConstraint(fields=('section', 'number'), name='sitemap_shard_unique')],
+            },
+        ),
+    ]
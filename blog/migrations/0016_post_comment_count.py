@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:32
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    """按已有的有效评论计算评论数"""
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    active = (
+        Comment.objects.filter(post=OuterRef('pk'), is_active=True)
+        .order_by().values('post').annotate(count=Count('pk')).values('count')
+    )
+    Post.objects.update(comment_count=Coalesce(Subquery(active), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_sitemap_shard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='评论数'),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
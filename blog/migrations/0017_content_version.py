@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0016_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False, verbose_name='名称')),
+                ('version', models.FloatField(verbose_name='版本')),
+            ],
+            options={
+                'verbose_name': '内容版本',
+                'verbose_name_plural': '内容版本',
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+from collections import defaultdict
+import re
+import unicodedata
+
+from django.db import migrations
+
+# 与 SearchPosting.term 的长度一致，超长的词项不进入索引
+MAX_TERM_LENGTH = 100
+BATCH_SIZE = 500
+
+# 迁移编写时二元分词器的固定副本：以后修改 blog.search.tokenizers 不会改变这个迁移的结果
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+TOKEN_RE = re.compile(rf'(?P<cjk>[{CJK_CHARS}]+)|(?P<word>[^\W_{CJK_CHARS}]+)')
+
+
+def build_positions(text):
+    """二元词和单词的位置，加上多字文本段中每个字的位置（取负数，短语匹配时忽略，见 InvertedIndexBackend._build）"""
+    terms, chars = [], []
+    for match in TOKEN_RE.finditer(unicodedata.normalize('NFKC', text).lower()):
+        run = match.group('cjk')
+        if run is None:
+            terms.append(match.group('word'))
+        elif len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+            chars.extend(run)
+    positions = defaultdict(list)
+    for position, term in enumerate(terms):
+        if len(term) <= MAX_TERM_LENGTH:
+            positions[term].append(position)
+    for index, char in enumerate(chars):
+        positions[char].append(-1 - index)
+    return positions
+
+
+def index_chars(apps, schema_editor):
+    """重新生成倒排索引记录，补上二元词中单字的词项（文档长度不变，FTS5 表不受影响）"""
+    db = schema_editor.connection.alias
+    Post = apps.get_model('blog', 'Post')
+    SearchPosting = apps.get_model('blog', 'SearchPosting')
+
+    def write(post_ids, postings):
+        SearchPosting.objects.using(db).filter(post_id__in=post_ids).delete()
+        SearchPosting.objects.using(db).bulk_create(postings, batch_size=5000)
+
+    rows = (
+        Post.objects.using(db).filter(search_document__isnull=False)
+        .order_by('id').values_list('id', 'title', 'content').iterator(chunk_size=BATCH_SIZE)
+    )
+    post_ids, postings = [], []
+    for post_id, title, content in rows:
+        post_ids.append(post_id)
+        for field, text in (('title', title), ('content', content)):
+            postings.extend(
+                SearchPosting(term=term, post_id=post_id, field=field, positions=term_positions)
+                for term, term_positions in build_positions(text).items()
+            )
+        if len(post_ids) >= BATCH_SIZE:
+            write(post_ids, postings)
+            post_ids, postings = [], []
+    write(post_ids, postings)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0017_content_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_chars, migrations.RunPython.noop),
+    ]
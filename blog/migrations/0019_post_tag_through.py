@@ -0,0 +1,72 @@
+# Generated by Django 5.2.5 on 2026-10-18 05:21
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_post_fields(apps, schema_editor):
+    """按文章填写中间表中新增的冗余字段"""
+    db = schema_editor.connection.alias
+    Post = apps.get_model('blog', 'Post')
+    PostTag = apps.get_model('blog', 'PostTag')
+    post = Post.objects.using(db).filter(pk=OuterRef('post_id'))
+    PostTag.objects.using(db).update(
+        status=Subquery(post.values('status')[:1]),
+        created_at=Subquery(post.values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_search_index_chars'),
+    ]
+
+    operations = [
+        # 自动创建的中间表 blog_post_tags 改由 PostTag 模型描述，表结构不变
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='PostTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='blog.post', verbose_name='文章')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_links', to='blog.tag', verbose_name='标签')),
+                    ],
+                    options={
+                        'verbose_name': '文章标签关联',
+                        'verbose_name_plural': '文章标签关联',
+                        'db_table': 'blog_post_tags',
+                        'unique_together': {('post', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='post',
+                    name='tags',
+                    field=models.ManyToManyField(blank=True, through='blog.PostTag', to='blog.tag', verbose_name='文章标签'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='status',
+            field=models.CharField(default='draft', max_length=20, verbose_name='文章状态'),
+        ),
+        migrations.AddField(
+            model_name='posttag',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='文章创建时间'),
+        ),
+        migrations.RunPython(copy_post_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', 'status', '-created_at', '-id'], name='post_tag_created_idx'),
+        ),
+        migrations.AlterField(
+            model_name='posttag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='post_links', to='blog.tag', verbose_name='标签'),
+        ),
+    ]
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.utils import timezone
 
 class Category(models.Model):
     name = models.CharField(max_length=100, verbose_name="分类名称")
@@ -35,11 +39,97 @@ class Tag(models.Model):
     def get_absolute_url(self):
         return reverse('tag_posts', kwargs={'slug': self.slug})
 
+# 批量状态转换完成后发送，参数 post_ids、to_status
+# （queryset.update() 不会触发 post_save，缓存清理等处理器监听这个信号）
+posts_transitioned = Signal()
+# 后台批量批准、禁用评论后发送，参数 post_ids
+comments_moderated = Signal()
+
+
+class PostQuerySet(models.QuerySet):
+    """文章查询集"""
+    
+    # 目标状态 → (允许的原状态, 活动日志类型, 日志描述)
+    TRANSITIONS = {
+        'published': (('draft',), 'publish_post', '发布了文章'),
+        'archived': (('published',), 'archive_post', '归档了文章'),
+        'draft': (('published',), 'draft_post', '撤回了文章'),
+    }
+    
+    def published(self):
+        """只包含已发布的文章"""
+        return self.filter(status='published')
+    
+    def with_related(self):
+        """预先加载作者、分类和标签，避免模板中逐条查询（N+1）"""
+        return self.select_related('author', 'category').prefetch_related('tags')
+    
+    def for_listing(self):
+        """列表页只显示摘要，不加载正文和渲染后的HTML"""
+        return self.defer('content', 'content_html')
+    
+    def refresh_comment_counts(self):
+        """按有效评论重新计算 comment_count（用于 queryset.update、bulk_create 等不经过 save() 的修改）"""
+        active = (
+            Comment.objects.filter(post=OuterRef('pk'), is_active=True)
+            .order_by().values('post').annotate(count=Count('pk')).values('count')
+        )
+        return self.update(comment_count=Coalesce(Subquery(active), 0))
+    
+    def transition(self, to_status, user=None):
+        """
+        批量状态转换：只转换处于允许原状态的文章，
+        在同一事务中执行一条 UPDATE 和一次 bulk_create 活动日志，返回转换的文章数
+        """
+        from_statuses, action, verb = self.TRANSITIONS[to_status]
+        # 查询集本身可能被路由到只读副本，事务、加锁查询和写入都要在写库上进行
+        db = router.db_for_write(self.model)
+        with transaction.atomic(using=db):
+            posts = list(
+                self.using(db).filter(status__in=from_statuses)
+                .select_for_update()
+                .values_list('id', 'title', 'author_id')
+            )
+            if not posts:
+                return 0
+            
+            post_ids = [post_id for post_id, _, _ in posts]
+            now = timezone.now()
+            updated = self.model.objects.using(db).filter(id__in=post_ids).update(status=to_status, updated_at=now)
+            PostTag.objects.using(db).filter(post_id__in=post_ids).update(status=to_status)
+            
+            ActivityLog.objects.using(db).bulk_create([
+                ActivityLog(
+                    action=action,
+                    description=f"{verb}：{title}",
+                    user_id=user.pk if user is not None else author_id,
+                    target_title=title,
+                    created_at=now,
+                ).truncate_fields()
+                for post_id, title, author_id in posts
+            ])
+            posts_transitioned.send(sender=self.model, post_ids=post_ids, to_status=to_status)
+        return updated
+
+
+class PublishedPostManager(models.Manager.from_queryset(PostQuerySet)):
+    """已发布文章管理器：Post.published 总是带上作者、分类和标签"""
+    
+    def get_queryset(self):
+        return super().get_queryset().published().with_related()
+
+
 class Post(models.Model):
     title = models.CharField(max_length=200, verbose_name="标题")
     content = models.TextField(verbose_name="内容")
+    # 保存时由 blog.rendering 把 Markdown 正文渲染成HTML，详情页直接输出
+    content_html = models.TextField(blank=True, editable=False, verbose_name="渲染后的内容")
+    content_html_version = models.PositiveSmallIntegerField(default=0, editable=False, verbose_name="渲染器版本")
+    # 列表页显示的纯文本摘要，保存时生成，列表查询不再需要加载正文
+    excerpt = models.CharField(max_length=300, blank=True, editable=False, verbose_name="摘要")
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="作者")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="创建时间")
+    # 不使用 auto_now_add，批量导入（seed_data）时可以指定创建时间
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="创建时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
     
     status = models.CharField(
@@ -54,17 +144,35 @@ class Post(models.Model):
         on_delete=models.SET_NULL, 
         null=True, 
         blank=True, 
+        db_index=False,  # 由复合索引 post_category_created_idx 覆盖
         verbose_name="文章分类"
     )
     
-    tags = models.ManyToManyField(Tag, blank=True, verbose_name="文章标签")
+    tags = models.ManyToManyField(Tag, through='PostTag', blank=True, verbose_name="文章标签")
     
     view_count = models.PositiveIntegerField(default=0, verbose_name="浏览次数")
+    # 有效评论数，随评论的增删和启用/禁用在同一事务中更新，详情页不再 COUNT 评论
+    comment_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="评论数")
+    
+    objects = PostQuerySet.as_manager()
+    published = PublishedPostManager()
     
     class Meta:
         verbose_name = "博客文章"
         verbose_name_plural = "博客文章"
         ordering = ['-created_at']
+        indexes = [
+            # 已发布文章列表：WHERE status='published' ORDER BY created_at DESC, id DESC（含游标分页）
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(status='published'),
+                name='post_published_created_idx',
+            ),
+            # 按状态筛选（草稿列表、状态转换）
+            models.Index(fields=['status', '-created_at'], name='post_status_created_idx'),
+            # 分类文章列表：WHERE category_id=? AND status='published' ORDER BY created_at DESC, id DESC
+            models.Index(fields=['category', 'status', '-created_at', '-id'], name='post_category_created_idx'),
+        ]
     
     #def __str__(self):
     #    return self.title
@@ -103,10 +211,83 @@ class Post(models.Model):
         """检查文章是否为草稿"""
         return self.status == 'draft'
     
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'content' in update_fields:
+            self.render_content()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'content_html', 'content_html_version', 'excerpt'}
+        super().save(*args, **kwargs)
+
+    def render_content(self):
+        """把正文渲染成HTML并生成摘要（见 blog/rendering.py）"""
+        from .rendering import make_excerpt, render_markdown
+        self.content_html, self.content_html_version = render_markdown(self.content)
+        self.excerpt = make_excerpt(self.content)
+
     def increment_view_count(self):
-        """增加浏览次数"""
+        """增加浏览次数（先写入缓冲区，由 blog.view_counter 批量写回数据库）"""
+        from .view_counter import record_view
+        record_view(self.pk)
         self.view_count += 1
-        self.save(update_fields=['view_count'])
+
+
+class PostTagQuerySet(models.QuerySet):
+    """文章-标签关联查询集"""
+
+    def listing(self, tag):
+        """
+        标签文章列表：WHERE tag_id=? AND status='published' ORDER BY created_at DESC, id DESC，
+        沿 post_tag_created_idx 索引按顺序读取；文章的作者、分类、标签一并取出，不加载正文
+        """
+        return (
+            self.filter(tag=tag, status='published')
+            .select_related('post__author', 'post__category')
+            .defer('post__content', 'post__content_html')
+            .prefetch_related('post__tags')
+            .order_by('-created_at', '-id')
+        )
+
+    def refresh_from_posts(self):
+        """按文章重新填写冗余的状态和创建时间（用于不经过 PostTag 信号处理器的修改）"""
+        post = Post.objects.filter(pk=OuterRef('post_id'))
+        return self.update(
+            status=Subquery(post.values('status')[:1]),
+            created_at=Subquery(post.values('created_at')[:1]),
+        )
+
+
+class PostTag(models.Model):
+    """
+    文章与标签的关联（Post.tags 的中间表）
+    冗余保存文章的状态和创建时间，标签文章列表只需按索引读取这张表，不需要与文章表连接后再排序；
+    由信号处理器和 PostQuerySet.transition() 与文章保持一致
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='tag_links', verbose_name="文章")
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        db_index=False,  # 由复合索引 post_tag_created_idx 覆盖
+        related_name='post_links',
+        verbose_name="标签",
+    )
+    status = models.CharField(max_length=20, default='draft', verbose_name="文章状态")
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="文章创建时间")
+
+    objects = PostTagQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'blog_post_tags'
+        unique_together = [('post', 'tag')]
+        verbose_name = "文章标签关联"
+        verbose_name_plural = "文章标签关联"
+        indexes = [
+            # 标签文章列表：WHERE tag_id=? AND status='published' ORDER BY created_at DESC, id DESC（含游标分页）
+            models.Index(fields=['tag', 'status', '-created_at', '-id'], name='post_tag_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.post_id} → {self.tag_id}"
 
 
 class ActivityLog(models.Model):
@@ -115,30 +296,52 @@ class ActivityLog(models.Model):
         ('create_post', '创建文章'),
         ('update_post', '更新文章'),
         ('delete_post', '删除文章'),
+        ('publish_post', '发布文章'),
+        ('archive_post', '归档文章'),
+        ('draft_post', '撤回文章'),
         ('create_user', '用户注册'),
     ]
     
     action = models.CharField(max_length=20, choices=ACTION_CHOICES, verbose_name="操作类型")
     description = models.CharField(max_length=200, verbose_name="操作描述")
-    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="操作用户")
+    # 由复合索引 activity_user_created_idx 覆盖，不再单独建外键索引
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, db_index=False, verbose_name="操作用户")
     target_title = models.CharField(max_length=200, blank=True, verbose_name="目标对象标题")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="操作时间")
+    # 日志由后台线程批量写入，时间在事件发生时设置（见 blog/activity.py）
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="操作时间")
     
     class Meta:
         verbose_name = "活动日志"
         verbose_name_plural = "活动日志"
         ordering = ['-created_at']
+        indexes = [
+            # 活动日志页面和后台列表按时间倒序
+            models.Index(fields=['-created_at'], name='activity_created_idx'),
+            # 后台按操作类型、操作用户筛选
+            models.Index(fields=['action', '-created_at'], name='activity_action_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='activity_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_action_display()} - {self.description}"
+    
+    def truncate_fields(self):
+        """描述、目标标题截断到字段长度（bulk_create 不做校验，超长的一条会使整批写入失败）"""
+        for name in ('description', 'target_title'):
+            max_length = self._meta.get_field(name).max_length
+            value = getattr(self, name)
+            if len(value) > max_length:
+                setattr(self, name, value[:max_length - 1] + '…')
+        return self
 
 
 class Comment(models.Model):
     """文章评论模型"""
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', verbose_name="文章")
+    # 由复合索引 comment_post_created_idx 覆盖，不再单独建外键索引
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False, verbose_name="文章")
     author = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="评论作者")
     content = models.TextField(max_length=1000, verbose_name="评论内容")
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="评论时间")
+    created_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name="评论时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
     is_active = models.BooleanField(default=True, verbose_name="是否有效")
     
@@ -146,6 +349,107 @@ class Comment(models.Model):
         verbose_name = "文章评论"
         verbose_name_plural = "文章评论"
         ordering = ['-created_at']
+        indexes = [
+            # 文章详情页的评论：WHERE post_id=? AND is_active ORDER BY created_at DESC
+            # SQLite 中布尔条件生成的是 "WHERE is_active" 而不是等值比较，无法用于索引定位，
+            # 所以索引只包含 (post, created_at)，is_active 在索引扫描时过滤
+            models.Index(fields=['post', '-created_at'], name='comment_post_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.author.username} 评论了 {self.post.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if not {'post_id', 'is_active'} & instance.get_deferred_fields():
+            instance._remember_counted()
+        return instance
+    
+    def _remember_counted(self):
+        """记录当前计入了哪篇文章的评论数（无效评论不计入），保存时据此调整 Post.comment_count"""
+        self._counted_post_id = self.post_id if self.is_active else None
+    
+    def save(self, *args, **kwargs):
+        # 评论和文章评论数的更新（blog/signals.py 中的 post_save 处理器）在同一个事务中完成
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+        self._remember_counted()
+
+class SearchDocument(models.Model):
+    """搜索索引中的文章：记录各字段的词项数，用于相关度计算中的长度归一化"""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name="文章"
+    )
+    title_length = models.PositiveIntegerField(default=0, verbose_name="标题词项数")
+    content_length = models.PositiveIntegerField(default=0, verbose_name="正文词项数")
+    
+    class Meta:
+        verbose_name = "搜索文档"
+        verbose_name_plural = "搜索文档"
+
+
+class SearchPosting(models.Model):
+    """倒排索引记录：某个词项在某篇文章某个字段中出现的全部位置"""
+    FIELD_CHOICES = [
+        ('title', '标题'),
+        ('content', '正文'),
+    ]
+    
+    term = models.CharField(max_length=100, db_index=True, verbose_name="词项")
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_postings', verbose_name="文章")
+    field = models.CharField(max_length=10, choices=FIELD_CHOICES, verbose_name="字段")
+    positions = models.JSONField(default=list, verbose_name="出现位置")
+    
+    class Meta:
+        verbose_name = "倒排索引"
+        verbose_name_plural = "倒排索引"
+    
+    def __str__(self):
+        return f"{self.term} → {self.post_id}:{self.field}"
+
+
+class SitemapShard(models.Model):
+    """
+    预先生成的站点地图分片（见 blog/sitemaps.py）
+    fingerprint 记录生成时分片内容的指纹，指纹不变的分片不会重新生成
+    """
+    section = models.CharField(max_length=20, verbose_name="类型")
+    number = models.PositiveIntegerField(verbose_name="分片序号")
+    fingerprint = models.CharField(max_length=32, verbose_name="内容指纹")
+    content = models.TextField(verbose_name="XML内容")
+    url_count = models.PositiveIntegerField(default=0, verbose_name="URL数")
+    lastmod = models.DateTimeField(null=True, blank=True, verbose_name="最后修改时间")
+    generated_at = models.DateTimeField(auto_now=True, verbose_name="生成时间")
+    
+    class Meta:
+        verbose_name = "站点地图分片"
+        verbose_name_plural = "站点地图分片"
+        ordering = ['section', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['section', 'number'], name='sitemap_shard_unique'),
+        ]
+    
+    def __str__(self):
+        return f"{self.section}-{self.number}"
+
+
+class ContentVersion(models.Model):
+    """
+    公开内容的版本（最后一次变化的时间戳），条件GET的 ETag 和订阅缓存使用（见 blog/caching.py）
+    保存在数据库中，所有 worker 进程和管理命令看到的是同一个版本
+    """
+    name = models.CharField(max_length=20, primary_key=True, verbose_name="名称")
+    version = models.FloatField(verbose_name="版本")
+    
+    class Meta:
+        verbose_name = "内容版本"
+        verbose_name_plural = "内容版本"
     
     def __str__(self):
-        return f"{self.author.username} 评论了 {self.post.title}"
\ No newline at end of file
+        return f"{self.name}: {self.version}"
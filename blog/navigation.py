@@ -0,0 +1,87 @@
+"""
+文章详情页的"上一篇 / 下一篇"导航
+按发布顺序 (created_at, id) 查找相邻的已发布文章：上一篇是更早的一篇，下一篇是更新的一篇。
+每个方向一条使用 post_published_created_idx 的 keyset 查询（LIMIT 1），结果按文章缓存。
+缓存键包含订阅版本（见 blog/caching.py）：文章发布、撤回、归档、删除或修改，以及批量状态转换、
+seed_data 等都会更新保存在数据库中的版本，所有进程随之改用新的缓存键，
+即使是进程内缓存（LocMem）也不会继续链接到已撤回或删除的文章
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .caching import aget_feed_version, get_feed_version
+from .metrics import record_cache
+
+
+def _key(version, post_id):
+    return f'blog:nav:{version:.6f}:{post_id}'
+
+
+def adjacent_queryset(queryset, created_at, pk, newer):
+    """按发布顺序排在 (created_at, pk) 之后（newer）或之前的文章，写法与游标分页相同，可以直接在索引上定位"""
+    if newer:
+        return queryset.filter(
+            Q(created_at__gt=created_at) | Q(id__gt=pk), created_at__gte=created_at
+        ).order_by('created_at', 'id')
+    return queryset.filter(
+        Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at
+    ).order_by('-created_at', '-id')
+
+
+def _published():
+    from .models import Post
+
+    return Post.objects.filter(status='published').values('id', 'title')
+
+
+def find_adjacent(post):
+    """查询相邻的已发布文章（不使用缓存），返回 {'previous': ..., 'next': ...}"""
+    published = _published()
+    return {
+        'previous': adjacent_queryset(published, post.created_at, post.pk, newer=False).first(),
+        'next': adjacent_queryset(published, post.created_at, post.pk, newer=True).first(),
+    }
+
+
+async def afind_adjacent(post):
+    """find_adjacent() 的异步版本，两个方向的查询同时发出"""
+    published = _published()
+    previous, next_post = await asyncio.gather(
+        adjacent_queryset(published, post.created_at, post.pk, newer=False).afirst(),
+        adjacent_queryset(published, post.created_at, post.pk, newer=True).afirst(),
+    )
+    return {'previous': previous, 'next': next_post}
+
+
+def get_adjacent_posts(post):
+    """文章详情页的导航（带缓存，缓存键包含订阅版本）"""
+    key = _key(get_feed_version(), post.pk)
+    adjacent = cache.get(key)
+    record_cache('navigation', adjacent is not None)
+    if adjacent is None:
+        adjacent = find_adjacent(post)
+        cache.set(key, adjacent, getattr(settings, 'BLOG_NAVIGATION_CACHE_TIMEOUT', 86400))
+    return adjacent
+
+
+async def aget_adjacent_posts(post):
+    """get_adjacent_posts() 的异步版本"""
+    key = _key(await aget_feed_version(), post.pk)
+    adjacent = await cache.aget(key)
+    record_cache('navigation', adjacent is not None)
+    if adjacent is None:
+        adjacent = await afind_adjacent(post)
+        await cache.aset(key, adjacent, getattr(settings, 'BLOG_NAVIGATION_CACHE_TIMEOUT', 86400))
+    return adjacent
+
+
+def neighbor_ids(post):
+    """
+    文章自己和前后相邻文章的 id（它们详情页中的导航随文章变化，整页缓存需要清除）
+    文章发布或撤回、删除前后，它两侧的已发布文章是同一对，所以只需在变化后查询一次
+    """
+    adjacent = find_adjacent(post)
+    return [post.pk] + [item['id'] for item in adjacent.values() if item is not None]
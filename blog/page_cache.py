@@ -0,0 +1,145 @@
+"""
+匿名用户整页缓存
+匿名用户的 GET 请求按"路径 + 查询参数"缓存整个响应，命中时不再执行视图。
+每个路径有一个代数（generation），purge_paths() 更新代数即可让该路径下所有查询参数的缓存失效；
+分类、标签变化会影响所有页面的侧边栏，由 purge_all() 更新全局代数。
+代数保存在 BLOG_PAGE_CACHE_ALIAS 缓存中，多进程部署时该缓存必须是共享缓存（见 apps.check_shared_caches）。
+需要在 settings 中设置 BLOG_PAGE_CACHE_ENABLED = True 才会启用
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .metrics import record_cache
+
+GLOBAL_GENERATION_KEY = 'blog:page-gen'
+
+
+def is_enabled():
+    return getattr(settings, 'BLOG_PAGE_CACHE_ENABLED', False)
+
+
+def _cache():
+    return caches[getattr(settings, 'BLOG_PAGE_CACHE_ALIAS', 'default')]
+
+
+def _digest(value):
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def _path_generation_key(path):
+    return f'{GLOBAL_GENERATION_KEY}:{_digest(path)}'
+
+
+def _page_key(request):
+    """缓存键中包含全局代数和路径代数，清除时只需更新代数"""
+    path = request.path
+    path_key = _path_generation_key(path)
+    generations = _cache().get_many([GLOBAL_GENERATION_KEY, path_key])
+    return 'blog:page:{}:{}:{}:{}:{}'.format(
+        generations.get(GLOBAL_GENERATION_KEY, 0),
+        _digest(path),
+        generations.get(path_key, 0),
+        request.method,
+        _digest(request.META.get('QUERY_STRING', '')),
+    )
+
+
+def _is_cacheable_request(request):
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _is_cacheable_response(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies  # 设置了Cookie（如会话、提示消息）的响应因人而异
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def cache_anonymous_page(on_hit=None):
+    """
+    整页缓存装饰器
+    on_hit(request, *args, **kwargs) 在命中缓存时调用（例如记录浏览次数）
+    同步、异步视图都可以使用；异步视图的缓存读写在线程中执行
+    """
+    def decorator(view_func):
+        def lookup(request, *args, **kwargs):
+            """视图执行前：返回 (缓存键, 命中时的响应)；请求不使用整页缓存时缓存键为 None"""
+            if not _is_cacheable_request(request):
+                return None, None
+            key = _page_key(request)
+            cached = _cache().get(key)
+            record_cache('page', cached is not None)
+            if cached is None:
+                return key, None
+            content, content_type = cached
+            if on_hit is not None:
+                on_hit(request, *args, **kwargs)
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'hit'
+            return key, response
+
+        def store(key, response):
+            if _is_cacheable_response(response):
+                timeout = getattr(settings, 'BLOG_PAGE_CACHE_TIMEOUT', 600)
+                _cache().set(key, (response.content, response['Content-Type']), timeout)
+                response['X-Page-Cache'] = 'miss'
+            return response
+
+        if iscoroutinefunction(view_func):
+            async def inner(request, *args, **kwargs):
+                if not is_enabled():
+                    return await view_func(request, *args, **kwargs)
+                key, response = await sync_to_async(lookup)(request, *args, **kwargs)
+                if response is not None:
+                    return response
+                response = await view_func(request, *args, **kwargs)
+                if key is not None:
+                    await sync_to_async(store)(key, response)
+                return response
+        else:
+            def inner(request, *args, **kwargs):
+                if not is_enabled():
+                    return view_func(request, *args, **kwargs)
+                key, response = lookup(request, *args, **kwargs)
+                if response is not None:
+                    return response
+                response = view_func(request, *args, **kwargs)
+                return response if key is None else store(key, response)
+        return wraps(view_func)(inner)
+    return decorator
+
+
+def purge_paths(paths):
+    """
+    清除指定路径（含所有查询参数）的整页缓存
+    在事务提交后执行：提交前清除的话，其他请求可能在提交前读到旧数据并重新写入缓存
+    """
+    if not is_enabled():
+        return
+    paths = set(paths)
+
+    def purge():
+        generation = time.time_ns()
+        _cache().set_many({_path_generation_key(path): generation for path in paths}, timeout=None)
+
+    transaction.on_commit(purge)
+
+
+def purge_all():
+    """清除所有页面的整页缓存（事务提交后执行）"""
+    if not is_enabled():
+        return
+    transaction.on_commit(lambda: _cache().set(GLOBAL_GENERATION_KEY, time.time_ns(), timeout=None))
@@ -0,0 +1,153 @@
+"""
+游标（keyset）分页
+按 (created_at, id) 倒序翻页，下一页通过 "created_at < 上一页最后一条" 的条件定位，
+不需要 COUNT(*) 和 OFFSET，第N页的查询开销与第1页相同。
+页码被不透明的游标字符串代替，模板中使用 next_cursor / previous_cursor 生成链接
+"""
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(data):
+    """把游标数据编码成URL安全的字符串"""
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解码游标，格式错误时返回None"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+
+
+class CursorPage:
+    """一页结果，接口与 django.core.paginator.Page 中模板常用的部分保持一致"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def map(self, func):
+        """对本页的每条记录应用 func（如把关联记录换成文章），游标不变"""
+        return CursorPage([func(obj) for obj in self.object_list], self.next_cursor, self.previous_cursor)
+
+
+class CursorPaginator:
+    """对按 (-created_at, -id) 排序的查询集做游标分页"""
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset.order_by('-created_at', '-id')
+        self.per_page = per_page
+
+    def _position(self, obj):
+        return [obj.created_at.isoformat(), obj.pk]
+
+    def _query(self, cursor):
+        """解析游标，返回 (翻页方向, 这一页的查询)；游标为空或无效时为第一页"""
+        data = decode_cursor(cursor)
+        try:
+            direction = data['d']
+            created_at = parse_datetime(data['p'][0])
+            pk = int(data['p'][1])
+        except (TypeError, KeyError, IndexError, ValueError):
+            direction = None
+        if direction not in ('next', 'prev') or created_at is None:
+            direction = None
+
+        # 先用 created_at 的范围条件让数据库沿 (created_at, id) 索引扫描，
+        # 再排除同一时间中已经显示过的记录；直接写成 OR 条件时 SQLite 会改用
+        # MULTI-INDEX OR 并在内存中重新排序
+        if direction == 'prev':
+            # 向前翻页：取位置之前（更新）的记录，按正序取出后再反转
+            queryset = self.queryset.filter(created_at__gte=created_at).filter(
+                Q(created_at__gt=created_at) | Q(id__gt=pk)
+            ).order_by('created_at', 'id')
+        elif direction == 'next':
+            queryset = self.queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(id__lt=pk)
+            )
+        else:
+            queryset = self.queryset
+
+        # 多取一条，用来判断这个方向上是否还有更多记录
+        return direction, queryset[:self.per_page + 1]
+
+    def _make_page(self, direction, items):
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if direction == 'prev':
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == 'next'
+
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = encode_cursor({'d': 'next', 'p': self._position(items[-1])})
+        if items and has_previous:
+            previous_cursor = encode_cursor({'d': 'prev', 'p': self._position(items[0])})
+        return CursorPage(items, next_cursor, previous_cursor)
+
+    def page(self, cursor=None):
+        """返回游标所在的一页；游标为空或无效时返回第一页"""
+        direction, queryset = self._query(cursor)
+        return self._make_page(direction, list(queryset))
+
+    async def apage(self, cursor=None):
+        """page() 的异步版本（异步视图使用）"""
+        direction, queryset = self._query(cursor)
+        items = [obj async for obj in queryset.aiterator(chunk_size=self.per_page + 1)]
+        return self._make_page(direction, items)
+
+
+class SequenceCursorPaginator:
+    """
+    对已排好序的ID序列（如搜索结果）做游标分页
+    搜索结果按相关度排序，没有可用作游标的数据库列，游标中记录的是序列中的位置
+    """
+
+    def __init__(self, sequence, per_page):
+        self.sequence = sequence
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        data = decode_cursor(cursor)
+        try:
+            start = max(int(data['o']), 0)
+        except (TypeError, KeyError, ValueError):
+            start = 0
+        start = min(start, max(len(self.sequence) - 1, 0))
+
+        end = start + self.per_page
+        next_cursor = encode_cursor({'o': end}) if end < len(self.sequence) else None
+        previous_cursor = encode_cursor({'o': max(start - self.per_page, 0)}) if start > 0 else None
+        return CursorPage(self.sequence[start:end], next_cursor, previous_cursor)
@@ -0,0 +1,279 @@
+"""
+请求级性能分析中间件
+对被选中的请求记录：总耗时、SQL（次数、耗时、重复语句、最慢的几条）、模板渲染耗时、缓存命中/未命中次数，
+结果写入 Server-Timing 响应头（浏览器开发者工具中可以直接查看）和 blog.profiling 日志（每个请求一行JSON）。
+请求被选中的条件（二者满足其一）：
+- 请求头 X-Blog-Profile 的值等于 settings.BLOG_PROFILING_TOKEN
+- 按 settings.BLOG_PROFILING_SAMPLE_RATE 随机抽样
+设置了 BLOG_PROFILING_CPROFILE_DIR 时，还会把被选中请求的 cProfile 结果保存为 .prof 文件（可用 snakeviz、pstats 查看）。
+BLOG_PROFILING_ENABLED 为 False 时中间件不会被加载，没有任何额外开销
+"""
+import contextvars
+import cProfile
+import functools
+import heapq
+import json
+import logging
+import os
+import random
+import secrets
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_BLOG_PROFILE'
+
+# 当前请求的分析记录（contextvars 对线程和异步视图都适用）
+_current = contextvars.ContextVar('blog_profile', default=None)
+_MISSING = object()
+
+
+class QueryRecorder:
+    """
+    通过 connection.execute_wrapper 统计 SQL 查询数和耗时（不需要 DEBUG=True）
+    keep_statements 为 True 时还记录重复语句和最慢的几条语句
+    """
+
+    def __init__(self, keep_statements=False, slowest=3):
+        self.count = 0
+        self.duration = 0.0
+        self.keep_statements = keep_statements
+        self.slowest_limit = slowest
+        self._statements = Counter()
+        self._slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.keep_statements:
+                self._statements[(sql, repr(params))] += 1
+                item = (elapsed, self.count, sql)
+                if len(self._slowest) < self.slowest_limit:
+                    heapq.heappush(self._slowest, item)
+                else:
+                    heapq.heappushpop(self._slowest, item)
+
+    @contextmanager
+    def record(self, using=None):
+        """记录 using 连接上的查询；不指定时记录所有数据库连接"""
+        targets = [using] if using is not None else connections.all()
+        with ExitStack() as stack:
+            for connection in targets:
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @asynccontextmanager
+    async def arecord(self, using=None):
+        """
+        异步请求中使用的 record()：ORM 查询在 sync_to_async 的线程中执行，而数据库连接是线程本地的，
+        所以在同一个线程中安装和移除钩子
+        """
+        stack = ExitStack()
+        await sync_to_async(stack.enter_context)(self.record(using))
+        try:
+            yield self
+        finally:
+            await sync_to_async(stack.close)()
+
+    @property
+    def duplicates(self):
+        """完全相同（SQL 和参数都相同）的重复查询次数"""
+        return sum(count - 1 for count in self._statements.values())
+
+    @property
+    def slowest(self):
+        """最慢的几条语句 [(毫秒, SQL), ...]"""
+        return [(round(elapsed * 1000, 3), sql) for elapsed, _, sql in sorted(self._slowest, reverse=True)]
+
+
+class RequestProfile:
+    """一个请求的分析记录"""
+
+    def __init__(self, slowest=3):
+        self.queries = QueryRecorder(keep_statements=True, slowest=slowest)
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def server_timing(self, total):
+        metrics = [
+            f'total;dur={total * 1000:.1f}',
+            f'sql;dur={self.queries.duration * 1000:.1f};desc="{self.queries.count} queries"',
+            f'template;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="hit={self.cache_hits} miss={self.cache_misses}"',
+        ]
+        return ', '.join(metrics)
+
+    def as_dict(self, request, response, total):
+        match = request.resolver_match
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'sql_count': self.queries.count,
+            'sql_ms': round(self.queries.duration * 1000, 3),
+            'sql_duplicates': self.queries.duplicates,
+            'sql_slowest': self.queries.slowest,
+            'template_ms': round(self.template_time * 1000, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+
+# ---------- 模板和缓存的计时钩子（只在中间件启用时安装一次） ----------
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def inner(self, *args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile.template_time += time.perf_counter() - start
+    return inner
+
+
+def _counted_get(get):
+    @functools.wraps(get)
+    def inner(self, key, default=None, version=None):
+        profile = _current.get()
+        if profile is None:
+            return get(self, key, default, version)
+        value = get(self, key, _MISSING, version)
+        if value is _MISSING:
+            profile.cache_misses += 1
+            return default
+        profile.cache_hits += 1
+        return value
+    return inner
+
+
+def _counted_get_many(get_many):
+    @functools.wraps(get_many)
+    def inner(self, keys, version=None):
+        result = get_many(self, keys, version)
+        profile = _current.get()
+        if profile is not None:
+            keys = list(keys)
+            profile.cache_hits += len(result)
+            profile.cache_misses += len(keys) - len(result)
+        return result
+    return inner
+
+
+def install_hooks():
+    """给 Django 模板和已配置的缓存后端加上计时/计数（幂等）"""
+    if not getattr(DjangoTemplate.render, '_blog_profiling', False):
+        DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+        DjangoTemplate.render._blog_profiling = True
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        if not getattr(backend.get, '_blog_profiling', False):
+            backend.get = _counted_get(backend.get)
+            backend.get._blog_profiling = True
+        # 默认的 BaseCache.get_many 逐个调用 get()，已经计数，只需处理自己实现了 get_many 的后端
+        if 'get_many' in vars(backend) and not getattr(backend.get_many, '_blog_profiling', False):
+            backend.get_many = _counted_get_many(backend.get_many)
+            backend.get_many._blog_profiling = True
+
+
+class ProfilingMiddleware:
+    """请求级性能分析中间件，应放在 MIDDLEWARE 的最前面；同步、异步（ASGI）请求都可以使用"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'BLOG_PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.token = getattr(settings, 'BLOG_PROFILING_TOKEN', '')
+        self.sample_rate = getattr(settings, 'BLOG_PROFILING_SAMPLE_RATE', 0.0)
+        self.slowest = getattr(settings, 'BLOG_PROFILING_SLOW_QUERIES', 3)
+        self.cprofile_dir = getattr(settings, 'BLOG_PROFILING_CPROFILE_DIR', '')
+        install_hooks()
+
+    def should_profile(self, request):
+        header = request.META.get(PROFILE_HEADER)
+        # 没有配置令牌时不接受请求头触发，避免任何人都能打开分析
+        if header and self.token and secrets.compare_digest(header.encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.should_profile(request):
+            return self.get_response(request)
+
+        profile = RequestProfile(slowest=self.slowest)
+        token = _current.set(profile)
+        profiler = cProfile.Profile() if self.cprofile_dir else None
+        start = time.perf_counter()
+        try:
+            with profile.queries.record():
+                if profiler is not None:
+                    response = profiler.runcall(self.get_response, request)
+                else:
+                    response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, profiler, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.should_profile(request):
+            return await self.get_response(request)
+
+        profile = RequestProfile(slowest=self.slowest)
+        token = _current.set(profile)
+        # 异步请求的 cProfile 结果只包含事件循环线程中的调用（同一时间其他请求的协程也会被记录）
+        profiler = cProfile.Profile() if self.cprofile_dir else None
+        start = time.perf_counter()
+        try:
+            async with profile.queries.arecord():
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, profile, profiler, time.perf_counter() - start)
+
+    def finish(self, request, response, profile, profiler, total):
+        response['Server-Timing'] = profile.server_timing(total)
+        data = profile.as_dict(request, response, total)
+        if profiler is not None:
+            data['profile_file'] = self.dump(profiler, data)
+        logger.info(json.dumps(data, ensure_ascii=False))
+        return response
+
+    def dump(self, profiler, data):
+        """保存 cProfile 结果，返回文件路径"""
+        os.makedirs(self.cprofile_dir, exist_ok=True)
+        name = (data['view'] or 'unknown').replace(':', '-')
+        path = os.path.join(self.cprofile_dir, f'{time.time_ns()}-{name}.prof')
+        profiler.dump_stats(path)
+        return path
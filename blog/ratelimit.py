@@ -0,0 +1,129 @@
+"""
+令牌桶限流
+每个键（如 "user:12"、"ip:1.2.3.4"）一个令牌桶：桶容量为允许的突发次数，令牌按固定速率补充，
+每次操作消耗一个令牌，桶空时拒绝并给出需要等待的秒数。
+桶的状态 (剩余令牌, 更新时间) 保存在缓存后端中，多个 gunicorn worker 共享；
+缓存不可用（如 Redis 连接失败）时退回到进程内的存储，限流仍然有效，只是各进程分别计算。
+读取和写回不是原子操作，并发请求可能少扣一个令牌，限流只需要近似准确
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryStore:
+    """进程内的桶状态存储，最多保留 max_entries 个键（最久未使用的先淘汰）"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def set(self, key, value, timeout):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+
+class TokenBucketLimiter:
+    """
+    capacity：桶容量（允许的突发次数）
+    rate：每秒补充的令牌数
+    """
+
+    def __init__(self, capacity, rate, alias='default', prefix='blog:ratelimit'):
+        self.capacity = capacity
+        self.rate = rate
+        self.alias = alias
+        self.prefix = prefix
+        self.fallback = MemoryStore()
+        # 桶从空到满所需的时间之后，状态与新桶相同，可以过期
+        self.timeout = math.ceil(capacity / rate) + 1
+
+    def consume(self, key, tokens=1):
+        """尝试消耗令牌，返回 (是否允许, 需要等待的秒数)"""
+        return self.consume_all([key], tokens)
+
+    def consume_all(self, keys, tokens=1):
+        """
+        多个桶都有足够的令牌时才同时扣除，任何一个不足时都不扣除（被拒绝的请求不消耗其他桶的额度）
+        返回 (是否允许, 需要等待的秒数)
+        """
+        keys = [f'{self.prefix}:{key}' for key in keys]
+        try:
+            cache = caches[self.alias] if self.alias else None
+            if cache is not None:
+                return self._consume(cache, keys, tokens)
+        except Exception:
+            logger.warning("限流缓存不可用，改用进程内存储", exc_info=True)
+        with self.fallback.lock:
+            return self._consume(self.fallback, keys, tokens)
+
+    def _consume(self, store, keys, tokens):
+        now = time.time()
+        buckets = {}
+        retry_after = 0.0
+        for key in keys:
+            state = store.get(key)
+            available, updated_at = state if state is not None else (self.capacity, now)
+            buckets[key] = min(self.capacity, available + (now - updated_at) * self.rate)
+            if buckets[key] < tokens:
+                retry_after = max(retry_after, (tokens - buckets[key]) / self.rate)
+        if retry_after:
+            return False, retry_after
+        for key, available in buckets.items():
+            store.set(key, (available - tokens, now), self.timeout)
+        return True, 0.0
+
+
+def client_ip(request):
+    """
+    客户端IP；部署在反向代理之后时，settings.BLOG_CLIENT_IP_HEADER 指定代理写入的请求头（如 HTTP_X_FORWARDED_FOR）
+    每个代理把它看到的来源地址追加在末尾，最左边的地址由客户端自己填写、可以伪造，
+    因此从右往左数第 settings.BLOG_TRUSTED_PROXY_HOPS 个地址（可信代理的数量）才是真实的客户端IP
+    """
+    header = getattr(settings, 'BLOG_CLIENT_IP_HEADER', '')
+    if header and request.META.get(header):
+        addresses = [address.strip() for address in request.META[header].split(',')]
+        hops = max(getattr(settings, 'BLOG_TRUSTED_PROXY_HOPS', 1), 1)
+        return addresses[max(len(addresses) - hops, 0)]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+_comment_limiter = None
+
+
+def get_comment_limiter():
+    """评论提交的限流器（按 settings 创建）"""
+    global _comment_limiter
+    if _comment_limiter is None:
+        _comment_limiter = TokenBucketLimiter(
+            capacity=getattr(settings, 'BLOG_COMMENT_RATE_BURST', 5),
+            rate=getattr(settings, 'BLOG_COMMENT_RATE_PER_MINUTE', 2) / 60,
+            alias=getattr(settings, 'BLOG_RATE_LIMIT_CACHE_ALIAS', 'default'),
+            prefix='blog:ratelimit:comment',
+        )
+    return _comment_limiter
+
+
+def check_comment_rate(request):
+    """
+    评论提交的频率限制：同一用户、同一IP各有一个令牌桶，都有令牌时才允许
+    返回 None 表示允许，否则返回需要等待的秒数
+    """
+    allowed, retry_after = get_comment_limiter().consume_all([f'user:{request.user.pk}', f'ip:{client_ip(request)}'])
+    return None if allowed else retry_after
@@ -0,0 +1,199 @@
+"""
+文章正文渲染：Markdown → HTML
+在保存文章时渲染一次，结果存入 Post.content_html，详情页直接输出，不再在每次请求时处理正文。
+- Markdown（python-markdown）：围栏代码块、表格；代码块由 Pygments 高亮（codehilite）
+- 渲染结果经过白名单过滤（优先使用 nh3，未安装时使用下面基于 html.parser 的实现），
+  作者写在 Markdown 中的脚本、事件属性、javascript: 链接都会被去掉
+- 渲染器有版本号（Post.content_html_version），渲染规则变化时提高 RENDERER_VERSION，
+  再运行 python manage.py render_posts 批量重新渲染
+未安装 markdown 时退回到和以前一样的 linebreaks 输出，版本号记为 0，安装后用 render_posts 重新渲染
+
+列表页使用的摘要（Post.excerpt）也在保存时由 make_excerpt() 生成
+"""
+import re
+import unicodedata
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.utils.html import linebreaks
+
+try:
+    import markdown
+except ImportError:  # pragma: no cover - 取决于部署环境
+    markdown = None
+
+try:
+    import nh3
+except ImportError:  # pragma: no cover
+    nh3 = None
+
+# 渲染规则（扩展、白名单等）变化时加 1
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'codehilite', 'tables', 'sane_lists']
+MARKDOWN_EXTENSION_CONFIGS = {
+    # 不猜测语言：没有标注语言的代码块按纯文本输出，避免误判和额外开销
+    'codehilite': {'css_class': 'highlight', 'guess_lang': False},
+}
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'del', 'div', 'em', 'h1', 'h2', 'h3',
+    'h4', 'h5', 'h6', 'hr', 'i', 'img', 'li', 'ol', 'p', 'pre', 'span', 'strong', 'sub',
+    'sup', 'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+    'div': {'class'},
+    'span': {'class'},
+    'code': {'class'},
+    'th': {'align'},
+    'td': {'align'},
+}
+URL_SCHEMES = {'http', 'https', 'mailto'}
+# 这些标签连同内容一起丢弃
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template'}
+VOID_TAGS = {'br', 'hr', 'img'}
+
+
+def current_version():
+    """当前环境下的渲染器版本（没有 markdown 时为 0）"""
+    return RENDERER_VERSION if markdown is not None else 0
+
+
+class _Sanitizer(HTMLParser):
+    """基于白名单的HTML过滤（nh3 不可用时使用）"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.output = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in ('href', 'src') and not _is_safe_url(value):
+                continue
+            parts.append(f'{name}="{escape(value, quote=True)}"')
+        if tag == 'a':
+            parts.append('rel="noopener noreferrer"')
+        self.output.append(f'<{" ".join(parts)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # 闭合到对应的开始标签，保证输出的标签嵌套完整
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.output.append(f'</{open_tag}>')
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.output.append(escape(data, quote=False))
+
+    def result(self):
+        self.close()
+        self.output.extend(f'</{tag}>' for tag in reversed(self.open_tags))
+        return ''.join(self.output)
+
+
+def _is_safe_url(url):
+    scheme = urlsplit(url.strip()).scheme.lower()
+    return not scheme or scheme in URL_SCHEMES
+
+
+def sanitize(html):
+    """只保留白名单中的标签和属性"""
+    if nh3 is not None:
+        return nh3.clean(
+            html,
+            tags=ALLOWED_TAGS,
+            attributes=ALLOWED_ATTRIBUTES,
+            url_schemes=URL_SCHEMES,
+            clean_content_tags=DROP_CONTENT_TAGS,
+            link_rel='noopener noreferrer',
+        )
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html)
+    return sanitizer.result()
+
+
+def render_markdown(text):
+    """把文章正文渲染成安全的HTML，返回 (html, 渲染器版本)"""
+    if markdown is None:
+        return linebreaks(text, autoescape=True), 0
+    html = markdown.markdown(
+        text,
+        extensions=MARKDOWN_EXTENSIONS,
+        extension_configs=MARKDOWN_EXTENSION_CONFIGS,
+        output_format='html',
+    )
+    return sanitize(html), RENDERER_VERSION
+
+
+# ---------- 摘要 ----------
+
+# 摘要的显示宽度：汉字等全角字符算 2，其余字符算 1（约 100 个汉字或 30 多个英文单词）
+EXCERPT_WIDTH = 200
+
+_CODE_BLOCK = re.compile(r'^```.*?(?:^```|\Z)', re.S | re.M)
+_MARKUP = [
+    (re.compile(r'!?\[([^\]]*)\]\([^)]*\)'), r'\1'),                # 链接、图片只保留文字
+    (re.compile(r'^\s{0,3}(?:#{1,6}|>|[-*+]|\d+\.)\s+', re.M), ''),  # 标题、引用、列表标记
+    (re.compile(r'<[^>]*>'), ''),                                    # HTML 标签
+    (re.compile(r'[*_`~|]+'), ''),                                   # 强调、行内代码、表格
+]
+
+
+def _char_width(char):
+    return 2 if unicodedata.east_asian_width(char) in ('W', 'F') else 1
+
+
+def make_excerpt(text, width=EXCERPT_WIDTH):
+    """
+    从 Markdown 正文生成纯文本摘要
+    truncatewords 按空格切分，中文没有空格时无法截断；这里按显示宽度截断，
+    英文单词不会被从中间截断
+    """
+    text = _CODE_BLOCK.sub(' ', text)
+    for pattern, replacement in _MARKUP:
+        text = pattern.sub(replacement, text)
+    text = ' '.join(text.split())
+
+    used = 0
+    for index, char in enumerate(text):
+        used += _char_width(char)
+        if used > width:
+            break
+    else:
+        return text
+
+    cut = text[:index]
+    # 截断点在英文单词中间时，退回到单词开头
+    if char.isascii() and char.isalnum():
+        space = cut.rfind(' ')
+        if space > len(cut) - 20:
+            cut = cut[:space]
+    return cut.rstrip() + '…'
@@ -0,0 +1,122 @@
+"""
+主库 / 只读副本路由
+配置了副本（settings.BLOG_DATABASE_REPLICAS）时：
+- 写操作总是使用主库（default）：评论、浏览次数写回、后台管理、活动日志等
+- 公开页面（GET/HEAD 请求，包括订阅、站点地图）中 blog 应用的读查询使用副本，
+  每个请求固定使用一个随机选择的副本；认证、会话等其他应用的数据仍从主库读取，
+  避免刚登录时副本还没有会话记录
+- 不经过请求的代码（管理命令、后台线程）、后台管理页面、事务中的查询都使用主库
+- 读己之写：请求中发生过写操作后，本请求剩余的查询改用主库，并设置一个短时 Cookie，
+  BLOG_REPLICA_PIN_SECONDS 秒内该用户的请求都使用主库，不会因为复制延迟看不到自己刚提交的内容
+请求级的路由状态由 ReplicaRoutingMiddleware 设置（contextvars，对线程和异步视图都适用）
+"""
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'blog_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = contextvars.ContextVar('blog_db_routing', default=None)
+
+
+def replicas():
+    return getattr(settings, 'BLOG_DATABASE_REPLICAS', [])
+
+
+class RoutingState:
+    """一个请求的路由状态：replica 为本请求使用的副本（None 表示只用主库），wrote 表示已经写过主库"""
+
+    def __init__(self, replica=None):
+        self.replica = replica
+        self.wrote = False
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None or state.wrote:
+            return DEFAULT_DB_ALIAS
+        if model._meta.app_label not in getattr(settings, 'BLOG_REPLICA_APPS', ['blog']):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # 关联对象从实例所在的数据库读取
+            return instance._state.db
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # 事务中要能读到本事务尚未提交的写入
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 副本和主库的数据相同，对象可以互相关联
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # 副本的表结构来自主库的复制，不单独迁移
+        return db not in replicas()
+
+
+class ReplicaRoutingMiddleware:
+    """
+    为每个请求决定是否可以使用副本；没有配置副本时不加载
+    应放在会话、认证等会访问数据库的中间件之前；同步、异步请求都可以使用
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.pin_seconds = getattr(settings, 'BLOG_REPLICA_PIN_SECONDS', 5)
+
+    def use_replica(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and not request.path.startswith('/admin/')
+        )
+
+    def routing_state(self, request):
+        return RoutingState(random.choice(replicas()) if self.use_replica(request) else None)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.routing_state(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        # sync_to_async 执行的 ORM 代码复制当前上下文，能读到这里设置的路由状态
+        state = self.routing_state(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(state, response)
+
+    def pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,48 @@
+"""
+博客文章搜索子系统
+根据 settings.BLOG_SEARCH_BACKEND 和当前数据库选择搜索后端
+"""
+from django.conf import settings
+from django.db import connection
+
+from .backends import (
+    BaseSearchBackend,
+    InvertedIndexBackend,
+    SimpleSearchBackend,
+    SQLiteFTSBackend,
+    PostgresSearchBackend,
+)
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (InvertedIndexBackend, SimpleSearchBackend, SQLiteFTSBackend, PostgresSearchBackend)
+}
+
+_backend = None
+
+
+def get_search_backend():
+    """返回当前配置的搜索后端实例"""
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'BLOG_SEARCH_BACKEND', 'auto')
+        if name == 'auto':
+            # PostgreSQL 自带的解析器不会切分中文，因此默认使用倒排索引
+            if connection.vendor == 'sqlite' and SQLiteFTSBackend.is_available():
+                name = SQLiteFTSBackend.name
+            else:
+                name = InvertedIndexBackend.name
+        _backend = BACKENDS[name]()
+    return _backend
+
+
+def max_results():
+    """单次搜索最多返回的结果数；结果数达到该值时实际命中的文章可能更多"""
+    return getattr(settings, 'BLOG_SEARCH_MAX_RESULTS', 1000)
+
+
+def search_post_ids(query, limit=None):
+    """搜索已发布的文章，返回按相关度排序的文章ID列表"""
+    if limit is None:
+        limit = max_results()
+    return get_search_backend().search(query, limit)
@@ -0,0 +1,385 @@
+"""
+文章全文搜索后端
+- InvertedIndexBackend：数据库无关的倒排索引（词项 → 文章及位置）+ BM25 排序
+- SQLiteFTSBackend：SQLite FTS5 虚拟表 + bm25() 排序
+- PostgresSearchBackend：tsvector 表达式 GIN 索引 + ts_rank_cd() 排序
+- SimpleSearchBackend：退回到 icontains 扫描
+所有后端都返回按相关度排序的已发布文章ID列表。
+倒排索引和 FTS5 后端都使用 blog.search.tokenizers 中的分词器切分文章和查询，
+因此能正确检索中文短语
+"""
+import math
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+
+from ..metrics import record_cache
+from ..models import Post, SearchDocument, SearchPosting
+from .tokenizers import get_tokenizer, is_single_cjk_char
+
+
+class BaseSearchBackend:
+    """搜索后端基类"""
+    name = 'base'
+
+    def search(self, query, limit):
+        """返回按相关度排序的已发布文章ID列表"""
+        raise NotImplementedError
+
+    def index_post(self, post):
+        """新增或更新一篇文章的索引"""
+
+    def remove_post(self, post_id):
+        """删除一篇文章的索引"""
+
+    def rebuild(self):
+        """重建全部索引，返回索引的文章数量"""
+        return Post.objects.count()
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """没有全文索引时的兜底实现：标题匹配优先，再按时间排序"""
+    name = 'simple'
+
+    def search(self, query, limit):
+        from django.db.models import Q, Case, When, Value, IntegerField
+
+        return list(
+            Post.objects.filter(status='published')
+            .filter(Q(title__icontains=query) | Q(content__icontains=query))
+            .annotate(
+                search_rank=Case(
+                    When(title__icontains=query, then=Value(2)),
+                    default=Value(1),
+                    output_field=IntegerField(),
+                )
+            )
+            .order_by('-search_rank', '-created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    SQLite FTS5 全文索引，索引表由迁移 0007 创建，并由信号保持同步。
+    写入前先用分词器切分，FTS5 中保存的是以空格分隔的词项
+    """
+    name = 'sqlite_fts'
+    table = 'blog_post_fts'
+    # bm25() 中各列的权重：标题命中比正文命中更重要
+    title_weight = 10.0
+    content_weight = 1.0
+
+    def __init__(self):
+        self.tokenizer = get_tokenizer()
+
+    @classmethod
+    def is_available(cls):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [cls.table]
+            )
+            return cursor.fetchone() is not None
+
+    def build_match_expression(self, query):
+        """
+        把查询转换成FTS5语法：每个短语加引号，短语之间为AND；
+        只有一个词项的短语使用前缀匹配（"djan" 匹配 django）。
+        单个汉字不会单独成为词项，FTS5 无法匹配词项中间或末尾的字，这类短语由 search 另行处理
+        """
+        expressions = []
+        for phrase in self.tokenizer.tokenize_query(query):
+            if is_single_cjk_char(phrase):
+                continue
+            expression = '"{}"'.format(' '.join(phrase).replace('"', '""'))
+            if len(phrase) == 1:
+                expression += '*'
+            expressions.append(expression)
+        return ' AND '.join(expressions)
+
+    def search(self, query, limit):
+        phrases = self.tokenizer.tokenize_query(query)
+        match = self.build_match_expression(query)
+        # 单个汉字：在分词后的列中扫描包含它的二元词（"客" 匹配 "博客"、"客搭"）
+        chars = [phrase[0] for phrase in phrases if is_single_cjk_char(phrase)]
+        if not match and not chars:
+            return []
+
+        conditions, params = ["p.status = 'published'"], []
+        if match:
+            conditions.append(f"{self.table} MATCH %s")
+            params.append(match)
+        for char in chars:
+            conditions.append("(f.title LIKE %s OR f.content LIKE %s)")
+            params += [f'%{char}%', f'%{char}%']
+        # bm25() 只能在 MATCH 查询中使用，只有单个汉字时按时间排序
+        order = f"bm25({self.table}, %s, %s), " if match else ""
+        if match:
+            params += [self.title_weight, self.content_weight]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT p.id
+                FROM {self.table} AS f
+                JOIN blog_post AS p ON p.id = f.rowid
+                WHERE {' AND '.join(conditions)}
+                ORDER BY {order}p.created_at DESC
+                LIMIT %s
+                """,
+                params + [limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _row(self, post_id, title, content):
+        return [
+            post_id,
+            ' '.join(self.tokenizer.tokenize(title)),
+            ' '.join(self.tokenizer.tokenize(content)),
+        ]
+
+    def index_post(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [post.pk])
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)",
+                self._row(post.pk, post.title, post.content),
+            )
+
+    def remove_post(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE rowid = %s", [post_id])
+
+    def rebuild(self, batch_size=500):
+        count = 0
+        rows = Post.objects.order_by('id').values_list('id', 'title', 'content').iterator(chunk_size=batch_size)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            batch = []
+            for post_id, title, content in rows:
+                batch.append(self._row(post_id, title, content))
+                if len(batch) >= batch_size:
+                    cursor.executemany(
+                        f"INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)", batch
+                    )
+                    count += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(
+                    f"INSERT INTO {self.table} (rowid, title, content) VALUES (%s, %s, %s)", batch
+                )
+                count += len(batch)
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+        return count
+
+
+class InvertedIndexBackend(BaseSearchBackend):
+    """
+    基于 SearchPosting / SearchDocument 两张表的倒排索引，适用于任何数据库。
+    查询时只读取查询词项的倒排记录，开销与命中结果数量相关，而与文章总数无关
+    """
+    name = 'index'
+    # BM25 参数
+    k1 = 1.2
+    b = 0.75
+    field_weights = {'title': 3.0, 'content': 1.0}
+    # 超过该长度的词项（如超长URL）不进入索引
+    max_term_length = 100
+    stats_cache_key = 'blog:search:stats'
+
+    def __init__(self):
+        self.tokenizer = get_tokenizer()
+
+    # ---------- 建立索引 ----------
+
+    def _build(self, post_id, title, content):
+        """切分一篇文章，返回 (SearchDocument, [SearchPosting, ...])"""
+        postings = []
+        lengths = {}
+        for field, text in (('title', title), ('content', content)):
+            terms = self.tokenizer.tokenize(text)
+            lengths[field] = len(terms)
+            positions = defaultdict(list)
+            for position, term in enumerate(terms):
+                if len(term) <= self.max_term_length:
+                    positions[term].append(position)
+            # 二元词中的单字也单独索引，位置取负数（-1、-2…）：
+            # 只用于统计单字查询的出现次数，短语匹配时忽略
+            for index, char in enumerate(self.tokenizer.tokenize_chars(text)):
+                positions[char].append(-1 - index)
+            postings.extend(
+                SearchPosting(term=term, post_id=post_id, field=field, positions=term_positions)
+                for term, term_positions in positions.items()
+            )
+        document = SearchDocument(
+            post_id=post_id,
+            title_length=lengths['title'],
+            content_length=lengths['content'],
+        )
+        return document, postings
+
+    def index_post(self, post):
+        document, postings = self._build(post.pk, post.title, post.content)
+        with transaction.atomic():
+            SearchPosting.objects.filter(post_id=post.pk).delete()
+            SearchPosting.objects.bulk_create(postings)
+            document.save()
+        cache.delete(self.stats_cache_key)
+
+    def remove_post(self, post_id):
+        # 文章删除时两张表的记录也会被级联删除，这里处理只删除索引的情况
+        SearchPosting.objects.filter(post_id=post_id).delete()
+        SearchDocument.objects.filter(post_id=post_id).delete()
+        cache.delete(self.stats_cache_key)
+
+    def rebuild(self, batch_size=500):
+        count = 0
+        rows = Post.objects.order_by('id').values_list('id', 'title', 'content').iterator(chunk_size=batch_size)
+        with transaction.atomic():
+            SearchPosting.objects.all().delete()
+            SearchDocument.objects.all().delete()
+            documents, postings = [], []
+            for post_id, title, content in rows:
+                document, post_postings = self._build(post_id, title, content)
+                documents.append(document)
+                postings.extend(post_postings)
+                if len(documents) >= batch_size:
+                    SearchDocument.objects.bulk_create(documents)
+                    SearchPosting.objects.bulk_create(postings, batch_size=5000)
+                    count += len(documents)
+                    documents, postings = [], []
+            SearchDocument.objects.bulk_create(documents)
+            SearchPosting.objects.bulk_create(postings, batch_size=5000)
+            count += len(documents)
+        cache.delete(self.stats_cache_key)
+        return count
+
+    # ---------- 查询 ----------
+
+    def _stats(self):
+        """索引中的文档数和各字段平均长度（缓存，索引变化时清除）"""
+        stats = cache.get(self.stats_cache_key)
+        record_cache('search_stats', stats is not None)
+        if stats is None:
+            stats = SearchDocument.objects.aggregate(
+                count=Count('post'),
+                title=Avg('title_length'),
+                content=Avg('content_length'),
+            )
+            cache.set(self.stats_cache_key, stats, 300)
+        return stats
+
+    def _match_phrase(self, phrase):
+        """返回 {文章ID: {字段: 短语出现次数}}，只统计已发布文章"""
+        postings = SearchPosting.objects.filter(post__status='published')
+        single = len(phrase) == 1
+        if is_single_cjk_char(phrase):
+            # 单个汉字在建立索引时已经单独成为词项（见 _build），按词项精确匹配
+            postings = postings.filter(term=phrase[0])
+        elif single:
+            # 只有一个词项的短语按前缀匹配（"djan" 匹配 django）
+            postings = postings.filter(term__startswith=phrase[0])
+        else:
+            postings = postings.filter(term__in=set(phrase))
+
+        grouped = defaultdict(dict)
+        for term, post_id, field, positions in postings.values_list('term', 'post_id', 'field', 'positions'):
+            grouped[(post_id, field)][term] = positions
+
+        matches = defaultdict(dict)
+        for (post_id, field), term_positions in grouped.items():
+            if single:
+                frequency = sum(len(positions) for positions in term_positions.values())
+            elif all(term in term_positions for term in phrase):
+                # 短语匹配：第i个词项必须出现在起始位置+i处（不使用单字的负数位置）
+                starts = {position for position in term_positions[phrase[0]] if position >= 0}
+                for offset, term in enumerate(phrase[1:], 1):
+                    starts &= {position - offset for position in term_positions[term] if position >= 0}
+                    if not starts:
+                        break
+                frequency = len(starts)
+            else:
+                frequency = 0
+            if frequency:
+                matches[post_id][field] = frequency
+        return matches
+
+    def search(self, query, limit):
+        phrases = self.tokenizer.tokenize_query(query)
+        if not phrases:
+            return []
+
+        phrase_matches = []
+        candidates = None
+        # 所有短语都必须命中
+        for phrase in phrases:
+            matches = self._match_phrase(phrase)
+            candidates = set(matches) if candidates is None else candidates & set(matches)
+            if not candidates:
+                return []
+            phrase_matches.append(matches)
+
+        stats = self._stats()
+        total = stats['count'] or 1
+        average_length = {
+            'title': stats['title'] or 1,
+            'content': stats['content'] or 1,
+        }
+        documents = {
+            post_id: (title_length, content_length, created_at)
+            for post_id, title_length, content_length, created_at in SearchDocument.objects.filter(
+                post_id__in=candidates
+            ).values_list('post_id', 'title_length', 'content_length', 'post__created_at')
+        }
+
+        scores = defaultdict(float)
+        for matches in phrase_matches:
+            frequency_in_docs = len(matches)
+            idf = math.log(1 + (total - frequency_in_docs + 0.5) / (frequency_in_docs + 0.5))
+            for post_id in candidates:
+                if post_id not in documents:
+                    continue
+                title_length, content_length, _ = documents[post_id]
+                lengths = {'title': title_length, 'content': content_length}
+                for field, frequency in matches[post_id].items():
+                    norm = 1 - self.b + self.b * lengths[field] / average_length[field]
+                    scores[post_id] += (
+                        self.field_weights[field] * idf
+                        * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+                    )
+
+        ranked = sorted(
+            scores,
+            key=lambda post_id: (scores[post_id], documents[post_id][2]),
+            reverse=True,
+        )
+        return ranked[:limit]
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    PostgreSQL 全文搜索
+    索引是迁移 0007 在 blog_post 上创建的 tsvector 表达式 GIN 索引，
+    由数据库自动维护，这里的表达式必须与索引定义完全一致才能命中索引
+    """
+    name = 'postgres'
+    document = (
+        "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple'::regconfig, coalesce(content, '')), 'B')"
+    )
+
+    def search(self, query, limit):
+        with connection.cursor() as cursor:
+            # ts_rank_cd 的归一化参数 1 按文档长度对数衰减，效果接近 BM25 的长度惩罚
+            cursor.execute(
+                f"""
+                SELECT id
+                FROM blog_post, websearch_to_tsquery('simple'::regconfig, %s) AS q
+                WHERE status = 'published' AND ({self.document}) @@ q
+                ORDER BY ts_rank_cd({self.document}, q, 1) DESC, created_at DESC
+                LIMIT %s
+                """,
+                [query, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,100 @@
+"""
+搜索分词器
+文章和查询词使用同一个分词器切分，保证索引中的词项与查询词项一致。
+可通过 settings.BLOG_SEARCH_TOKENIZER 指定自定义分词器类
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# 中日韩文字：CJK统一表意文字（含扩展A、兼容区）、日文假名、韩文音节
+CJK_CHARS = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+
+# 一段连续的中日韩文字，或一个由字母数字组成的单词（下划线视为分隔符）
+TOKEN_RE = re.compile(rf'(?P<cjk>[{CJK_CHARS}]+)|(?P<word>[^\W_{CJK_CHARS}]+)')
+
+
+def is_single_cjk_char(phrase):
+    """查询短语是否只是一个中日韩文字（二元分词下它不是独立的词项，需要单独处理）"""
+    return len(phrase) == 1 and len(phrase[0]) == 1 and re.fullmatch(f'[{CJK_CHARS}]', phrase[0]) is not None
+
+
+class BaseTokenizer:
+    """分词器基类"""
+
+    def normalize(self, text):
+        """全角转半角、统一小写"""
+        return unicodedata.normalize('NFKC', text).lower()
+
+    def tokenize(self, text):
+        """把文本切分成词项列表，词项在列表中的下标即为其位置"""
+        raise NotImplementedError
+
+    def tokenize_chars(self, text):
+        """
+        tokenize() 之外额外进入索引的单字（按出现顺序），使单字查询可以按词项精确匹配。
+        默认没有额外的单字
+        """
+        return []
+
+    def tokenize_query(self, query):
+        """
+        把查询切分成短语列表：按空白分隔的每一段是一个短语，
+        短语内的词项必须在文章中连续出现，短语之间为"与"关系
+        """
+        phrases = []
+        for part in query.split():
+            terms = self.tokenize(part)
+            if terms:
+                phrases.append(terms)
+        return phrases
+
+
+class BigramTokenizer(BaseTokenizer):
+    """
+    二元分词器
+    中日韩文字按相邻两字切分（"博客搭建" → 博客、客搭、搭建），
+    拉丁字母和数字按单词切分，适用于中英文混排的文章
+    """
+
+    def tokenize(self, text):
+        terms = []
+        for match in TOKEN_RE.finditer(self.normalize(text)):
+            run = match.group('cjk')
+            if run is None:
+                terms.append(match.group('word'))
+            elif len(run) == 1:
+                terms.append(run)
+            else:
+                terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+        return terms
+
+    def tokenize_chars(self, text):
+        """多字文本段中的每个字（单字成段的字 tokenize() 已经返回）"""
+        chars = []
+        for match in TOKEN_RE.finditer(self.normalize(text)):
+            run = match.group('cjk')
+            if run is not None and len(run) > 1:
+                chars.extend(run)
+        return chars
+
+
+class WhitespaceTokenizer(BaseTokenizer):
+    """按空白和标点切分，不对中日韩文字做切分（仅适合纯英文内容）"""
+
+    def tokenize(self, text):
+        return [match.group(0) for match in re.finditer(r'[^\W_]+', self.normalize(text))]
+
+
+_tokenizer = None
+
+
+def get_tokenizer():
+    """返回 settings.BLOG_SEARCH_TOKENIZER 指定的分词器实例"""
+    global _tokenizer
+    if _tokenizer is None:
+        path = getattr(settings, 'BLOG_SEARCH_TOKENIZER', 'blog.search.tokenizers.BigramTokenizer')
+        _tokenizer = import_string(path)()
+    return _tokenizer
@@ -0,0 +1,53 @@
+"""
+侧边栏数据提供者
+分类和标签列表（含已发布文章数）缓存在Django缓存中，缓存键包含订阅版本（见 blog/caching.py）：
+文章、分类、标签变化时 blog/signals.py 更新保存在数据库中的版本，所有进程随之使用新的缓存键，
+即使是进程内缓存（LocMem）也不会返回其他进程修改之前的数据，旧的缓存到期后自动清除
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .caching import aget_feed_version, get_feed_version
+from .metrics import record_cache
+
+SIDEBAR_CACHE_KEY = 'blog:sidebar'
+
+
+def _cache_key(version):
+    return f'{SIDEBAR_CACHE_KEY}:{version:.6f}'
+
+
+def _build_sidebar_data():
+    from .models import Category, Tag
+
+    published = Q(post__status='published')
+    return {
+        'categories': list(Category.objects.annotate(post_count=Count('post', filter=published))),
+        'tags': list(Tag.objects.annotate(post_count=Count('post', filter=published))),
+    }
+
+
+def get_sidebar_context():
+    """返回侧边栏需要的模板变量：categories 和 tags"""
+    key = _cache_key(get_feed_version())
+    data = cache.get(key)
+    record_cache('sidebar', data is not None)
+    if data is None:
+        data = _build_sidebar_data()
+        timeout = getattr(settings, 'BLOG_SIDEBAR_CACHE_TIMEOUT', 3600)
+        cache.set(key, data, timeout)
+    return data
+
+
+async def aget_sidebar_context():
+    """get_sidebar_context() 的异步版本；缓存命中时不占用线程"""
+    key = _cache_key(await aget_feed_version())
+    data = await cache.aget(key)
+    record_cache('sidebar', data is not None)
+    if data is None:
+        data = await sync_to_async(_build_sidebar_data)()
+        timeout = getattr(settings, 'BLOG_SIDEBAR_CACHE_TIMEOUT', 3600)
+        await cache.aset(key, data, timeout)
+    return data
@@ -2,10 +2,22 @@
 博客应用的信号处理器
 用于在模型事件发生时自动执行特定操作
 """
-from django.db.models.signals import post_save, pre_delete
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Post, Category, ActivityLog
+from django.urls import reverse
+from .models import Post, PostTag, Category, Tag, Comment, comments_moderated, posts_transitioned
+from .activity import log_activity
+from .search import get_search_backend
+from .caching import bump_content_version
+from . import metrics, navigation, page_cache, sitemaps
+
+logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Post)
@@ -13,8 +25,8 @@ def post_saved_handler(sender, instance, created, **kwargs):
     """文章保存后的处理器"""
     if created:
         # 新创建文章时的操作
-        print(f"📝 新文章已创建：{instance.title}")
-        ActivityLog.objects.create(
+        logger.info("新文章已创建：%s", instance.title)
+        log_activity(
             action='create_post',
             description=f"创建了新文章：{instance.title}",
             user=instance.author,
@@ -22,8 +34,8 @@ def post_saved_handler(sender, instance, created, **kwargs):
         )
     else:
         # 文章更新时的操作
-        print(f"✏️ 文章已更新：{instance.title}")
-        ActivityLog.objects.create(
+        logger.info("文章已更新：%s", instance.title)
+        log_activity(
             action='update_post',
             description=f"更新了文章：{instance.title}",
             user=instance.author,
@@ -35,8 +47,8 @@ def post_saved_handler(sender, instance, created, **kwargs):
 def user_created_handler(sender, instance, created, **kwargs):
     """用户创建后的处理器"""
     if created:
-        print(f"👤 新用户已注册：{instance.username}")
-        ActivityLog.objects.create(
+        logger.info("新用户已注册：%s", instance.username)
+        log_activity(
             action='create_user',
             description=f"新用户注册：{instance.username}",
             user=instance,
@@ -47,8 +59,8 @@ def user_created_handler(sender, instance, created, **kwargs):
 @receiver(pre_delete, sender=Post)
 def post_delete_handler(sender, instance, **kwargs):
     """文章删除前的处理器"""
-    print(f"🗑️ 即将删除文章：{instance.title}")
-    ActivityLog.objects.create(
+    logger.info("即将删除文章：%s", instance.title)
+    log_activity(
         action='delete_post',
         description=f"删除了文章：{instance.title}",
         user=instance.author,
@@ -56,5 +68,256 @@ def post_delete_handler(sender, instance, **kwargs):
     )
 
 
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(m2m_changed, sender=Post.tags.through)
+def content_version_handler(sender, **kwargs):
+    """公开页面的内容发生变化，更新内容版本使 ETag 失效（订阅和侧边栏的缓存也随之失效）"""
+    bump_content_version()
+
+
+@receiver(post_save, sender=Post)
+def post_tag_fields_handler(sender, instance, created, update_fields=None, **kwargs):
+    """文章的状态或创建时间变化后，同步标签中间表中的冗余字段"""
+    if created or (update_fields and not {'status', 'created_at'} & set(update_fields)):
+        return  # 新文章还没有标签
+    PostTag.objects.filter(post=instance).update(status=instance.status, created_at=instance.created_at)
+
+
+@receiver(m2m_changed, sender=PostTag)
+def post_tags_added_handler(sender, instance, action, reverse, pk_set, **kwargs):
+    """tags.add()、tags.set() 新建的中间表记录使用默认值，按文章填写冗余字段"""
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # 从标签一侧添加：instance 是标签，pk_set 是文章
+        PostTag.objects.filter(tag=instance, post_id__in=pk_set).refresh_from_posts()
+    else:
+        PostTag.objects.filter(post=instance, tag_id__in=pk_set).update(
+            status=instance.status, created_at=instance.created_at,
+        )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_content_version_handler(sender, **kwargs):
+    """评论只显示在详情页，不影响订阅"""
+    bump_content_version(feeds=False)
+
+
+@receiver(post_save, sender=Post)
+def search_index_handler(sender, instance, update_fields=None, **kwargs):
+    """文章保存后更新全文搜索索引"""
+    if update_fields and not {'title', 'content'} & set(update_fields):
+        return  # 标题和正文都没有变化，无需重新索引
+    get_search_backend().index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def search_index_delete_handler(sender, instance, **kwargs):
+    """文章删除后移除全文搜索索引"""
+    get_search_backend().remove_post(instance.pk)
+
+
+def _listing_paths():
+    """文章变化时需要清除缓存的列表类页面（首页、列表、搜索；订阅由订阅版本失效）"""
+    return [
+        reverse('home'),
+        reverse('blog:post_list'),
+        reverse('blog:search_posts'),
+    ]
+
+
+def _purge_post_pages(post_id, category_ids=(), tag_ids=None):
+    """清除一篇文章相关页面的整页缓存：详情页、分类页、标签页和列表页"""
+    paths = [reverse('blog:post_detail', args=[post_id])] + _listing_paths()
+    category_ids = [pk for pk in category_ids if pk]
+    if category_ids:
+        paths += [
+            reverse('blog:category_posts', args=[slug])
+            for slug in Category.objects.filter(pk__in=category_ids).values_list('slug', flat=True)
+        ]
+    tags = Tag.objects.filter(pk__in=tag_ids) if tag_ids is not None else Tag.objects.filter(post__pk=post_id)
+    paths += [reverse('blog:tag_posts', args=[slug]) for slug in tags.values_list('slug', flat=True)]
+    page_cache.purge_paths(paths)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous_category(sender, instance, **kwargs):
+    """记住文章保存前的分类，文章换分类时原分类页也要清除缓存"""
+    if page_cache.is_enabled() and instance.pk:
+        instance._previous_category_id = (
+            Post.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Post)
+def page_cache_post_saved_handler(sender, instance, **kwargs):
+    """文章保存后清除相关页面的整页缓存"""
+    if page_cache.is_enabled():
+        previous_category_id = getattr(instance, '_previous_category_id', None)
+        _purge_post_pages(instance.pk, category_ids={instance.category_id, previous_category_id})
+
+
+@receiver(pre_delete, sender=Post)
+def page_cache_post_deleted_handler(sender, instance, **kwargs):
+    """文章删除前（标签关系还在）清除相关页面的整页缓存"""
+    if page_cache.is_enabled():
+        _purge_post_pages(instance.pk, category_ids={instance.category_id})
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def page_cache_post_tags_handler(sender, instance, action, pk_set, **kwargs):
+    """文章标签变化后清除文章和受影响标签页的整页缓存"""
+    if not page_cache.is_enabled() or action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if kwargs['reverse']:
+        # 从标签一侧修改：instance 是标签，pk_set 是文章
+        page_cache.purge_all()
+    else:
+        _purge_post_pages(instance.pk, category_ids={instance.category_id}, tag_ids=pk_set)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def page_cache_comment_handler(sender, instance, **kwargs):
+    """评论变化只影响文章详情页和评论片段"""
+    page_cache.purge_paths([
+        reverse('blog:post_detail', args=[instance.post_id]),
+        reverse('blog:post_comments', args=[instance.post_id]),
+    ])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def page_cache_sidebar_handler(sender, **kwargs):
+    """分类、标签显示在每个页面的侧边栏中，需要清除全部整页缓存"""
+    page_cache.purge_all()
+
+
+def _purge_neighbor_pages(post):
+    """相邻文章详情页中的上一篇/下一篇导航随文章变化（导航缓存本身随订阅版本失效）"""
+    post_ids = navigation.neighbor_ids(post)
+    page_cache.purge_paths([reverse('blog:post_detail', args=[post_id]) for post_id in post_ids])
+
+
+@receiver(post_save, sender=Post)
+def navigation_post_saved_handler(sender, instance, update_fields=None, **kwargs):
+    """文章发布、撤回或修改标题后清除相邻文章详情页的整页缓存"""
+    if not page_cache.is_enabled() or (update_fields and not {'status', 'title'} & set(update_fields)):
+        return
+    _purge_neighbor_pages(instance)
+
+
+@receiver(post_delete, sender=Post)
+def navigation_post_deleted_handler(sender, instance, **kwargs):
+    """文章删除后，前后两篇文章的导航改为互相指向"""
+    if page_cache.is_enabled():
+        _purge_neighbor_pages(instance)
+
+
+@receiver(posts_transitioned, sender=Post)
+def posts_transitioned_handler(sender, post_ids, to_status, **kwargs):
+    """批量状态转换（queryset.update，不触发post_save）后清理缓存"""
+    logger.info("%d 篇文章状态已变为 %s", len(post_ids), to_status)
+    bump_content_version()
+    if page_cache.is_enabled():
+        if len(post_ids) > 20:
+            page_cache.purge_all()
+        else:
+            for post in Post.objects.filter(pk__in=post_ids).only('id', 'created_at', 'category_id'):
+                _purge_neighbor_pages(post)
+                _purge_post_pages(post.pk, category_ids={post.category_id})
+
+
+@receiver(comments_moderated, sender=Comment)
+def comments_moderated_handler(sender, post_ids, **kwargs):
+    """后台批量审核评论（queryset.update，不触发post_save）后更新内容版本、清除详情页和评论片段"""
+    bump_content_version(feeds=False)
+    paths = []
+    for post_id in post_ids:
+        paths += [reverse('blog:post_detail', args=[post_id]), reverse('blog:post_comments', args=[post_id])]
+    page_cache.purge_paths(paths)
+
+
+def _sitemap_auto_update():
+    return getattr(settings, 'BLOG_SITEMAP_AUTO_UPDATE', False)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def sitemap_post_handler(sender, instance, **kwargs):
+    """文章变化后（事务提交后）更新它所在的站点地图分片"""
+    if _sitemap_auto_update():
+        post_ids = [instance.pk]
+        transaction.on_commit(lambda: sitemaps.update_post_shards(post_ids))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def sitemap_slug_handler(sender, **kwargs):
+    """分类、标签变化后更新对应的站点地图"""
+    if _sitemap_auto_update():
+        section = 'categories' if sender is Category else 'tags'
+        transaction.on_commit(lambda: sitemaps.update_section(section))
+
+
+@receiver(posts_transitioned, sender=Post)
+def sitemap_transition_handler(sender, post_ids, **kwargs):
+    """批量状态转换后更新这些文章所在的分片"""
+    if _sitemap_auto_update():
+        post_ids = list(post_ids)
+        transaction.on_commit(lambda: sitemaps.update_post_shards(post_ids))
+
+
+def _adjust_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(comment_count=F('comment_count') + delta)
+
+
+@receiver(post_save, sender=Comment)
+def comment_count_saved_handler(sender, instance, created, **kwargs):
+    """评论新增、启用/禁用或移到其他文章后调整文章的评论数（Comment.save() 的事务中执行）"""
+    now_counted = instance.post_id if instance.is_active else None
+    if created:
+        previous = None
+    elif not hasattr(instance, '_counted_post_id'):
+        # 加载时没有读取 post、is_active（.only()/.defer()），不知道原来的状态，直接重新计算
+        Post.objects.filter(pk=instance.post_id).refresh_comment_counts()
+        return
+    else:
+        previous = instance._counted_post_id
+    if previous == now_counted:
+        return
+    if previous is not None:
+        _adjust_comment_count(previous, -1)
+    if now_counted is not None:
+        _adjust_comment_count(now_counted, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_count_deleted_handler(sender, instance, origin=None, **kwargs):
+    """评论删除后减少文章的评论数；删除文章时级联删除的评论不需要处理"""
+    if isinstance(origin, Post) or getattr(origin, 'model', None) is Post:
+        return
+    counted = getattr(instance, '_counted_post_id', instance.post_id if instance.is_active else None)
+    if counted is not None:
+        _adjust_comment_count(counted, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_metrics_handler(sender, instance, created, **kwargs):
+    """统计评论提交数"""
+    if created:
+        metrics.comments_created.inc()
+
+
 # 您可以在这里添加更多信号处理器
 # 比如：自动创建分类、发送邮件通知、清理缓存等
@@ -0,0 +1,224 @@
+"""
+站点地图（sitemaps.org 协议）
+/sitemap.xml 是站点地图索引，列出各个分片 /sitemap-<类型>-<序号>.xml，类型有文章、分类、标签。
+分片内容预先生成并保存在 SitemapShard 表中，请求时只读取一行，不在请求中查询文章：
+- 按主键范围分片：第 n 片包含 id 在 (n × 分片大小, (n + 1) × 分片大小] 内的对象，
+  一篇文章的变化只影响它所在的分片，增删文章也不会使其他分片的内容移动
+- 每个分片有内容指纹（文章：已发布文章数、id 之和、最大 updated_at），指纹不变的分片不重新生成
+- 文章、分类、标签变化后由 blog/signals.py 在事务提交后更新受影响的分片
+  （settings.BLOG_SITEMAP_AUTO_UPDATE）；批量导入等不触发信号的操作之后运行
+      python manage.py update_sitemaps
+分片中的 URL 不含域名，输出时替换为当前请求的域名，同一份数据可以在多个域名下使用
+"""
+import hashlib
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Q, Sum
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .models import Post, Category, Tag, SitemapShard
+
+# 协议规定单个站点地图文件最多 50000 个 URL
+MAX_URLS_PER_SHARD = 50000
+ORIGIN_PLACEHOLDER = '{{origin}}'
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+
+
+def shard_size():
+    return min(getattr(settings, 'BLOG_SITEMAP_SHARD_SIZE', 10000), MAX_URLS_PER_SHARD)
+
+
+def _digest(value):
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def _path_format(url_name, placeholder):
+    """分片中有上万个 URL，逐个调用 reverse() 很慢，先用占位参数生成一次路径模板"""
+    return reverse(url_name, args=[placeholder]).replace(str(placeholder), '{}')
+
+
+def _shard_filter(numbers, size):
+    """主键落在这些分片范围内的对象"""
+    condition = Q()
+    for number in numbers:
+        condition |= Q(pk__gt=number * size, pk__lte=(number + 1) * size)
+    return condition
+
+
+class PostSection:
+    """已发布文章，lastmod 为 Post.updated_at"""
+    name = 'posts'
+
+    def queryset(self):
+        return Post.objects.filter(status='published')
+
+    def fingerprints(self, numbers=None):
+        """{分片序号: (指纹, 最后修改时间)}，一条 GROUP BY 查询，不读取文章内容"""
+        size = shard_size()
+        queryset = self.queryset()
+        if numbers is not None:
+            queryset = queryset.filter(_shard_filter(numbers, size))
+        rows = (
+            queryset.annotate(shard=(F('id') - 1) / size)
+            .values('shard')
+            .annotate(count=Count('id'), id_sum=Sum('id'), lastmod=Max('updated_at'))
+            .order_by()
+        )
+        return {
+            row['shard']: (_digest(f"{row['count']}:{row['id_sum']}:{row['lastmod'].isoformat()}"), row['lastmod'])
+            for row in rows
+        }
+
+    def entries(self, number):
+        size = shard_size()
+        rows = (
+            self.queryset().filter(_shard_filter([number], size))
+            .order_by('id').values_list('id', 'updated_at')
+        )
+        path = _path_format('blog:post_detail', 987654321)
+        return [(path.format(pk), updated_at) for pk, updated_at in rows]
+
+
+class SlugSection:
+    """分类、标签：对象很少，指纹直接由各分片的 (id, slug) 计算；没有修改时间，不输出 lastmod"""
+
+    def __init__(self, name, model, url_name):
+        self.name = name
+        self.model = model
+        self.url_name = url_name
+
+    def _rows(self, numbers=None):
+        queryset = self.model.objects.order_by('pk')
+        if numbers is not None:
+            queryset = queryset.filter(_shard_filter(numbers, shard_size()))
+        return queryset.values_list('pk', 'slug')
+
+    def fingerprints(self, numbers=None):
+        size = shard_size()
+        shards = {}
+        for pk, slug in self._rows(numbers):
+            shards.setdefault((pk - 1) // size, []).append(f'{pk}:{slug}')
+        return {number: (_digest('\n'.join(items)), None) for number, items in shards.items()}
+
+    def entries(self, number):
+        path = _path_format(self.url_name, 'slug-placeholder')
+        return [(path.format(slug), None) for _, slug in self._rows([number])]
+
+
+SECTIONS = {
+    section.name: section
+    for section in (
+        PostSection(),
+        SlugSection('categories', Category, 'blog:category_posts'),
+        SlugSection('tags', Tag, 'blog:tag_posts'),
+    )
+}
+
+
+def render_urlset(entries):
+    """生成 <urlset>，URL 的域名部分为占位符"""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for path, lastmod in entries:
+        loc = f'<loc>{ORIGIN_PLACEHOLDER}{escape(path)}</loc>'
+        if lastmod is not None:
+            loc += f'<lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod>'
+        lines.append(f'<url>{loc}</url>')
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n'
+
+
+def update_section(name, numbers=None):
+    """
+    重新生成一类站点地图中指纹发生变化的分片，删除已经没有对象的分片
+    numbers 为空时检查全部分片，否则只检查这些分片；返回 (重新生成数, 删除数)
+    """
+    section = SECTIONS[name]
+    current = section.fingerprints(numbers)
+    existing = SitemapShard.objects.filter(section=name)
+    if numbers is not None:
+        existing = existing.filter(number__in=numbers)
+    stored = dict(existing.values_list('number', 'fingerprint'))
+
+    regenerated = 0
+    for number, (fingerprint, lastmod) in sorted(current.items()):
+        if stored.get(number) == fingerprint:
+            continue
+        entries = section.entries(number)
+        SitemapShard.objects.update_or_create(
+            section=name, number=number,
+            defaults={
+                'fingerprint': fingerprint,
+                'content': render_urlset(entries),
+                'url_count': len(entries),
+                'lastmod': lastmod,
+            },
+        )
+        regenerated += 1
+
+    removed = set(stored) - set(current)
+    if removed:
+        SitemapShard.objects.filter(section=name, number__in=removed).delete()
+    return regenerated, len(removed)
+
+
+def update_sitemaps(sections=None):
+    """检查并更新全部（或指定类型的）站点地图分片，返回 {类型: (重新生成数, 删除数)}"""
+    return {name: update_section(name) for name in (sections or SECTIONS)}
+
+
+def update_post_shards(post_ids):
+    """只更新这些文章所在的分片"""
+    size = shard_size()
+    return update_section('posts', sorted({(pk - 1) // size for pk in post_ids}))
+
+
+# ---------- 视图 ----------
+
+def _origin(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def _xml_response(request, content, etag):
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(content.replace(ORIGIN_PLACEHOLDER, _origin(request)), content_type=CONTENT_TYPE)
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+def sitemap_index(request):
+    """站点地图索引；还没有生成过任何分片时（如刚部署）先生成一次"""
+    shards = list(SitemapShard.objects.values_list('section', 'number', 'fingerprint', 'lastmod'))
+    if not shards:
+        update_sitemaps()
+        shards = list(SitemapShard.objects.values_list('section', 'number', 'fingerprint', 'lastmod'))
+
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+    ]
+    for section, number, _, lastmod in shards:
+        loc = f'<loc>{ORIGIN_PLACEHOLDER}{reverse("sitemap_section", args=[section, number])}</loc>'
+        if lastmod is not None:
+            loc += f'<lastmod>{lastmod.isoformat(timespec="seconds")}</lastmod>'
+        lines.append(f'<sitemap>{loc}</sitemap>')
+    lines.append('</sitemapindex>')
+    etag = _digest(','.join(fingerprint for _, _, fingerprint, _ in shards))
+    return _xml_response(request, '\n'.join(lines) + '\n', etag)
+
+
+def sitemap_section(request, section, number):
+    shard = SitemapShard.objects.filter(section=section, number=number).values_list('content', 'fingerprint').first()
+    if shard is None:
+        raise Http404
+    content, fingerprint = shard
+    return _xml_response(request, content, fingerprint)
@@ -0,0 +1,179 @@
+"""
+垃圾评论预过滤
+评论保存之前依次经过 settings.BLOG_COMMENT_SPAM_FILTERS 中的过滤器（类的导入路径，可以替换或增加），
+所有检查都在内存或缓存中完成，拒绝评论时不执行SQL：
+- LinkFilter：链接数超过 BLOG_COMMENT_MAX_LINKS
+- KeywordFilter：包含 BLOG_COMMENT_SPAM_KEYWORDS 中的关键词；关键词预先编译成 Aho-Corasick 自动机，
+  一次扫描评论即可匹配全部关键词，耗时与关键词数量无关
+- DuplicateFilter：同一用户在 BLOG_COMMENT_DUPLICATE_WINDOW 秒内重复提交相同内容，
+  或较长的内容被任何人重复提交（内容哈希保存在缓存中）
+评论保存成功后调用 record_comment()，过滤器在这时才记录评论（如内容哈希），
+文章不存在、保存失败时用户可以原样重试
+"""
+import hashlib
+import re
+import unicodedata
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+DEFAULT_FILTERS = [
+    'blog.spam.LinkFilter',
+    'blog.spam.KeywordFilter',
+    'blog.spam.DuplicateFilter',
+]
+
+
+def normalize(text):
+    """全角转半角、统一小写、合并空白"""
+    return ' '.join(unicodedata.normalize('NFKC', text).lower().split())
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 多模式匹配自动机"""
+
+    def __init__(self, keywords):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]
+        for keyword in keywords:
+            keyword = normalize(keyword)
+            if keyword:
+                self._insert(keyword)
+        self._build_fail_links()
+
+    def _insert(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(None)
+            state = next_state
+        self.output[state] = keyword
+
+    def _build_fail_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # 较短的关键词是较长关键词的后缀时，也要在这个状态报告
+                if self.output[next_state] is None:
+                    self.output[next_state] = self.output[self.fail[next_state]]
+
+    def search(self, text):
+        """返回文本中出现的第一个关键词，没有时返回 None"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state] is not None:
+                return output[state]
+        return None
+
+
+class SpamFilter:
+    """过滤器基类：check() 返回 True 表示是垃圾评论"""
+    reason = 'spam'
+    message = '评论未通过检查，请修改后重试'
+
+    def check(self, content, user):
+        raise NotImplementedError
+
+    def record(self, content, user):
+        """评论保存成功后调用"""
+
+
+class LinkFilter(SpamFilter):
+    reason = 'links'
+    message = '评论中的链接过多'
+    LINK_RE = re.compile(r'https?://|www\.', re.I)
+
+    def __init__(self):
+        self.max_links = getattr(settings, 'BLOG_COMMENT_MAX_LINKS', 3)
+
+    def check(self, content, user):
+        return len(self.LINK_RE.findall(content)) > self.max_links
+
+
+class KeywordFilter(SpamFilter):
+    reason = 'keyword'
+    message = '评论包含不允许的内容'
+
+    def __init__(self, keywords=None):
+        if keywords is None:
+            keywords = getattr(settings, 'BLOG_COMMENT_SPAM_KEYWORDS', [])
+        self.automaton = KeywordAutomaton(keywords)
+
+    def check(self, content, user):
+        return self.automaton.search(normalize(content)) is not None
+
+
+class DuplicateFilter(SpamFilter):
+    """
+    评论保存后在缓存中记录内容哈希，窗口期内再次提交相同内容时哈希已存在
+    "谢谢分享"之类的短评论很常见，只对同一用户判重；达到 min_length 的内容对所有用户判重
+    """
+    reason = 'duplicate'
+    message = '请不要重复提交相同的评论'
+
+    def __init__(self):
+        self.window = getattr(settings, 'BLOG_COMMENT_DUPLICATE_WINDOW', 600)
+        self.min_length = getattr(settings, 'BLOG_COMMENT_DUPLICATE_MIN_LENGTH', 20)
+
+    def _keys(self, content, user):
+        content = normalize(content)
+        digest = hashlib.sha1(content.encode()).hexdigest()
+        keys = [f'blog:comment-hash:user:{user.pk}:{digest}']
+        if len(content) >= self.min_length:
+            keys.append(f'blog:comment-hash:all:{digest}')
+        return keys
+
+    def check(self, content, user):
+        try:
+            return bool(cache.get_many(self._keys(content, user)))
+        except Exception:
+            return False  # 缓存不可用时不拦截
+
+    def record(self, content, user):
+        try:
+            cache.set_many(dict.fromkeys(self._keys(content, user), 1), self.window)
+        except Exception:
+            pass
+
+
+_filters = None
+
+
+def get_spam_filters():
+    global _filters
+    if _filters is None:
+        paths = getattr(settings, 'BLOG_COMMENT_SPAM_FILTERS', DEFAULT_FILTERS)
+        _filters = [import_string(path)() for path in paths]
+    return _filters
+
+
+def check_comment(content, user):
+    """依次执行过滤器，返回第一个判定为垃圾评论的过滤器，全部通过时返回 None"""
+    for spam_filter in get_spam_filters():
+        if spam_filter.check(content, user):
+            return spam_filter
+    return None
+
+
+def record_comment(content, user):
+    """评论保存成功后通知各过滤器"""
+    for spam_filter in get_spam_filters():
+        spam_filter.record(content, user)
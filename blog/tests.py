@@ -1,3 +1,1397 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache, caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection, connections
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import apps, async_views, metrics, navigation, profiling, ratelimit, rendering, routers, sitemaps, spam, view_counter, views
+from .activity import ActivityLogWriter, log_activity
+from .benchmark import find_regressions, measure
+from .models import Post, PostTag, Category, Tag, Comment, ActivityLog, ContentVersion, SearchPosting, SitemapShard
+from .pagination import CursorPaginator, SequenceCursorPaginator
+from .search import InvertedIndexBackend, SQLiteFTSBackend, get_search_backend, search_post_ids, tokenizers
+from .sidebar import aget_sidebar_context, get_sidebar_context
+
+# 测试用的只读副本：与 settings 中配置副本的方式相同，测试时镜像到测试主库（TEST.MIRROR），
+# 必须在测试运行器创建测试数据库之前加入
+connections.settings.setdefault('replica1', {**connections.settings['default'], 'TEST': {'MIRROR': 'default'}})
+
+
+
+@override_settings(BLOG_ACTIVITY_LOG_MODE='sync')
+class BlogTestCase(TestCase):
+    """测试数据：多个作者、分类、标签和带评论的已发布文章"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [User.objects.create_user(username=f'author{i}') for i in range(3)]
+        cls.categories = [
+            Category.objects.create(name=f'分类{i}', slug=f'category-{i}') for i in range(2)
+        ]
+        cls.tags = [Tag.objects.create(name=f'标签{i}', slug=f'tag-{i}') for i in range(3)]
+        cls.posts = []
+        for i in range(12):
+            post = Post.objects.create(
+                title=f'Django博客文章{i}',
+                content=f'这是第{i}篇关于Django博客搭建的文章。',
+                author=cls.authors[i % 3],
+                category=cls.categories[i % 2],
+                status='published',
+            )
+            post.tags.set(cls.tags[:i % 3 + 1])
+            cls.posts.append(post)
+        for i, post in enumerate(cls.posts[:3]):
+            for author in cls.authors:
+                Comment.objects.create(post=post, author=author, content=f'评论{i}')
+
+    def setUp(self):
+        # 侧边栏使用缓存，先预热，使各页面的查询数只取决于页面本身
+        cache.clear()
+        caches['pages'].clear()
+        get_sidebar_context()
+
+    def tearDown(self):
+        view_counter.flush()
+
+
+class PublishedManagerTests(BlogTestCase):
+
+    def test_published_excludes_drafts(self):
+        draft = Post.objects.create(title='草稿', content='草稿', author=self.authors[0])
+        self.assertNotIn(draft, Post.published.all())
+        self.assertEqual(Post.published.count(), 12)
+
+    def test_published_loads_related_objects(self):
+        with self.assertNumQueries(2):
+            for post in Post.published.all():
+                str(post)
+                post.category.name
+                [tag.name for tag in post.tags.all()]
+
+
+class QueryCountTests(BlogTestCase):
+    """各页面的SQL查询数不应随文章、标签、评论数量增长"""
+
+    def test_post_list(self):
+        # 内容版本 + 订阅版本（侧边栏缓存键） + 文章 + 标签
+        # （游标分页不需要COUNT；测试使用进程内缓存，版本从数据库读取）
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('blog:post_list'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail(self):
+        post = self.posts[0]
+        # 内容版本 + 订阅版本（侧边栏、导航缓存键各读一次） + 文章（含作者、分类） + 标签
+        # + 上一篇 + 下一篇 + 评论（含作者）
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('blog:post_detail', args=[post.id]))
+        self.assertContains(response, post.title)
+        # 导航已缓存
+        with self.assertNumQueries(6):
+            self.client.get(reverse('blog:post_detail', args=[post.id]))
+
+    def test_category_posts(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('blog:category_posts', args=['category-0']))
+        self.assertEqual(len(response.context['posts']), 6)
+
+    def test_tag_posts(self):
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('blog:tag_posts', args=['tag-0']))
+        self.assertEqual(len(response.context['posts']), 10)
+
+    def test_search_posts(self):
+        # 两个版本 + 搜索索引 + 当前页文章 + 标签
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('blog:search_posts'), {'q': 'Django'})
+        self.assertEqual(response.context['results_count'], 12)
+
+    def test_activity_log(self):
+        # 订阅版本（侧边栏缓存键） + 日志
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('blog:activity_log'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_rss_feed(self):
+        # 订阅版本 + 文章 + 标签
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('blog:rss_feed'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_draft_list(self):
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        Post.objects.create(title='草稿', content='草稿', author=self.authors[0])
+        # 会话 + 用户 + 草稿（含作者）
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('blog:draft_list'))
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(BLOG_VIEW_COUNT_FLUSH_THRESHOLD=3, BLOG_VIEW_COUNT_FLUSH_INTERVAL=60)
+class ViewCounterTests(BlogTestCase):
+
+    def view_count(self, post):
+        return Post.objects.values_list('view_count', flat=True).get(pk=post.pk)
+
+    def test_buffered_until_threshold(self):
+        post = self.posts[0]
+        buffer = view_counter.MemoryViewCountBuffer()
+        self.addCleanup(buffer.flush)
+        buffer.increment(post.pk)
+        buffer.increment(post.pk)
+        self.assertEqual((self.view_count(post), buffer.pending()), (0, 2))
+        buffer.increment(post.pk)
+        self.assertEqual((self.view_count(post), buffer.pending()), (3, 0))
+
+    @override_settings(BLOG_VIEW_COUNT_FLUSH_INTERVAL=0.01)
+    def test_timer_flushes_buffer(self):
+        flushed = threading.Event()
+        buffer = view_counter.MemoryViewCountBuffer()
+        with mock.patch.object(view_counter, 'apply_view_counts', side_effect=lambda counts: flushed.set()) as apply:
+            buffer.increment(self.posts[0].pk)
+            self.assertTrue(flushed.wait(5))
+        apply.assert_called_once_with({self.posts[0].pk: 1})
+        self.assertEqual(buffer.pending(), 0)
+
+    def test_failed_flush_restores_counts(self):
+        post = self.posts[0]
+        buffer = view_counter.MemoryViewCountBuffer()
+        self.addCleanup(buffer.flush)
+        buffer.increment(post.pk, 2)
+        with mock.patch.object(view_counter, 'apply_view_counts', side_effect=DatabaseError), \
+                self.assertLogs('blog.view_counter', 'ERROR'), self.assertRaises(DatabaseError):
+            buffer.flush()
+        self.assertEqual(buffer.pending(), 2)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(self.view_count(post), 2)
+
+    def test_cache_buffer_flush_all(self):
+        post = self.posts[1]
+        buffer = view_counter.CacheViewCountBuffer()
+        buffer.increment(post.pk, 2)
+        # 其他进程缓冲的计数（本进程没有记录为待写回）
+        cache.incr(buffer.make_key(post.pk), 5)
+        self.assertEqual(buffer.flush_all(), 7)
+        self.assertEqual(self.view_count(post), 7)
+
+    def test_concurrent_drains_take_counts_once(self):
+        post = self.posts[2]
+        first, second = view_counter.CacheViewCountBuffer(), view_counter.CacheViewCountBuffer()
+        key = first.make_key(post.pk)
+        cache.set(key, 5, None)
+        get_many = cache.get_many
+        drained = {}
+
+        def racing_get_many(keys):
+            # 第一个进程读到计数之后、扣减之前，第二个进程完成了写回
+            values = get_many(keys)
+            if not drained:
+                drained['second'] = None
+                drained['second'] = second._drain([post.pk])
+            return values
+
+        with mock.patch.object(first.cache, 'get_many', side_effect=racing_get_many):
+            drained['first'] = first._drain([post.pk])
+        self.assertEqual(drained, {'second': {post.pk: 5}, 'first': {}})
+        self.assertEqual(cache.get(key), 0)
+
+    @override_settings(BLOG_VIEW_COUNT_BUFFER='cache')
+    def test_cache_mode_requires_shared_cache(self):
+        self.assertEqual([warning.id for warning in apps.check_shared_caches(None)], ['blog.W001'])
+        with mock.patch.object(view_counter, '_buffer', view_counter.CacheViewCountBuffer()):
+            with self.assertRaises(CommandError):
+                call_command('flush_view_counts', stdout=StringIO())
+
+
+class SidebarTests(BlogTestCase):
+
+    def counts(self, data):
+        return {category.slug: category.post_count for category in data['categories']}
+
+    def test_cache_hit(self):
+        # 缓存已在 setUp 中预热，只查询订阅版本
+        with self.assertNumQueries(1):
+            data = get_sidebar_context()
+        self.assertEqual(self.counts(data), {'category-0': 6, 'category-1': 6})
+        with self.assertNumQueries(1):
+            async_to_sync(aget_sidebar_context)()
+
+    def test_signals_invalidate(self):
+        Category.objects.create(name='新分类', slug='new')
+        self.assertIn('new', self.counts(get_sidebar_context()))
+        post = self.posts[0]
+        post.status = 'draft'
+        post.save()
+        self.assertEqual(self.counts(get_sidebar_context())['category-0'], 5)
+        Post.objects.filter(pk__in=[p.pk for p in self.posts[2:6]]).transition('archived')
+        self.assertEqual(self.counts(async_to_sync(aget_sidebar_context)())['category-0'], 3)
+
+    def test_version_bumped_by_another_process(self):
+        Tag.objects.filter(pk=self.tags[0].pk).update(name='其他进程改名')
+        self.assertNotIn('其他进程改名', [tag.name for tag in get_sidebar_context()['tags']])
+        ContentVersion.objects.filter(name='feed').update(version=F('version') + 1)
+        self.assertIn('其他进程改名', [tag.name for tag in get_sidebar_context()['tags']])
+
+
+class CursorPaginationTests(BlogTestCase):
+
+    def test_pages_follow_created_at_order(self):
+        paginator = CursorPaginator(Post.published.all(), 5)
+        expected = list(Post.published.order_by('-created_at', '-id'))
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(list(first) + list(second) + list(third), expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        # 从第三页往回翻，应回到第二页和第一页
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertEqual(list(paginator.page(back.previous_cursor)), list(first))
+
+    def test_deep_page_costs_one_query(self):
+        paginator = CursorPaginator(Post.objects.all(), 2)
+        page = paginator.page()
+        for _ in range(4):
+            page = paginator.page(page.next_cursor)
+        with self.assertNumQueries(1):
+            paginator.page(page.next_cursor)
+
+    def test_invalid_cursor_returns_first_page(self):
+        paginator = CursorPaginator(Post.published.all(), 5)
+        self.assertEqual(list(paginator.page('not-a-cursor')), list(paginator.page()))
+
+    def test_sequence_pages(self):
+        paginator = SequenceCursorPaginator(list(range(12)), 5)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        last = paginator.page(second.next_cursor)
+        self.assertEqual(list(last), [10, 11])
+        self.assertEqual(list(paginator.page(last.previous_cursor)), list(second))
+
+    def test_listing_links_use_cursor(self):
+        response = self.client.get(reverse('blog:post_list'))
+        next_cursor = response.context['posts'].next_cursor
+        self.assertContains(response, f'?cursor={next_cursor}')
+        response = self.client.get(reverse('blog:post_list'), {'cursor': next_cursor})
+        self.assertEqual(len(response.context['posts']), 2)
+
+
+class ConditionalGetTests(BlogTestCase):
+
+    def test_unchanged_page_returns_304(self):
+        url = reverse('blog:post_list')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        etag = response['ETag']
+        # 进程内缓存：只查询内容版本
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_shared_cache_returns_304_without_queries(self):
+        url = reverse('blog:post_list')
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES={
+            **settings.CACHES,
+            'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory},
+        }):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+    def test_version_shared_between_processes(self):
+        url = reverse('blog:post_list')
+        etag = self.client.get(url)['ETag']
+        # 其他进程（worker、管理命令）更新了版本
+        ContentVersion.objects.filter(name='content').update(version=F('version') + 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_or_draft_post_not_answered_with_304(self):
+        etag = self.client.get(reverse('blog:post_list'))['ETag']
+        draft = Post.objects.create(title='草稿', content='内容', author=self.authors[0])
+        for post_id in (draft.id, 999999):
+            response = self.client.get(reverse('blog:post_detail', args=[post_id]), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 404)
+        view_counter.flush()
+        draft.refresh_from_db()
+        self.assertEqual(draft.view_count, 0)
+
+    def test_post_save_changes_etag(self):
+        url = reverse('blog:category_posts', args=['category-0'])
+        etag = self.client.get(url)['ETag']
+        self.posts[0].title = '新标题'
+        self.posts[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_detail_still_counts_view(self):
+        post = self.posts[0]
+        url = reverse('blog:post_detail', args=[post.id])
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        view_counter.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 2)
+
+    def test_authenticated_pages_are_private(self):
+        self.client.force_login(self.authors[0])
+        response = self.client.get(reverse('blog:post_list'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(BLOG_PAGE_CACHE_ENABLED=True)
+class PageCacheTests(BlogTestCase):
+
+    def test_anonymous_page_served_from_cache(self):
+        url = reverse('blog:category_posts', args=['category-0'])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        # 只查询内容版本
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, self.posts[0].title)
+
+    def test_post_save_purges_related_pages(self):
+        post = self.posts[0]
+        urls = [
+            reverse('blog:post_detail', args=[post.id]),
+            reverse('blog:category_posts', args=['category-0']),
+            reverse('blog:tag_posts', args=['tag-0']),
+            reverse('blog:post_list'),
+        ]
+        unrelated = reverse('blog:category_posts', args=['category-1'])
+        for url in urls + [unrelated]:
+            self.client.get(url)
+
+        post.title = '修改后的标题'
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'miss', url)
+        self.assertEqual(self.client.get(unrelated)['X-Page-Cache'], 'hit')
+        self.assertContains(self.client.get(urls[0]), '修改后的标题')
+
+    def test_cached_detail_still_counts_views(self):
+        post = self.posts[1]
+        url = reverse('blog:post_detail', args=[post.id])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        view_counter.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 2)
+
+    def test_purge_waits_for_commit(self):
+        url = reverse('blog:post_detail', args=[self.posts[0].id])
+        self.client.get(url)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.posts[0].save()
+        # 提交之前其他请求仍然读到旧数据，此时清除的缓存会被旧页面重新填上
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+
+    def test_requires_shared_cache(self):
+        self.assertEqual([warning.id for warning in apps.check_shared_caches(None)], ['blog.W002'])
+
+    def test_authenticated_users_bypass_cache(self):
+        url = reverse('blog:post_list')
+        self.client.get(url)
+        self.client.force_login(self.authors[0])
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+        self.assertContains(response, self.authors[0].username)
+
+
+class FeedTests(BlogTestCase):
+
+    def test_feed_is_rendered_once(self):
+        url = reverse('blog:rss_feed')
+        first = self.client.get(url)
+        # 只查询订阅版本
+        with self.assertNumQueries(1):
+            second = self.client.get(url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_not_modified(self):
+        url = reverse('blog:atom_feed')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'], HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_update_invalidates_feeds(self):
+        urls = [
+            reverse('blog:rss_feed'),
+            reverse('blog:category_atom_feed', args=['category-0']),
+            reverse('blog:tag_rss_feed', args=['tag-0']),
+        ]
+        for url in urls:
+            self.client.get(url)
+        post = self.posts[-2]
+        post.title = '修改后的标题'
+        post.save()
+        for url in urls:
+            self.assertContains(self.client.get(url), '修改后的标题')
+
+    def test_version_bumped_by_another_process(self):
+        url = reverse('blog:rss_feed')
+        self.client.get(url)
+        # 其他进程修改了文章并更新订阅版本，本进程缓存的 XML 不再使用
+        Post.objects.filter(pk=self.posts[-1].pk).update(title='其他进程修改的标题')
+        ContentVersion.objects.filter(name='feed').update(version=F('version') + 1)
+        self.assertContains(self.client.get(url), '其他进程修改的标题')
+
+    def test_comment_does_not_invalidate_feed(self):
+        url = reverse('blog:rss_feed')
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.posts[0], author=self.authors[0], content='新评论')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_feed_links(self):
+        response = self.client.get(reverse('blog:atom_feed'))
+        self.assertContains(response, '<link href="http://testserver/blog/" rel="alternate"/>')
+        self.assertContains(response, '<link href="http://testserver/blog/atom/" rel="self"/>')
+        response = self.client.get(reverse('blog:rss_feed'))
+        self.assertContains(response, '<link>http://testserver/blog/</link>')
+
+    def test_category_and_tag_feeds(self):
+        response = self.client.get(reverse('blog:category_rss_feed', args=['category-1']))
+        self.assertContains(response, 'Django博客文章1<')
+        self.assertNotContains(response, 'Django博客文章0<')
+        # 标签2 只在第 2、5、8、11 篇文章上
+        response = self.client.get(reverse('blog:tag_atom_feed', args=['tag-2']))
+        self.assertEqual(response.content.decode().count('<entry>'), 4)
+        self.assertEqual(self.client.get(reverse('blog:tag_rss_feed', args=['missing'])).status_code, 404)
+
+
+class CommentTests(BlogTestCase):
+
+    def count(self, post):
+        return Post.objects.values_list('comment_count', flat=True).get(pk=post.pk)
+
+    def test_comment_count_follows_changes(self):
+        post, other = self.posts[0], self.posts[5]
+        self.assertEqual(self.count(post), 3)
+        comment = Comment.objects.create(post=post, author=self.authors[0], content='新评论')
+        self.assertEqual(self.count(post), 4)
+
+        comment.is_active = False
+        comment.save()
+        self.assertEqual(self.count(post), 3)
+        comment.is_active = True
+        comment.post = other
+        comment.save()
+        self.assertEqual((self.count(post), self.count(other)), (3, 1))
+
+        Comment.objects.get(pk=comment.pk).delete()
+        post.comments.first().delete()
+        self.assertEqual((self.count(post), self.count(other)), (2, 0))
+
+    def test_refresh_comment_counts(self):
+        post = self.posts[1]
+        post.comments.update(is_active=False)
+        Post.objects.filter(pk=post.pk).refresh_comment_counts()
+        self.assertEqual(self.count(post), 0)
+
+    @override_settings(BLOG_PAGE_CACHE_ENABLED=True)
+    def test_admin_moderation_updates_counts_and_caches(self):
+        post = self.posts[0]
+        url = reverse('blog:post_detail', args=[post.id])
+        etag = self.client.get(url)['ETag']
+        admin = User.objects.create_superuser(username='admin', password='secret')
+        client = self.client_class()
+        client.force_login(admin)
+        # 只显示有效评论的列表页上批量禁用：update 之后查询集为空
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('admin:blog_comment_changelist') + '?is_active__exact=1', {
+                'action': 'disapprove_comments',
+                '_selected_action': list(post.comments.values_list('pk', flat=True)),
+            })
+        self.assertEqual(self.count(post), 0)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, '💬 评论 (0)')
+
+    def test_detail_page_shows_first_page(self):
+        post = self.posts[3]
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.authors[0], content=f'批量评论{i}') for i in range(45)
+        ])
+        Post.objects.filter(pk=post.pk).refresh_comment_counts()
+        navigation.get_adjacent_posts(post)
+        url = reverse('blog:post_detail', args=[post.id])
+        # 查询数与评论数无关：版本（3次） + 文章 + 标签 + 一页评论（含作者）
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['comments']), 20)
+        self.assertContains(response, '💬 评论 (45)')
+        self.assertContains(response, 'load-more-comments')
+
+    def test_load_more_endpoint(self):
+        post = self.posts[3]
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.authors[i % 3], content=f'批量评论{i}') for i in range(45)
+        ])
+        url = reverse('blog:post_comments', args=[post.id])
+        seen, cursor = [], ''
+        while True:
+            with self.assertNumQueries(3):
+                data = self.client.get(url, {'format': 'json', 'cursor': cursor}).json()
+            seen += [comment['content'] for comment in data['comments']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(len(seen), 45)
+        self.assertEqual(seen[0], '批量评论44')
+
+        response = self.client.get(url)
+        self.assertContains(response, 'class="card mb-3"', count=20)
+        self.assertContains(response, '?cursor=')
+
+    def test_comments_of_draft_are_hidden(self):
+        draft = Post.objects.create(title='草稿', content='草稿', author=self.authors[0])
+        self.assertEqual(self.client.get(reverse('blog:post_comments', args=[draft.id])).status_code, 404)
+
+
+class SearchTests(BlogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.guide = Post.objects.create(
+            title='用 Django 搭建博客', content='介绍一个框架', author=cls.authors[0], status='published',
+        )
+        cls.draft = Post.objects.create(title='草稿：搭建博客', content='框架', author=cls.authors[0])
+
+    def test_bigram_tokenizer(self):
+        tokenizer = tokenizers.BigramTokenizer()
+        self.assertEqual(tokenizer.tokenize('Ｄjango博客搭建'), ['django', '博客', '客搭', '搭建'])
+        self.assertEqual(tokenizer.tokenize('一个 字'), ['一个', '字'])
+        self.assertEqual(tokenizer.tokenize_chars('一个 字 ab'), ['一', '个'])
+        self.assertEqual(tokenizer.tokenize_query('博客 my_site'), [['博客'], ['my', 'site']])
+        self.assertTrue(tokenizers.is_single_cjk_char(['客']))
+        self.assertFalse(tokenizers.is_single_cjk_char(['a']))
+
+    def assert_search(self, backend):
+        backend.rebuild()
+        # 词尾的单字、开头的单字、拉丁单词前缀、多个短语
+        for query in ('客', '架', '搭', 'Djan', '搭建 框架'):
+            self.assertIn(self.guide.id, backend.search(query, 100), query)
+            self.assertNotIn(self.draft.id, backend.search(query, 100), query)
+        self.assertEqual(backend.search('博客 框架', 100), [self.guide.id])
+        self.assertEqual(backend.search('客 架', 100), [self.guide.id])
+        self.assertEqual(backend.search('没有的词', 100), [])
+        self.assertEqual(len(backend.search('博客', 5)), 5)
+
+    def test_inverted_index_backend(self):
+        self.assert_search(InvertedIndexBackend())
+
+    def test_inverted_index_single_char_is_exact_match(self):
+        backend = InvertedIndexBackend()
+        backend.rebuild()
+        posting = SearchPosting.objects.get(post=self.guide, field='title', term='客')
+        self.assertEqual(posting.positions, [-4])
+        # 单字按词项等值查询，不再用 LIKE '%客' 扫描整个索引
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIn(self.guide.id, backend.search('客', 100))
+        self.assertFalse(any('LIKE' in query['sql'].upper() for query in queries))
+        # 单字的位置不会与后面的词项对齐成短语（"博django" 不出现在 "博客django" 中）
+        Post.objects.create(title='博客django', content='', author=self.authors[0], status='published')
+        backend.rebuild()
+        self.assertEqual(backend.search('博django', 100), [])
+
+    @skipIf(connection.vendor != 'sqlite', 'FTS5 只在 SQLite 上可用')
+    def test_sqlite_fts_backend(self):
+        self.assert_search(SQLiteFTSBackend())
+
+    @skipIf(connection.vendor != 'sqlite', 'FTS5 只在 SQLite 上可用')
+    def test_sqlite_fts_match_expression(self):
+        backend = SQLiteFTSBackend()
+        self.assertEqual(
+            backend.build_match_expression('Djan 博客搭建 客 say"hi'),
+            '"djan"* AND "博客 客搭 搭建" AND "say hi"',
+        )
+        self.assertEqual(backend.build_match_expression('客 ！'), '')
+
+    @skipIf(connection.vendor != 'sqlite', 'FTS5 只在 SQLite 上可用')
+    def test_sqlite_fts_index_follows_posts(self):
+        self.assertEqual(get_search_backend().name, 'sqlite_fts')
+        post = Post.objects.create(title='缓存设计', content='正文', author=self.authors[0], status='published')
+        in_content = Post.objects.create(
+            title='其他', content='介绍缓存设计', author=self.authors[0], status='published',
+        )
+        # 标题命中排在正文命中之前
+        self.assertEqual(search_post_ids('缓存设计'), [post.id, in_content.id])
+        post.title = '队列设计'
+        post.save()
+        self.assertEqual(search_post_ids('缓存设计'), [in_content.id])
+        in_content.delete()
+        self.assertEqual(search_post_ids('缓存设计'), [])
+
+    def test_results_count_capped(self):
+        url = reverse('blog:search_posts')
+        with override_settings(BLOG_SEARCH_MAX_RESULTS=5):
+            response = self.client.get(url, {'q': 'Django'})
+        self.assertTrue(response.context['results_capped'])
+        self.assertContains(response, '<strong>5+</strong>')
+        response = self.client.get(url, {'q': 'Django'})
+        self.assertContains(response, '<strong>13</strong>')
+
+
+class RateLimitTests(TestCase):
+
+    def test_token_bucket(self):
+        limiter = ratelimit.TokenBucketLimiter(capacity=2, rate=0.5, prefix='test')
+        with mock.patch('blog.ratelimit.time.time', return_value=1000.0):
+            self.assertTrue(limiter.consume('a')[0])
+            self.assertTrue(limiter.consume('a')[0])
+            self.assertEqual(limiter.consume('a'), (False, 2.0))
+            self.assertTrue(limiter.consume('b')[0])
+        with mock.patch('blog.ratelimit.time.time', return_value=1002.0):
+            self.assertTrue(limiter.consume('a')[0])
+            self.assertFalse(limiter.consume('a')[0])
+
+    def test_consume_all_only_takes_when_every_bucket_allows(self):
+        limiter = ratelimit.TokenBucketLimiter(capacity=1, rate=0.5, prefix='test')
+        with mock.patch('blog.ratelimit.time.time', return_value=1000.0):
+            self.assertTrue(limiter.consume('ip:1')[0])
+            # IP 的桶已空：用户的令牌不被扣除
+            self.assertEqual(limiter.consume_all(['user:1', 'ip:1']), (False, 2.0))
+            self.assertTrue(limiter.consume_all(['user:1', 'ip:2'])[0])
+
+    def test_memory_fallback(self):
+        limiter = ratelimit.TokenBucketLimiter(capacity=1, rate=0.1, alias='missing', prefix='test')
+        with self.assertLogs('blog.ratelimit', 'WARNING'):
+            self.assertTrue(limiter.consume('a')[0])
+            self.assertFalse(limiter.consume('a')[0])
+
+    def test_client_ip(self):
+        # 客户端伪造了第一个地址，代理追加了真实地址 1.2.3.4，第二层代理追加了 10.0.0.2
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.1', 'HTTP_X_FORWARDED_FOR': '6.6.6.6, 1.2.3.4, 10.0.0.2'})
+        self.assertEqual(ratelimit.client_ip(request), '10.0.0.1')
+        with override_settings(BLOG_CLIENT_IP_HEADER='HTTP_X_FORWARDED_FOR'):
+            self.assertEqual(ratelimit.client_ip(request), '10.0.0.2')
+            with override_settings(BLOG_TRUSTED_PROXY_HOPS=2):
+                self.assertEqual(ratelimit.client_ip(request), '1.2.3.4')
+            with override_settings(BLOG_TRUSTED_PROXY_HOPS=5):
+                self.assertEqual(ratelimit.client_ip(request), '6.6.6.6')
+
+
+class SpamFilterTests(BlogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.authors[0]
+        self.client.force_login(self.user)
+        self.url = reverse('blog:post_detail', args=[self.posts[0].id])
+        filters = [spam.LinkFilter(), spam.KeywordFilter(['代开发票', 'casino']), spam.DuplicateFilter()]
+        patcher = mock.patch.object(spam, '_filters', filters)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_keyword_automaton(self):
+        automaton = spam.KeywordAutomaton(['he', 'she', 'hers', '发票'])
+        self.assertEqual(automaton.search('ushers'), 'she')
+        self.assertEqual(automaton.search('开发票'), '发票')
+        self.assertIsNone(automaton.search('hi, sir!'))
+
+    def test_rejected_comment_runs_no_sql(self):
+        rejected = metrics.comments_rejected
+        before = dict(rejected.samples()).get((('reason', 'keyword'),), 0)
+        # 只有会话和用户两条认证查询
+        with self.assertNumQueries(2):
+            response = self.client.post(self.url, {'comment': 'true', 'content': '欢迎来 ＣＡＳＩＮＯ 玩'})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        self.assertEqual(dict(rejected.samples())[(('reason', 'keyword'),)], before + 1)
+        self.assertEqual(self.posts[0].comments.count(), 3)
+
+    def test_duplicate_comment(self):
+        data = {'comment': 'true', 'content': '写得很好'}
+        self.client.post(self.url, data)
+        self.client.post(self.url, data)
+        self.assertEqual(self.posts[0].comments.filter(content='写得很好').count(), 1)
+        # 短评论只对同一用户判重
+        self.client.force_login(self.authors[1])
+        self.client.post(self.url, data)
+        self.assertEqual(self.posts[0].comments.filter(content='写得很好').count(), 2)
+
+    def test_failed_comment_can_be_retried(self):
+        data = {'comment': 'true', 'content': '这是一条足够长的评论，用来测试所有用户之间的判重'}
+        # 文章不存在（404）时不记录内容，换到正确的文章后可以原样提交
+        missing = reverse('blog:post_detail', args=[999999])
+        self.assertEqual(self.client.post(missing, data).status_code, 404)
+        self.client.post(self.url, data)
+        self.assertEqual(self.posts[0].comments.filter(content=data['content']).count(), 1)
+        self.client.force_login(self.authors[1])
+        self.client.post(self.url, data)
+        self.assertEqual(self.posts[0].comments.filter(content=data['content']).count(), 1)
+
+    def test_too_many_links(self):
+        content = ' '.join(f'https://example.com/{i}' for i in range(4))
+        self.client.post(self.url, {'comment': 'true', 'content': content})
+        self.assertFalse(self.posts[0].comments.filter(content=content).exists())
+
+    def test_rate_limited(self):
+        limiter = ratelimit.TokenBucketLimiter(capacity=1, rate=0.01, prefix='test-comment')
+        with mock.patch.object(ratelimit, '_comment_limiter', limiter):
+            self.client.post(self.url, {'comment': 'true', 'content': '第一条'})
+            with self.assertNumQueries(2):
+                response = self.client.post(self.url, {'comment': 'true', 'content': '第二条'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '100')
+        self.assertEqual(self.posts[0].comments.filter(content__in=['第一条', '第二条']).count(), 1)
+
+
+class NavigationTests(BlogTestCase):
+
+    def test_adjacent_posts_follow_publication_order(self):
+        middle = self.posts[5]
+        adjacent = navigation.get_adjacent_posts(middle)
+        self.assertEqual(adjacent['previous']['id'], self.posts[4].id)
+        self.assertEqual(adjacent['next']['id'], self.posts[6].id)
+        self.assertIsNone(navigation.get_adjacent_posts(self.posts[0])['previous'])
+        self.assertIsNone(navigation.get_adjacent_posts(self.posts[-1])['next'])
+
+    def test_same_created_at_ordered_by_id(self):
+        first, second = self.posts[3], self.posts[4]
+        Post.objects.filter(pk=second.pk).update(created_at=first.created_at)
+        second.refresh_from_db()
+        self.assertEqual(navigation.find_adjacent(first)['next']['id'], second.id)
+        self.assertEqual(navigation.find_adjacent(second)['previous']['id'], first.id)
+
+    def test_unpublishing_updates_neighbors(self):
+        before, post, after = self.posts[4:7]
+        navigation.get_adjacent_posts(before)
+        navigation.get_adjacent_posts(after)
+        post.back_to_draft()
+        # 订阅版本 + 两个方向的相邻文章
+        with self.assertNumQueries(3):
+            self.assertEqual(navigation.get_adjacent_posts(before)['next']['id'], after.id)
+        self.assertEqual(navigation.get_adjacent_posts(after)['previous']['id'], before.id)
+
+    def test_deleting_and_transitioning_update_neighbors(self):
+        before, post, after = self.posts[7:10]
+        navigation.get_adjacent_posts(before)
+        post.delete()
+        self.assertEqual(navigation.get_adjacent_posts(before)['next']['id'], after.id)
+
+        Post.objects.filter(pk=after.pk).transition('draft')
+        self.assertEqual(navigation.get_adjacent_posts(before)['next']['id'], self.posts[10].id)
+
+    def test_version_bumped_by_another_process(self):
+        before, post, after = self.posts[4:7]
+        self.assertEqual(navigation.get_adjacent_posts(before)['next']['id'], post.id)
+        # 其他进程撤回了文章并更新订阅版本，本进程缓存的导航不再使用
+        Post.objects.filter(pk=post.pk).update(status='draft')
+        ContentVersion.objects.filter(name='feed').update(version=F('version') + 1)
+        self.assertEqual(navigation.get_adjacent_posts(before)['next']['id'], after.id)
+        self.assertEqual(async_to_sync(navigation.aget_adjacent_posts)(before)['next']['id'], after.id)
+
+    def test_detail_page_links(self):
+        response = self.client.get(reverse('blog:post_detail', args=[self.posts[-1].id]))
+        self.assertContains(response, reverse('blog:post_detail', args=[self.posts[-2].id]))
+        self.assertContains(response, '当前已经是最后一篇')
+
+
+@override_settings(BLOG_SITEMAP_SHARD_SIZE=5)
+class SitemapTests(BlogTestCase):
+
+    def post_shards(self):
+        return {(pk - 1) // 5 for pk in Post.published.values_list('id', flat=True)}
+
+    def test_index_generated_on_first_request(self):
+        response = self.client.get(reverse('sitemap_index'))
+        self.assertEqual(response['Content-Type'], 'application/xml; charset=utf-8')
+        # 文章分片 + 分类 + 标签
+        self.assertEqual(response.content.decode().count('<sitemap>'), len(self.post_shards()) + 2)
+        self.assertContains(response, 'http://testserver/sitemap-tags-0.xml')
+
+    def test_shard_content(self):
+        sitemaps.update_sitemaps()
+        post = self.posts[0]
+        response = self.client.get(reverse('sitemap_section', args=['posts', (post.id - 1) // 5]))
+        self.assertContains(response, f'<loc>http://testserver/blog/{post.id}/</loc><lastmod>')
+        response = self.client.get(reverse('sitemap_section', args=['categories', 0]))
+        self.assertContains(response, 'http://testserver/blog/category/category-1/')
+        etag = response['ETag']
+        response = self.client.get(reverse('sitemap_section', args=['categories', 0]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('sitemap_section', args=['posts', 999])).status_code, 404)
+
+    def test_only_changed_shards_are_regenerated(self):
+        sitemaps.update_sitemaps()
+        self.assertEqual(sitemaps.update_sitemaps()['posts'], (0, 0))
+        before = dict(SitemapShard.objects.filter(section='posts').values_list('number', 'fingerprint'))
+
+        post = self.posts[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            post.title = '修改后的标题'
+            post.save()
+        after = dict(SitemapShard.objects.filter(section='posts').values_list('number', 'fingerprint'))
+        changed = {number for number in before if before[number] != after[number]}
+        self.assertEqual(changed, {(post.id - 1) // 5})
+
+    def test_unpublished_posts_are_removed(self):
+        sitemaps.update_sitemaps()
+        post = self.posts[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.filter(pk=post.pk).transition('draft')
+        shard = SitemapShard.objects.filter(section='posts', number=(post.id - 1) // 5).first()
+        content = shard.content if shard is not None else ''
+        self.assertNotIn(f'/blog/{post.id}/<', content)
+
+
+class ActivityLogTests(BlogTestCase):
+
+    def test_post_signals_write_logs(self):
+        post = Post.objects.create(title='新文章', content='内容', author=self.authors[0])
+        post.delete()
+        actions = list(ActivityLog.objects.filter(target_title='新文章').values_list('action', flat=True))
+        self.assertCountEqual(actions, ['create_post', 'delete_post'])
+
+    @override_settings(BLOG_ACTIVITY_LOG_MODE='async')
+    def test_async_mode_waits_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            log_activity('create_post', '异步日志', user=self.authors[0], target_title='异步')
+        # 事务提交后才会放入写入队列，请求中不再直接写数据库
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(ActivityLog.objects.filter(description='异步日志').exists())
+
+
+@override_settings(BLOG_ACTIVITY_LOG_MODE='sync')
+class ActivityLogWriterTests(TransactionTestCase):
+
+    def test_writer_batches_and_drains(self):
+        user = User.objects.create_user(username='writer')
+        writer = ActivityLogWriter(batch_size=10, flush_interval=0.05)
+        for i in range(25):
+            writer.enqueue(ActivityLog(action='create_post', description=f'日志{i}', user=user))
+        writer.drain()
+        self.assertEqual(ActivityLog.objects.filter(description__startswith='日志').count(), 25)
+
+    def test_bad_entry_does_not_drop_batch(self):
+        user = User.objects.create_user(username='writer')
+        writer = ActivityLogWriter(batch_size=10)
+        entries = [ActivityLog(action='create_post', description=f'日志{i}', user=user) for i in range(5)]
+        # 用户已被删除，外键约束失败
+        entries[2].user_id = user.pk + 1000
+        with self.assertLogs('blog.activity', 'ERROR'):
+            writer._write(entries)
+        self.assertEqual(ActivityLog.objects.filter(description__startswith='日志').count(), 4)
+
+    def test_long_fields_are_truncated(self):
+        with override_settings(BLOG_ACTIVITY_LOG_MODE='sync'):
+            log_activity('create_post', '长' * 300, target_title='题' * 300)
+        entry = ActivityLog.objects.get()
+        self.assertEqual((len(entry.description), len(entry.target_title)), (200, 200))
+        self.assertTrue(entry.description.endswith('…'))
+
+
+class PostTransitionTests(BlogTestCase):
+
+    def test_bulk_transition_logs_each_post(self):
+        drafts = [
+            Post.objects.create(title=f'草稿{i}', content='内容', author=self.authors[0])
+            for i in range(5)
+        ]
+        staff = User.objects.create_user(username='editor', is_staff=True)
+        # SAVEPOINT + 查询 + UPDATE 文章 + UPDATE 标签关联 + 批量INSERT日志 + RELEASE + 更新内容版本
+        with self.assertNumQueries(7):
+            updated = Post.objects.all().transition('published', staff)
+        self.assertEqual(updated, 5)
+        self.assertEqual(Post.published.filter(pk__in=[p.pk for p in drafts]).count(), 5)
+        logs = ActivityLog.objects.filter(action='publish_post')
+        self.assertEqual(logs.count(), 5)
+        self.assertTrue(all(log.user_id == staff.pk for log in logs))
+
+    def test_transition_skips_posts_in_other_states(self):
+        self.assertEqual(Post.objects.filter(pk=self.posts[0].pk).transition('published'), 0)
+        self.assertFalse(ActivityLog.objects.filter(action='publish_post').exists())
+
+    def test_archive_view_uses_transition(self):
+        staff = User.objects.create_user(username='editor', is_staff=True)
+        self.client.force_login(staff)
+        post = self.posts[0]
+        response = self.client.get(reverse('blog:archive_post', args=[post.id]))
+        self.assertTemplateUsed(response, 'blog/archive_success.html')
+        post.refresh_from_db()
+        self.assertEqual(post.status, 'archived')
+        self.assertTrue(ActivityLog.objects.filter(action='archive_post', user=staff).exists())
+
+
+class PostTagTests(BlogTestCase):
+    """标签中间表中冗余的文章状态和创建时间"""
+
+    def assert_links_follow(self, post):
+        links = set(PostTag.objects.filter(post=post).values_list('status', 'created_at'))
+        self.assertEqual(links, {(post.status, post.created_at)})
+
+    def test_fields_follow_post(self):
+        post = Post.objects.create(title='草稿', content='内容', author=self.authors[0])
+        post.tags.set(self.tags[:2])
+        self.assert_links_follow(post)
+        self.tags[2].post_set.add(post)
+        self.assertEqual(PostTag.objects.filter(post=post, status='draft').count(), 3)
+
+        post.publish()
+        self.assert_links_follow(post)
+        url = reverse('blog:tag_posts', args=['tag-2'])
+        self.assertContains(self.client.get(url), '草稿')
+
+        Post.objects.filter(pk=post.pk).transition('archived')
+        post.refresh_from_db()
+        self.assert_links_follow(post)
+        self.assertNotContains(self.client.get(url), '草稿')
+
+    @skipIf(connection.vendor != 'sqlite', '执行计划的格式与数据库有关')
+    def test_tag_listing_plan(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        plan = next(block for block in out.getvalue().split('\n\n') if '标签文章列表' in block)
+        # 沿中间表的索引按顺序读取，不需要临时 B-tree 排序：
+        #   SEARCH blog_post_tags USING INDEX post_tag_created_idx (tag_id=? AND status=?)
+        #   SEARCH blog_post USING INTEGER PRIMARY KEY (rowid=?)
+        self.assertTrue(plan.startswith('✅'), plan)
+        self.assertIn('SEARCH blog_post_tags USING INDEX post_tag_created_idx (tag_id=? AND status=?)', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class SeedDataTests(TestCase):
+
+    def seed(self, **options):
+        call_command(
+            'seed_data', posts=30, comments=60, users=4, tags=5, categories=3,
+            batch_size=7, stdout=StringIO(), **options
+        )
+
+    def test_seed_data_counts(self):
+        self.seed(draft_ratio=0)
+        self.assertEqual(Post.published.count(), 30)
+        self.assertEqual(Comment.objects.count(), 60)
+        self.assertEqual(User.objects.count(), 4)
+        self.assertEqual(Tag.objects.count(), 5)
+        self.assertEqual(ActivityLog.objects.filter(action='create_post').count(), 30)
+        self.assertTrue(Post.tags.through.objects.exists())
+        self.assertFalse(PostTag.objects.exclude(status=F('post__status'), created_at=F('post__created_at')).exists())
+        # 创建时间随 id 递增
+        dates = list(Post.objects.order_by('id').values_list('created_at', flat=True))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_seed_data_is_reproducible(self):
+        fields = ('title', 'content', 'status', 'created_at')
+        self.seed(seed=7)
+        first = list(Post.objects.order_by('id').values_list(*fields))
+        Post.objects.all().delete()
+        # 时间不取决于运行的时刻
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=3)):
+            self.seed(seed=7)
+        second = list(Post.objects.order_by('id').values_list(*fields))
+        self.assertEqual(first, second)
+
+
+class BenchmarkTests(BlogTestCase):
+
+    def test_measure_reports_percentiles_and_queries(self):
+        stats = measure(self.client, reverse('blog:post_list'), requests=3, warmup=1)
+        self.assertEqual(stats['queries'], 4)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertGreater(stats['peak_memory_kb'], 0)
+
+    def test_find_regressions(self):
+        baseline = {'results': [{'size': 100, 'endpoint': 'post_list', 'p95_ms': 10.0}]}
+        results = [{'size': 100, 'endpoint': 'post_list', 'p95_ms': 11.0}]
+        self.assertEqual(find_regressions(results, baseline, max_regression=0.2), [])
+        self.assertEqual(len(find_regressions(results, baseline, max_regression=0.05)), 1)
+        self.assertEqual(len(find_regressions(results, budgets={'post_list': 5})), 1)
+
+
+@override_settings(BLOG_PROFILING_ENABLED=True, BLOG_PROFILING_TOKEN='secret')
+class ProfilingMiddlewareTests(BlogTestCase):
+
+    def test_profile_header_adds_server_timing_and_log(self):
+        with self.assertLogs('blog.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('blog:post_list'), HTTP_X_BLOG_PROFILE='secret')
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('"4 queries"', timing)
+        self.assertIn('template;dur=', timing)
+        data = json.loads(logs.records[0].getMessage())
+        self.assertEqual(data['view'], 'blog:post_list')
+        self.assertEqual(data['sql_count'], 4)
+        self.assertGreater(data['cache_hits'], 0)
+
+    def test_requests_without_valid_token_are_not_profiled(self):
+        response = self.client.get(reverse('blog:post_list'), HTTP_X_BLOG_PROFILE='wrong')
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(BLOG_PROFILING_ENABLED=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('blog:post_list'), HTTP_X_BLOG_PROFILE='secret')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_sampled_request_dumps_cprofile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(BLOG_PROFILING_SAMPLE_RATE=1.0, BLOG_PROFILING_CPROFILE_DIR=directory):
+                with self.assertLogs('blog.profiling', 'INFO'):
+                    response = self.client.get(reverse('blog:post_detail', args=[self.posts[0].id]))
+            self.assertIn('Server-Timing', response)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_async_request(self):
+        async def get_response(request):
+            await Post.objects.acount()
+            return HttpResponse()
+
+        middleware = profiling.ProfilingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/', HTTP_X_BLOG_PROFILE='secret')
+        with self.assertLogs('blog.profiling', 'INFO'):
+            response = async_to_sync(middleware)(request)
+        # 查询在 sync_to_async 的线程中执行，也被统计
+        self.assertIn('"1 queries"', response['Server-Timing'])
+
+
+
+def _sample(name, **labels):
+    """当前进程中某个指标的值"""
+    key = tuple((label, str(value)) for label, value in labels.items())
+    return dict(metrics.registry._metrics[name].samples()).get(key, 0)
+
+
+@override_settings(BLOG_METRICS_TOKEN='metrics-secret')
+class MetricsTests(BlogTestCase):
+
+    def test_request_metrics_and_endpoint(self):
+        labels = {'view': 'blog:post_list', 'method': 'GET', 'status': 200}
+        before = _sample('blog_http_requests_total', **labels)
+        self.client.get(reverse('blog:post_list'))
+        self.assertEqual(_sample('blog_http_requests_total', **labels), before + 1)
+
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer metrics-secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE blog_http_request_duration_seconds histogram', body)
+        self.assertIn('blog_http_requests_total{view="blog:post_list",method="GET",status="200"}', body)
+        self.assertIn('blog_db_queries_per_request_bucket{view="blog:post_list",le="2"}', body)
+        self.assertIn('blog_cache_requests_total{cache="sidebar",result="hit"}', body)
+
+    def test_async_request(self):
+        async def get_response(request):
+            await Post.objects.acount()
+            return HttpResponse()
+
+        middleware = metrics.MetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch.object(metrics.db_queries_per_request, 'observe') as observe:
+            async_to_sync(middleware)(RequestFactory().get('/'))
+        observe.assert_called_once_with(1, view='unresolved')
+
+    def test_endpoint_requires_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+
+    def test_comment_metric(self):
+        before = _sample('blog_comments_total')
+        Comment.objects.create(post=self.posts[0], author=self.authors[0], content='新评论')
+        self.assertEqual(_sample('blog_comments_total'), before + 1)
+
+    def test_multiprocess_merge(self):
+        dead_pid = subprocess.Popen(['true'])
+        dead_pid.wait()
+        snapshot = {
+            'pid': dead_pid.pid,
+            'metrics': {
+                'blog_comments_total': {'type': 'counter', 'help': '', 'samples': [[[], 5]]},
+                'blog_view_count_buffer_pending': {'type': 'gauge', 'help': '', 'samples': [[[], 7]]},
+            },
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, f'{dead_pid.pid}.json'), 'w') as f:
+                json.dump(snapshot, f)
+            with override_settings(BLOG_METRICS_MULTIPROCESS_DIR=directory):
+                merged = metrics.collect()
+                self.assertIn(f'{os.getpid()}.json', os.listdir(directory))
+        comments = dict(merged['blog_comments_total']['samples'])[()]
+        self.assertEqual(comments, _sample('blog_comments_total') + 5)
+        # 已退出进程的仪表数据不参与合并
+        pending = dict(merged['blog_view_count_buffer_pending']['samples'])[()]
+        self.assertEqual(pending, view_counter.get_view_counter().pending())
+
+
+class ContentRenderingTests(BlogTestCase):
+
+    def test_sanitizer_removes_scripts_and_unsafe_links(self):
+        html = '<p onclick="x()">正文<script>alert(1)</script><a href="javascript:alert(1)">链接</a></p>'
+        for use_nh3 in (True, False):
+            if use_nh3 and rendering.nh3 is None:
+                continue
+            with mock.patch.object(rendering, 'nh3', rendering.nh3 if use_nh3 else None):
+                cleaned = rendering.sanitize(html)
+            self.assertNotIn('script', cleaned)
+            self.assertNotIn('onclick', cleaned)
+            self.assertNotIn('javascript', cleaned)
+            self.assertIn('正文', cleaned)
+
+    @skipIf(rendering.markdown is None, '未安装 markdown')
+    def test_markdown_rendered_on_save(self):
+        post = self.posts[0]
+        post.content = '# 标题\n\n```python\nprint("hi")\n```\n'
+        post.save()
+        self.assertIn('<h1>标题</h1>', post.content_html)
+        self.assertIn('class="highlight"', post.content_html)
+        self.assertEqual(post.content_html_version, rendering.RENDERER_VERSION)
+        response = self.client.get(reverse('blog:post_detail', args=[post.id]))
+        self.assertContains(response, '<h1>标题</h1>', html=True)
+
+    def test_update_without_content_keeps_html(self):
+        post = self.posts[0]
+        with mock.patch.object(Post, 'render_content') as render_content:
+            post.title = '新标题'
+            post.save(update_fields=['title'])
+        render_content.assert_not_called()
+
+    def test_render_posts_command_updates_stale_posts(self):
+        Post.objects.update(content_html='', content_html_version=0)
+        call_command('render_posts', stdout=StringIO())
+        self.assertFalse(Post.objects.filter(content_html='').exists())
+        self.assertFalse(Post.objects.exclude(content_html_version=rendering.current_version()).exists())
+
+
+class ExcerptTests(BlogTestCase):
+
+    def test_make_excerpt_truncates_chinese_text(self):
+        excerpt = rendering.make_excerpt('## 标题\n\n' + '中文没有空格' * 100)
+        self.assertTrue(excerpt.startswith('标题 中文没有空格'))
+        self.assertTrue(excerpt.endswith('…'))
+        self.assertEqual(len(excerpt), rendering.EXCERPT_WIDTH // 2 + 1)
+
+    def test_make_excerpt_keeps_whole_words_and_skips_code(self):
+        excerpt = rendering.make_excerpt('```python\nsecret = 1\n```\n\n' + 'performance ' * 50)
+        self.assertNotIn('secret', excerpt)
+        self.assertTrue(excerpt.endswith('performance…'))
+
+    def test_excerpt_saved_and_listing_skips_content(self):
+        self.assertEqual(self.posts[0].excerpt, '这是第0篇关于Django博客搭建的文章。')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('blog:post_list'))
+        self.assertContains(response, '这是第11篇关于Django博客搭建的文章。')
+        self.assertFalse(any('"blog_post"."content"' in query['sql'] for query in queries.captured_queries))
+
+    def test_backfill_excerpts_command(self):
+        Post.objects.update(excerpt='')
+        call_command('backfill_excerpts', stdout=StringIO())
+        self.assertFalse(Post.objects.filter(excerpt='').exists())
+
+
+@override_settings(BLOG_DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(BlogTestCase):
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+
+    def route(self, request, view=None):
+        """经过中间件处理请求，返回视图中读取文章、会话使用的数据库和响应"""
+        routes = {}
+
+        def get_response(request):
+            if view is not None:
+                view()
+            routes['post'] = self.router.db_for_read(Post)
+            routes['user'] = self.router.db_for_read(User)
+            return HttpResponse()
+
+        # TestCase 把每个测试放在事务中，而事务中的读查询总是使用主库
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            response = routers.ReplicaRoutingMiddleware(get_response)(request)
+        return routes, response
+
+    def test_public_reads_use_replica(self):
+        routes, response = self.route(RequestFactory().get('/'))
+        self.assertEqual(routes, {'post': 'replica1', 'user': 'default'})
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_writes_and_admin_use_primary(self):
+        routes, _ = self.route(RequestFactory().post('/1/'))
+        self.assertEqual(routes['post'], 'default')
+        routes, _ = self.route(RequestFactory().get('/admin/blog/post/'))
+        self.assertEqual(routes['post'], 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_write_pins_user_to_primary(self):
+        routes, response = self.route(RequestFactory().get('/'), view=lambda: self.router.db_for_write(Comment))
+        self.assertEqual(routes['post'], 'default')
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 5)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        routes, _ = self.route(request)
+        self.assertEqual(routes['post'], 'default')
+
+    def test_async_request(self):
+        routes = {}
+
+        async def get_response(request):
+            await sync_to_async(self.router.db_for_write)(Comment)
+            routes['post'] = await sync_to_async(self.router.db_for_read)(Post)
+            return HttpResponse()
+
+        middleware = routers.ReplicaRoutingMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(routes['post'], 'default')
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_replica_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'blog'))
+        self.assertTrue(self.router.allow_migrate('default', 'blog'))
+
+    @override_settings(BLOG_DATABASE_REPLICAS=[])
+    def test_middleware_unused_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            routers.ReplicaRoutingMiddleware(lambda request: HttpResponse())
+
+
+@override_settings(BLOG_DATABASE_REPLICAS=['replica1'], BLOG_ACTIVITY_LOG_MODE='sync')
+class ReplicaDatabaseTests(TransactionTestCase):
+    """副本 replica1 是连接到同一个测试数据库的第二个连接（见文件开头），经过中间件的完整请求"""
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user(username='editor', password='secret', is_staff=True)
+        self.post = Post.objects.create(title='待发布', content='内容', author=self.staff)
+
+    def test_public_reads_use_replica(self):
+        with CaptureQueriesContext(connections['replica1']) as replica:
+            self.client.get(reverse('blog:post_list'))
+        self.assertTrue(any('"blog_post"' in query['sql'] for query in replica.captured_queries))
+
+    def test_publish_runs_on_primary(self):
+        self.client.login(username='editor', password='secret')
+        response = self.client.get(reverse('blog:publish_post', args=[self.post.pk]))
+        self.assertTemplateUsed(response, 'blog/publish_success.html')
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.status, 'published')
+        self.assertTrue(ActivityLog.objects.filter(action='publish_post', target_title='待发布').exists())
+
+
+@skipIf(connection.vendor != 'sqlite', '只适用于 SQLite')
+class DatabaseTuningTests(TestCase):
+
+    def test_sqlite_file_opened_with_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory, 'db.sqlite3')}
+            wrapper = type(connections['default'])(settings_dict, alias='tuning')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    journal_mode = cursor.fetchone()[0]
+                    cursor.execute('PRAGMA busy_timeout')
+                    busy_timeout = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        self.assertEqual(journal_mode, 'wal')
+        self.assertEqual(busy_timeout, 5000)
+
+
+class AsyncViewTests(BlogTestCase):
+    """blog/async_views.py：页面内容与同步视图相同"""
+
+    def request(self, path, **headers):
+        request = RequestFactory().get(path, **headers)
+        request.user = AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+        return request
+
+    def test_listing_pages_match_sync_views(self):
+        pages = [
+            ('post_list', reverse('blog:post_list'), []),
+            ('category_posts', reverse('blog:category_posts', args=['category-0']), ['category-0']),
+            ('tag_posts', reverse('blog:tag_posts', args=['tag-1']), ['tag-1']),
+            ('search_posts', reverse('blog:search_posts') + '?q=Django', []),
+        ]
+        for name, path, args in pages:
+            with self.subTest(name):
+                expected = getattr(views, name)(self.request(path), *args)
+                response = async_to_sync(getattr(async_views, name))(self.request(path), *args)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.content, expected.content)
+
+    def test_post_detail(self):
+        post = self.posts[5]
+        Comment.objects.create(post=post, author=self.authors[0], content='异步评论')
+        Post.objects.filter(pk=post.pk).update(comment_count=1)
+        response = async_to_sync(async_views.post_detail)(self.request(f'/{post.pk}/'), post.pk)
+        self.assertContains(response, post.title)
+        self.assertContains(response, '异步评论')
+        self.assertContains(response, self.posts[4].title)
+        self.assertContains(response, self.posts[6].title)
+        view_counter.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 1)
+
+    def test_post_detail_hides_drafts(self):
+        draft = Post.objects.create(title='草稿', content='草稿', author=self.authors[0])
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(Http404):
+            async_to_sync(async_views.post_detail)(self.request(f'/{draft.pk}/'), draft.pk)
+        # 权限检查在查询评论之前
+        self.assertFalse(any('blog_comment' in query['sql'] for query in queries.captured_queries))
+
+    def test_not_modified(self):
+        path = reverse('blog:post_list')
+        response = async_to_sync(async_views.post_list)(self.request(path))
+        response = async_to_sync(async_views.post_list)(self.request(path, HTTP_IF_NONE_MATCH=response['ETag']))
+        self.assertEqual(response.status_code, 304)
+
+    def test_home_uses_public_views(self):
+        # 首页和博客列表使用同一个视图，随 BLOG_ASYNC_VIEWS 切换
+        self.assertIs(resolve('/').func, resolve(reverse('blog:post_list')).func)
+
+    def test_async_page_matches_page(self):
+        paginator = CursorPaginator(Post.published.for_listing(), 5)
+        first = paginator.page()
+        second = async_to_sync(paginator.apage)(first.next_cursor)
+        self.assertEqual([post.pk for post in second], [post.pk for post in paginator.page(first.next_cursor)])
+        self.assertTrue(second.has_previous())
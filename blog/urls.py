@@ -1,18 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from django.contrib.syndication.views import Feed
-from . import views
-from .feeds import LatestPostsFeed
+from . import views, async_views
+from .feeds import (
+    feed_view, LatestPostsFeed, LatestPostsAtomFeed, CategoryPostsFeed, CategoryPostsAtomFeed,
+    TagPostsFeed, TagPostsAtomFeed,
+)
+
+# ASGI 部署时公开页面使用异步视图（settings.BLOG_ASYNC_VIEWS），其余页面两种模式相同
+public_views = async_views if getattr(settings, 'BLOG_ASYNC_VIEWS', False) else views
 
 app_name = 'blog'
 urlpatterns = [
-    path('', views.post_list, name='post_list'),
-    path('search/', views.search_posts, name='search_posts'),
-    path('<int:post_id>/', views.post_detail, name='post_detail'),
+    path('', public_views.post_list, name='post_list'),
+    path('search/', public_views.search_posts, name='search_posts'),
+    path('<int:post_id>/', public_views.post_detail, name='post_detail'),
+    path('<int:post_id>/comments/', views.post_comments, name='post_comments'),
     path('drafts/', views.draft_list, name='draft_list'),
     path('<int:post_id>/publish/', views.publish_post, name='publish_post'),
     path('<int:post_id>/archive/', views.archive_post, name='archive_post'),
-    path('category/<slug:slug>/', views.category_posts, name='category_posts'),
-    path('tag/<slug:slug>/', views.tag_posts, name='tag_posts'),
+    path('category/<slug:slug>/', public_views.category_posts, name='category_posts'),
+    path('tag/<slug:slug>/', public_views.tag_posts, name='tag_posts'),
     path('activity-log/', views.activity_log, name='activity_log'),
-    path('rss/', LatestPostsFeed(), name='rss_feed'),
+    path('rss/', feed_view(LatestPostsFeed()), name='rss_feed'),
+    path('atom/', feed_view(LatestPostsAtomFeed()), name='atom_feed'),
+    path('category/<slug:slug>/rss/', feed_view(CategoryPostsFeed()), name='category_rss_feed'),
+    path('category/<slug:slug>/atom/', feed_view(CategoryPostsAtomFeed()), name='category_atom_feed'),
+    path('tag/<slug:slug>/rss/', feed_view(TagPostsFeed()), name='tag_rss_feed'),
+    path('tag/<slug:slug>/atom/', feed_view(TagPostsAtomFeed()), name='tag_atom_feed'),
 ]
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+文章浏览次数的缓冲计数器
+浏览次数先累加到缓冲区，再按数量阈值或定时器批量写回数据库，
+写回时使用 F('view_count') + n 原子更新，避免每次访问都执行一次读改写
+"""
+import atexit
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+# 默认配置，可在settings.py中覆盖
+DEFAULT_FLUSH_INTERVAL = 10     # 秒
+DEFAULT_FLUSH_THRESHOLD = 100   # 缓冲的浏览次数达到该值时立即写回
+
+
+def _flush_interval():
+    return getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+
+def _flush_threshold():
+    return getattr(settings, 'BLOG_VIEW_COUNT_FLUSH_THRESHOLD', DEFAULT_FLUSH_THRESHOLD)
+
+
+def apply_view_counts(counts):
+    """把 {文章ID: 增量} 批量写回数据库，返回写回的总浏览次数"""
+    from .models import Post
+
+    # 增量相同的文章合并成一条 UPDATE
+    by_amount = defaultdict(list)
+    for post_id, amount in counts.items():
+        if amount > 0:
+            by_amount[amount].append(post_id)
+
+    with transaction.atomic():
+        for amount, post_ids in by_amount.items():
+            Post.objects.filter(pk__in=post_ids).update(view_count=F('view_count') + amount)
+
+    return sum(amount * len(post_ids) for amount, post_ids in by_amount.items())
+
+
+class ViewCountBuffer:
+    """浏览次数缓冲区基类：负责阈值判断和定时写回"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+        self._buffered = 0
+
+    def increment(self, post_id, amount=1):
+        """记录一次（或多次）浏览"""
+        with self._lock:
+            self._add(post_id, amount)
+            self._buffered += amount
+            should_flush = self._buffered >= _flush_threshold()
+            if not should_flush:
+                self._ensure_timer()
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """把缓冲区中的浏览次数写回数据库，返回写回的总次数"""
+        with self._lock:
+            self._cancel_timer()
+            self._buffered = 0
+            counts = self._take()
+        if not counts:
+            return 0
+        try:
+            return apply_view_counts(counts)
+        except Exception:
+            # 写回失败时把增量放回缓冲区，等待下一次写回
+            logger.exception("浏览次数写回失败，%d 篇文章的计数将稍后重试", len(counts))
+            with self._lock:
+                self._restore(counts)
+                self._buffered += sum(counts.values())
+                self._ensure_timer()
+            raise
+
+    def pending(self):
+        """当前缓冲区中尚未写回的浏览次数"""
+        with self._lock:
+            return self._buffered
+
+    def _ensure_timer(self):
+        if self._timer is None:
+            self._timer = threading.Timer(_flush_interval(), self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception:
+            pass  # 已在flush中记录日志
+        finally:
+            # 定时器线程不会经过请求周期，需要自己关闭数据库连接
+            connections.close_all()
+
+    # 子类实现具体的存储方式
+    def _add(self, post_id, amount):
+        raise NotImplementedError
+
+    def _take(self):
+        raise NotImplementedError
+
+    def _restore(self, counts):
+        raise NotImplementedError
+
+
+class MemoryViewCountBuffer(ViewCountBuffer):
+    """进程内缓冲区：每个gunicorn worker各自累加、各自写回"""
+
+    def __init__(self):
+        super().__init__()
+        self._counts = Counter()
+
+    def _add(self, post_id, amount):
+        self._counts[post_id] += amount
+
+    def _take(self):
+        counts, self._counts = self._counts, Counter()
+        return counts
+
+    def _restore(self, counts):
+        self._counts.update(counts)
+
+
+class CacheViewCountBuffer(ViewCountBuffer):
+    """
+    基于缓存后端的缓冲区：计数保存在共享缓存（如Redis、Memcached）中，
+    因此 flush_view_counts 命令可以在其他进程中强制写回
+    """
+    key_prefix = 'blog:views:'
+
+    def __init__(self, alias='default'):
+        super().__init__()
+        self.cache = caches[alias]
+        self._dirty = set()
+
+    def make_key(self, post_id):
+        return f'{self.key_prefix}{post_id}'
+
+    def _add(self, post_id, amount):
+        key = self.make_key(post_id)
+        # add() 只在键不存在时生效，之后用原子的 incr() 累加
+        if not self.cache.add(key, amount, timeout=None):
+            self.cache.incr(key, amount)
+        self._dirty.add(post_id)
+
+    def _take(self, post_ids=None):
+        post_ids = self._dirty if post_ids is None else post_ids
+        self._dirty = set()
+        return self._drain(post_ids)
+
+    def _drain(self, post_ids):
+        keys = {self.make_key(post_id): post_id for post_id in post_ids}
+        counts = {}
+        for key, amount in self.cache.get_many(list(keys)).items():
+            if amount <= 0:
+                continue
+            # 读取和扣减之间其他进程可能已经写回了同一批计数：以原子的 decr() 的结果为准，
+            # 扣成负数说明多扣了，把多扣的部分加回去，只写回实际扣下的数量
+            # （期间其他进程新增的计数保留在缓存中）
+            try:
+                remaining = self.cache.decr(key, amount)
+            except ValueError:
+                continue  # 键已被删除
+            if remaining < 0:
+                over = min(-remaining, amount)
+                self.cache.incr(key, over)
+                amount -= over
+            if amount:
+                counts[keys[key]] = amount
+        return counts
+
+    def _restore(self, counts):
+        for post_id, amount in counts.items():
+            self._add(post_id, amount)
+
+    def flush_all(self, chunk_size=1000):
+        """扫描所有文章的缓存计数并写回（供管理命令使用）"""
+        from .models import Post
+
+        flushed = self.flush()
+        post_ids = Post.objects.values_list('id', flat=True).order_by('id').iterator(chunk_size=chunk_size)
+        chunk = []
+        for post_id in post_ids:
+            chunk.append(post_id)
+            if len(chunk) >= chunk_size:
+                flushed += apply_view_counts(self._drain(chunk))
+                chunk = []
+        if chunk:
+            flushed += apply_view_counts(self._drain(chunk))
+        return flushed
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_view_counter():
+    """获取当前进程的浏览次数缓冲区（按settings中的配置创建）"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                if getattr(settings, 'BLOG_VIEW_COUNT_BUFFER', 'memory') == 'cache':
+                    alias = getattr(settings, 'BLOG_VIEW_COUNT_CACHE_ALIAS', 'default')
+                    _buffer = CacheViewCountBuffer(alias)
+                else:
+                    _buffer = MemoryViewCountBuffer()
+    return _buffer
+
+
+def record_view(post_id):
+    """记录一次文章浏览"""
+    get_view_counter().increment(post_id)
+
+
+def flush():
+    """写回当前进程缓冲的浏览次数（进程退出、gunicorn worker退出时调用）"""
+    if _buffer is None:
+        return 0
+    try:
+        return _buffer.flush()
+    except Exception:
+        return 0
+
+
+atexit.register(flush)
@@ -1,96 +1,157 @@
+import math
+from operator import attrgetter
+from urllib.parse import urlencode
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import Http404
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db import models
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from .models import Post, Category, Tag, ActivityLog, Comment
+from .models import Post, PostTag, Category, Tag, ActivityLog, Comment
 from .forms import CommentForm
+from .sidebar import get_sidebar_context
+from .navigation import get_adjacent_posts
+from .search import max_results, search_post_ids
+from .pagination import CursorPaginator, SequenceCursorPaginator
+from .caching import public_page
+from .page_cache import cache_anonymous_page
+from .view_counter import record_view
+from .ratelimit import check_comment_rate
+from .spam import check_comment, record_comment
+from . import metrics
+
+# 公开页面的浏览器/CDN缓存时间（秒）
+LISTING_MAX_AGE = getattr(settings, 'BLOG_LISTING_CACHE_MAX_AGE', 60)
+# 详情页和"加载更多"每次返回的评论数
+COMMENTS_PER_PAGE = getattr(settings, 'BLOG_COMMENTS_PER_PAGE', 20)
+
+
+def _record_cached_view(request, post_id):
+    """文章详情返回304或命中整页缓存时同样计入浏览次数"""
+    record_view(post_id)
+
+
+def _post_is_public(request, post_id):
+    """返回304之前确认文章存在并已发布"""
+    return Post.objects.filter(pk=post_id, status='published').exists()
 
+
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
 def post_list(request):
     """显示已发布的文章列表"""
     # 只显示已发布的文章
-    posts_list = Post.objects.filter(status='published')
-    
-    # 分页处理
-    paginator = Paginator(posts_list, 10)  # 每页显示10篇文章
-    page = request.GET.get('page')
-    
-    try:
-        posts = paginator.page(page)
-    except PageNotAnInteger:
-        posts = paginator.page(1)
-    except EmptyPage:
-        posts = paginator.page(paginator.num_pages)
+    posts_list = Post.published.for_listing()
     
-    # 获取所有分类和标签用于侧边栏
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    # 游标分页，每页显示10篇文章
+    posts = CursorPaginator(posts_list, 10).page(request.GET.get('cursor'))
     
     return render(request, 'blog/post_list.html', {
         'posts': posts,
-        'categories': categories,
-        'tags': tags
+        **get_sidebar_context(),
     })
 
+# 详情页每次都向服务器验证，保证304时也能统计浏览次数
+@public_page(on_not_modified=_record_cached_view, exists=_post_is_public)
+@cache_anonymous_page(on_hit=_record_cached_view)
 def post_detail(request, post_id):
     """显示文章详情"""
-    post = get_object_or_404(Post, id=post_id)
+    # 处理评论提交：频率限制和垃圾评论检查在查询文章之前进行，拒绝时除登录认证外不访问数据库
+    comment_form = CommentForm()
+    if request.method == 'POST' and 'comment' in request.POST:
+        if not request.user.is_authenticated:
+            messages.error(request, '请先登录后再发表评论')
+            return redirect('login')
+        
+        retry_after = check_comment_rate(request)
+        if retry_after is not None:
+            metrics.comments_rejected.inc(reason='rate_limited')
+            seconds = math.ceil(retry_after)
+            response = render(request, 'blog/error.html', {'message': f'评论过于频繁，请 {seconds} 秒后再试'}, status=429)
+            response['Retry-After'] = str(seconds)
+            return response
+        
+        comment_form = CommentForm(request.POST)
+        if comment_form.is_valid():
+            spam_filter = check_comment(comment_form.cleaned_data['content'], request.user)
+            if spam_filter is not None:
+                metrics.comments_rejected.inc(reason=spam_filter.reason)
+                messages.error(request, spam_filter.message)
+                return redirect('blog:post_detail', post_id=post_id)
+    
+    post = get_object_or_404(Post.objects.with_related(), id=post_id)
     
     # 权限控制：只有已发布的文章才能被普通用户查看
     if post.status != 'published' and not request.user.is_staff:
         raise Http404("文章不存在或未发布")
     
-    # 检查是否为最后一篇已发布的文章
-    # 获取所有已发布文章的最大ID
-    max_published_id = Post.objects.filter(status='published').aggregate(
-        max_id=models.Max('id')
-    )['max_id']
+    if comment_form.is_bound and comment_form.is_valid():
+        comment = comment_form.save(commit=False)
+        comment.post = post
+        comment.author = request.user
+        comment.save()
+        record_comment(comment.content, request.user)
+        messages.success(request, '评论发表成功！')
+        return redirect('blog:post_detail', post_id=post.id)
     
-    # 判断当前文章是否为最后一篇
-    is_last_post = post.id == max_published_id if max_published_id else False
+    # 按发布顺序的上一篇/下一篇（带缓存，见 blog/navigation.py）
+    adjacent = get_adjacent_posts(post)
     
     # 增加浏览次数
     post.increment_view_count()
     
-    # 获取文章评论
-    comments = post.comments.filter(is_active=True).order_by('-created_at')
-    
-    # 处理评论提交
-    comment_form = CommentForm()
-    if request.method == 'POST' and 'comment' in request.POST:
-        if not request.user.is_authenticated:
-            messages.error(request, '请先登录后再发表评论')
-            return redirect('login')
-        
-        comment_form = CommentForm(request.POST)
-        if comment_form.is_valid():
-            comment = comment_form.save(commit=False)
-            comment.post = post
-            comment.author = request.user
-            comment.save()
-            messages.success(request, '评论发表成功！')
-            return redirect('blog:post_detail', post_id=post.id)
-    
-    # 获取所有分类和标签用于侧边栏
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    # 第一页评论，其余的由 post_comments 按需加载；评论总数使用 post.comment_count
+    comments = _comment_page(post.id)
     
     return render(request, 'blog/post_detail.html', {
         'post': post,
-        'is_last_post': is_last_post,
+        'previous_post': adjacent['previous'],
+        'next_post': adjacent['next'],
         'comments': comments,
         'comment_form': comment_form,
-        'categories': categories,
-        'tags': tags
+        **get_sidebar_context(),
     })
 
+def _comment_page(post_id, cursor=None):
+    """一页有效评论（含作者），按时间倒序游标分页，评论再多每页的开销也不变"""
+    comments = Comment.objects.filter(post_id=post_id, is_active=True).select_related('author')
+    return CursorPaginator(comments, COMMENTS_PER_PAGE).page(cursor)
+
+
+@public_page()
+@cache_anonymous_page()
+def post_comments(request, post_id):
+    """
+    加载更多评论
+    默认返回HTML片段（详情页的"加载更多"使用），?format=json 时返回JSON
+    """
+    post = Post.objects.filter(pk=post_id).values('status', 'comment_count').first()
+    if post is None or (post['status'] != 'published' and not request.user.is_staff):
+        raise Http404("文章不存在或未发布")
+    
+    comments = _comment_page(post_id, request.GET.get('cursor'))
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comment_count': post['comment_count'],
+            'next_cursor': comments.next_cursor,
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'content': comment.content,
+                    'created_at': comment.created_at.isoformat(),
+                }
+                for comment in comments
+            ],
+        })
+    return render(request, 'blog/comment_list.html', {'comments': comments, 'post_id': post_id})
+
 def draft_list(request):
     """显示草稿列表（仅管理员可见）"""
     if not request.user.is_staff:
         raise Http404("权限不足")
     
-    drafts = Post.objects.filter(status='draft')
+    drafts = Post.objects.filter(status='draft').select_related('author').for_listing()
     return render(request, 'blog/draft_list.html', {'drafts': drafts})
 
 def publish_post(request, post_id):
@@ -101,7 +162,8 @@ def publish_post(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     
     # 状态转换：草稿 → 已发布
-    if post.publish():
+    if Post.objects.filter(pk=post.pk).transition('published', request.user):
+        post.status = 'published'
         return render(request, 'blog/publish_success.html', {'post': post})
     else:
         return render(request, 'blog/error.html', {'message': '只能发布草稿状态的文章'})
@@ -114,99 +176,76 @@ def archive_post(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     
     # 状态转换：已发布 → 已归档
-    if post.archive():
+    if Post.objects.filter(pk=post.pk).transition('archived', request.user):
+        post.status = 'archived'
         return render(request, 'blog/archive_success.html', {'post': post})
     else:
         return render(request, 'blog/error.html', {'message': '只能归档已发布状态的文章'})
 
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
 def search_posts(request):
     """搜索文章"""
     query = request.GET.get('q', '').strip()
-    posts_list = Post.objects.none()  # 使用空的QuerySet而不是空列表
     
-    if query:
-        from django.db.models import Q, Case, When, Value, IntegerField
-        
-        # 使用Q对象进行更智能的搜索
-        # 标题匹配权重更高，内容匹配权重较低
-        posts_list = Post.objects.filter(
-            status='published'
-        ).filter(
-            Q(title__icontains=query) | Q(content__icontains=query)
-        ).annotate(
-            search_rank=Case(
-                When(title__icontains=query, then=Value(2)),  # 标题匹配权重为2
-                When(content__icontains=query, then=Value(1)),  # 内容匹配权重为1
-                default=Value(0),
-                output_field=IntegerField()
-            )
-        ).order_by('-search_rank', '-created_at')  # 先按匹配权重排序，再按时间排序
-    
-    # 分页处理
-    paginator = Paginator(posts_list, 10)  # 每页显示10篇文章
-    page = request.GET.get('page')
-    
-    try:
-        posts = paginator.page(page)
-    except PageNotAnInteger:
-        posts = paginator.page(1)
-    except EmptyPage:
-        posts = paginator.page(paginator.num_pages)
-    
-    # 获取所有分类和标签用于侧边栏
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    # 由全文索引返回按相关度排序的文章ID（标题命中权重更高）
+    post_ids = search_post_ids(query) if query else []
+    
+    # 游标分页，每页显示10篇文章
+    posts = SequenceCursorPaginator(post_ids, 10).page(request.GET.get('cursor'))
+    
+    # 只取出当前页的文章，并保持相关度顺序
+    posts_by_id = Post.published.for_listing().in_bulk(posts.object_list)
+    posts.object_list = [posts_by_id[pk] for pk in posts.object_list if pk in posts_by_id]
     
     return render(request, 'blog/search_results.html', {
         'posts': posts,
         'query': query,
-        'results_count': posts_list.count(),
-        'categories': categories,
-        'tags': tags
+        'query_string': urlencode({'q': query}),  # 翻页链接中保留搜索词
+        'results_count': len(post_ids),
+        # 结果数达到上限时显示为"N+"
+        'results_capped': len(post_ids) >= max_results(),
+        **get_sidebar_context(),
     })
 
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
 def category_posts(request, slug):
     """显示特定分类下的文章"""
     category = get_object_or_404(Category, slug=slug)
-    posts = Post.objects.filter(status='published', category=category)
-    
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    posts = CursorPaginator(
+        Post.published.filter(category=category).for_listing(), 10
+    ).page(request.GET.get('cursor'))
     
     return render(request, 'blog/category_posts.html', {
         'category': category,
         'posts': posts,
-        'categories': categories,
-        'tags': tags
+        **get_sidebar_context(),
     })
 
+@public_page(max_age=LISTING_MAX_AGE)
+@cache_anonymous_page()
 def tag_posts(request, slug):
     """显示特定标签下的文章"""
     tag = get_object_or_404(Tag, slug=slug)
-    posts = Post.objects.filter(status='published', tags=tag)
-    
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    # 按文章-标签关联表的索引分页，再取出每条关联的文章
+    posts = CursorPaginator(
+        PostTag.objects.listing(tag), 10
+    ).page(request.GET.get('cursor')).map(attrgetter('post'))
     
     return render(request, 'blog/tag_posts.html', {
         'tag': tag,
         'posts': posts,
-        'categories': categories,
-        'tags': tags
+        **get_sidebar_context(),
     })
 
 
 def activity_log(request):
     """显示活动日志页面"""
     # 获取最近的50条活动记录
-    logs = ActivityLog.objects.all()[:50]
-    
-    # 获取侧边栏数据
-    categories = Category.objects.all()
-    tags = Tag.objects.all()
+    logs = ActivityLog.objects.select_related('user')[:50]
     
     return render(request, 'blog/activity_log.html', {
         'logs': logs,
-        'categories': categories,
-        'tags': tags
+        **get_sidebar_context(),
     })
\ No newline at end of file
@@ -5,6 +5,15 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+ASGI 部署模式（默认的 Procfile 仍使用同步 WSGI）：
+    BLOG_ASGI=true gunicorn blog_site.asgi:application -k uvicorn.workers.UvicornWorker
+- BLOG_ASGI=true 时文章列表、详情、分类、标签、搜索使用 blog/async_views.py 中的异步视图，
+  其余页面（后台、评论提交、订阅等）仍是同步视图，由 Django 在线程中执行
+- 慢客户端的读写由事件循环处理，不再占用 worker；gunicorn.conf.py 中的钩子同样适用
+- WhiteNoise 和项目自己的中间件只支持同步，每个请求在中间件这一层仍会占用一个线程
+- 持久数据库连接默认关闭（DB_CONN_MAX_AGE），需要连接复用时使用 PgBouncer 等连接池
+与 WSGI 的对比见 python manage.py benchmark_slow_clients
 """
 
 import os
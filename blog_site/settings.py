@@ -50,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.profiling.ProfilingMiddleware',  # 请求级性能分析，未启用时不加载
+    'blog.metrics.MetricsMiddleware',      # 请求数、耗时、查询数指标
+    'blog.routers.ReplicaRoutingMiddleware',  # 读查询分流到只读副本，未配置副本时不加载
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # 静态文件服务
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -94,6 +97,74 @@ if 'DATABASE_URL' in os.environ:
     import dj_database_url
     DATABASES['default'] = dj_database_url.parse(os.environ['DATABASE_URL'])
 
+# 只读副本（路由规则见 blog/routers.py）
+# DATABASE_REPLICA_URLS：逗号分隔的副本连接串，公开页面的读查询分散到这些副本，写操作仍使用 default
+# BLOG_SQLITE_REPLICA=true：本地用第二个 SQLite 文件模拟副本，
+#     python manage.py sync_sqlite_replica 把主库的当前内容复制过去（相当于一次复制）
+# 测试时副本指向测试主库（TEST.MIRROR）
+BLOG_DATABASE_REPLICAS = []
+for _index, _url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(','))):
+    import dj_database_url
+    DATABASES[f'replica{_index + 1}'] = {**dj_database_url.parse(_url.strip()), 'TEST': {'MIRROR': 'default'}}
+    BLOG_DATABASE_REPLICAS.append(f'replica{_index + 1}')
+if os.environ.get('BLOG_SQLITE_REPLICA', 'False').lower() == 'true' and not BLOG_DATABASE_REPLICAS:
+    DATABASES['replica1'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    BLOG_DATABASE_REPLICAS.append('replica1')
+DATABASE_ROUTERS = ['blog.routers.PrimaryReplicaRouter']
+BLOG_REPLICA_APPS = ['blog']    # 这些应用的读查询可以使用副本（会话、用户等从主库读取）
+BLOG_REPLICA_PIN_SECONDS = 5    # 写操作之后该用户的请求使用主库的时长（秒），应大于副本的复制延迟
+
+# ASGI 部署模式（BLOG_ASGI=true，启动方式见 blog_site/asgi.py）：公开页面使用 blog/async_views.py 中的异步视图
+BLOG_ASYNC_VIEWS = os.environ.get('BLOG_ASGI', 'False').lower() == 'true'
+
+# 数据库连接复用：每个 worker 线程的连接保留 DB_CONN_MAX_AGE 秒（0 为每个请求新建连接），
+# 复用前做健康检查，数据库重启或连接断开后自动重连。
+# ASGI 模式下每个请求在不同的线程中访问数据库，持久连接无法复用，默认关闭（可使用 PgBouncer 等连接池）
+for _database in DATABASES.values():
+    _database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', '0' if BLOG_ASYNC_VIEWS else '600'))
+    _database['CONN_HEALTH_CHECKS'] = True
+    if _database['ENGINE'] == 'django.db.backends.sqlite3':
+        # 事务开始时就获取写锁：WAL 模式下延迟获取的事务从读升级为写时遇到锁会直接失败，不会等待 busy_timeout
+        _database.setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+# SQLite 连接建立时执行的 PRAGMA（见 blog/database.py），BLOG_SQLITE_TUNING=false 时使用 SQLite 默认设置
+BLOG_SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,          # 毫秒
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,          # 负数单位为 KB，即每个连接约 64MB 页缓存
+    'temp_store': 'memory',
+} if os.environ.get('BLOG_SQLITE_TUNING', 'True').lower() == 'true' else {}
+
+# 缓存配置
+# 默认使用进程内缓存；多worker部署时可通过 REDIS_URL 指向 Redis 等共享缓存
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog-default',
+    }
+}
+# 整页缓存单独使用一个缓存，避免大量页面挤掉其他缓存数据
+CACHES['pages'] = {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'blog-pages',
+    'OPTIONS': {'MAX_ENTRIES': 1000},
+}
+if 'REDIS_URL' in os.environ:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+    CACHES['pages'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+        'KEY_PREFIX': 'pages',
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -151,3 +222,118 @@ if not DEBUG:
     SECURE_HSTS_SECONDS = 31536000
     SECURE_HSTS_INCLUDE_SUBDOMAINS = True
     SECURE_HSTS_PRELOAD = True
+
+# 文章浏览次数缓冲配置（见 blog/view_counter.py）
+# memory：每个worker进程内缓冲；cache：缓冲在共享缓存中，可用 flush_view_counts 命令强制写回
+# cache 模式要求 BLOG_VIEW_COUNT_CACHE_ALIAS 是多个进程共享的缓存（如 REDIS_URL），否则系统检查会给出警告（blog.W001）
+BLOG_VIEW_COUNT_BUFFER = os.environ.get('BLOG_VIEW_COUNT_BUFFER', 'memory')
+BLOG_VIEW_COUNT_CACHE_ALIAS = 'default'
+BLOG_VIEW_COUNT_FLUSH_INTERVAL = 10     # 最长缓冲时间（秒）
+BLOG_VIEW_COUNT_FLUSH_THRESHOLD = 100   # 缓冲次数达到该值时立即写回
+
+# 侧边栏（分类、标签）缓存时间（秒），缓存键包含数据库中的订阅版本，数据变化时所有进程立即改用新的缓存
+BLOG_SIDEBAR_CACHE_TIMEOUT = 3600
+
+# 文章详情页上一篇/下一篇导航的缓存时间（秒），缓存键包含数据库中的订阅版本，文章变化时所有进程立即失效
+BLOG_NAVIGATION_CACHE_TIMEOUT = 86400
+
+# 文章详情页每次显示/加载的评论数（评论按游标分页，见 blog/views.py 中的 post_comments）
+BLOG_COMMENTS_PER_PAGE = 20
+
+# 评论提交的频率限制（令牌桶，见 blog/ratelimit.py）：同一用户、同一IP各自计算
+BLOG_COMMENT_RATE_BURST = 5            # 允许连续提交的次数
+BLOG_COMMENT_RATE_PER_MINUTE = 2       # 之后每分钟恢复的次数
+BLOG_RATE_LIMIT_CACHE_ALIAS = 'default'
+# 部署在反向代理（如 Render）之后时设为 HTTP_X_FORWARDED_FOR，按真实客户端IP限流
+BLOG_CLIENT_IP_HEADER = os.environ.get('BLOG_CLIENT_IP_HEADER', '')
+# 客户端与应用之间可信代理的数量：取 X-Forwarded-For 从右往左数第几个地址（左边的地址可以被客户端伪造）
+BLOG_TRUSTED_PROXY_HOPS = int(os.environ.get('BLOG_TRUSTED_PROXY_HOPS', '1'))
+
+# 垃圾评论预过滤（见 blog/spam.py），拒绝时不访问数据库
+BLOG_COMMENT_SPAM_FILTERS = [
+    'blog.spam.LinkFilter',
+    'blog.spam.KeywordFilter',
+    'blog.spam.DuplicateFilter',
+]
+BLOG_COMMENT_SPAM_KEYWORDS = [
+    keyword for keyword in os.environ.get('BLOG_COMMENT_SPAM_KEYWORDS', '').split(',') if keyword.strip()
+]
+BLOG_COMMENT_MAX_LINKS = 3
+BLOG_COMMENT_DUPLICATE_WINDOW = 600       # 秒
+BLOG_COMMENT_DUPLICATE_MIN_LENGTH = 20    # 达到该长度的内容对所有用户判重
+
+# 全文搜索后端（见 blog/search）
+# auto：SQLite 使用 FTS5，其余数据库使用倒排索引（index）；
+# 也可指定 sqlite_fts、index、postgres（tsvector，不切分中文）或 simple（icontains）
+BLOG_SEARCH_BACKEND = os.environ.get('BLOG_SEARCH_BACKEND', 'auto')
+# 文章和查询使用的分词器，默认的二元分词器支持中英文混排
+BLOG_SEARCH_TOKENIZER = 'blog.search.tokenizers.BigramTokenizer'
+BLOG_SEARCH_MAX_RESULTS = 1000   # 单次搜索最多返回的结果数
+
+# HTTP缓存验证（见 blog/caching.py）
+# 内容版本保存在数据库中，所有 worker 和管理命令一致；默认缓存为共享缓存（REDIS_URL）时同时缓存在其中，
+# 304 不需要查询数据库，进程内缓存时每个请求查询一次版本
+# 部署版本号参与 ETag 计算，模板更新后旧的 ETag 自动失效（Render 会提供 RENDER_GIT_COMMIT）
+BLOG_RELEASE = os.environ.get('RENDER_GIT_COMMIT', '')
+BLOG_LISTING_CACHE_MAX_AGE = 60   # 匿名用户列表页的 Cache-Control max-age（秒）
+
+# 匿名用户整页缓存（见 blog/page_cache.py），默认关闭
+# 清除缓存依赖缓存中保存的代数，多 worker 部署时 pages 必须是共享缓存（设置 REDIS_URL），否则系统检查给出 blog.W002 警告
+BLOG_PAGE_CACHE_ENABLED = os.environ.get('BLOG_PAGE_CACHE', 'False').lower() == 'true'
+BLOG_PAGE_CACHE_ALIAS = 'pages'
+BLOG_PAGE_CACHE_TIMEOUT = 600   # 秒；内容变化时相关页面会被主动清除
+
+# RSS/Atom 订阅输出缓存（见 blog/feeds.py），缓存键包含数据库中的订阅版本，进程内缓存也不会返回过期内容
+BLOG_FEED_CACHE_ALIAS = 'pages'
+BLOG_FEED_CACHE_TIMEOUT = 86400
+
+# 站点地图（见 blog/sitemaps.py），预先生成并按主键范围分片
+BLOG_SITEMAP_SHARD_SIZE = 10000     # 每个分片覆盖的主键范围（协议上限为 50000 个 URL）
+BLOG_SITEMAP_AUTO_UPDATE = True     # 文章、分类、标签变化后自动更新受影响的分片
+
+# 活动日志写入（见 blog/activity.py）
+# async：后台线程批量写入；sync：在信号处理器中直接写入
+BLOG_ACTIVITY_LOG_MODE = os.environ.get('BLOG_ACTIVITY_LOG_MODE', 'async')
+BLOG_ACTIVITY_LOG_QUEUE_SIZE = 1000      # 队列满时退回同步写入
+BLOG_ACTIVITY_LOG_BATCH_SIZE = 100
+BLOG_ACTIVITY_LOG_FLUSH_INTERVAL = 0.5   # 凑批的最长等待时间（秒）
+
+# 请求级性能分析（见 blog/profiling.py），默认关闭
+# 启用后，请求头 X-Blog-Profile 等于令牌的请求、以及按比例抽样的请求会输出 Server-Timing 头和分析日志
+BLOG_PROFILING_ENABLED = os.environ.get('BLOG_PROFILING', 'False').lower() == 'true'
+BLOG_PROFILING_TOKEN = os.environ.get('BLOG_PROFILING_TOKEN', '')
+BLOG_PROFILING_SAMPLE_RATE = float(os.environ.get('BLOG_PROFILING_SAMPLE_RATE', '0'))
+BLOG_PROFILING_SLOW_QUERIES = 3   # 日志中记录最慢的几条SQL
+BLOG_PROFILING_CPROFILE_DIR = os.environ.get('BLOG_PROFILING_CPROFILE_DIR', '')   # 为空时不保存 cProfile 结果
+
+# 运行指标（见 blog/metrics.py），Prometheus 从 /metrics 抓取
+# 设置了令牌时需要 Authorization: Bearer <令牌>；未设置令牌时只在 DEBUG 模式下开放
+BLOG_METRICS_ENABLED = os.environ.get('BLOG_METRICS', 'True').lower() == 'true'
+BLOG_METRICS_TOKEN = os.environ.get('BLOG_METRICS_TOKEN', '')
+# 多个 gunicorn worker 的指标通过该目录下的快照文件合并（gunicorn.conf.py 会设置），为空时只统计当前进程
+BLOG_METRICS_MULTIPROCESS_DIR = os.environ.get('BLOG_METRICS_DIR', '')
+BLOG_METRICS_FLUSH_INTERVAL = 5   # 各进程写入快照的间隔（秒）
+
+# 日志配置
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name}: {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'blog': {
+            'handlers': ['console'],
+            'level': os.environ.get('BLOG_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
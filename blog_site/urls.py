@@ -1,12 +1,17 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.contrib.auth import views as auth_views
-from blog import views as blog_views
+from blog.urls import public_views
+from blog.metrics import metrics_view
+from blog.sitemaps import sitemap_index, sitemap_section
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('blog/', include('blog.urls', namespace='blog')),
-    path('', blog_views.post_list, name='home'),  # 首页直接显示博客列表
+    path('metrics', metrics_view, name='metrics'),
+    path('sitemap.xml', sitemap_index, name='sitemap_index'),
+    path('sitemap-<slug:section>-<int:number>.xml', sitemap_section, name='sitemap_section'),
+    path('', public_views.post_list, name='home'),  # 首页直接显示博客列表（与 /blog/ 相同，按 BLOG_ASYNC_VIEWS 选择同步或异步视图）
 ]
\ No newline at end of file
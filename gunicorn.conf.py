@@ -0,0 +1,26 @@
+"""
+gunicorn 配置
+gunicorn 启动时会自动加载当前目录下的 gunicorn.conf.py
+"""
+import os
+import tempfile
+
+# 各 worker 把运行指标写到这个目录，/metrics 合并所有 worker 的数据（见 blog/metrics.py）
+os.environ.setdefault('BLOG_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'blog-metrics'))
+
+
+def on_starting(server):
+    """主进程启动时清除上次运行留下的指标快照"""
+    directory = os.environ['BLOG_METRICS_DIR']
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(('.json', '.tmp')):
+                os.remove(os.path.join(directory, name))
+
+
+def worker_exit(server, worker):
+    """worker退出前写回缓冲的浏览次数和排队的活动日志，避免重启或缩容时丢失"""
+    from blog import activity, metrics, view_counter
+    view_counter.flush()
+    activity.drain()
+    metrics.write_snapshot()